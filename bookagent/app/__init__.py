@@ -3,6 +3,9 @@ BookAgent 应用模块
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+
+from .core.init_app import lifespan
 
 app = FastAPI(
     title="BookAgent API",
@@ -10,7 +13,9 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # 配置CORS
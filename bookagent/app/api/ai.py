@@ -2,26 +2,44 @@
 AI内容生成相关API
 支持所有兼容OpenAI API格式的模型服务
 """
-from typing import Dict, Any, Optional, List, AsyncGenerator
-import json
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from typing import Dict, Any, List, Optional
+import orjson
+import xxhash
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
 
+from ..schemas.task import TaskResponse, TaskStatus
 from ..schemas.ai import (
     AIChatRequest,
     AIChatResponse,
     AIGenerateRequest,
-    AIGenerateResponse
+    AIGenerateResponse,
+    AIChapterOptions,
+    AIChapterRequest
 )
 from ..services.ai_service import get_ai_service, AIService
 from ..core.security import get_current_active_user
-from ..core.database import get_db
-from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.cache import cache_manager
+from ..core.semantic_cache import semantic_cache
+from ..core.tasks import task_manager
+from ..core.database import get_async_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from ..models.user import User
+from ..models.chapter import Chapter
 
 router = APIRouter()
 
+# 预先编码的SSE帧片段，流式输出时只拼接bytes
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_SSE_CONTENT_PREFIX = b'data: {"content":'
+_SSE_CONTENT_SUFFIX = b"}\n\n"
+_SSE_DONE = b"data: [DONE]\n\n"
+
 @router.post("/chat", response_model=AIChatResponse)
 async def chat_completion(
     request: AIChatRequest,
@@ -57,22 +75,21 @@ async def stream_chat_completion(
     """
     async def generate():
         try:
-            stream = await ai_service.stream_chat_completion(
+            # 只转发合并后的增量文本，直接产出bytes，避免逐token发送SSE帧及重复编码
+            async for content in ai_service.stream_chat_text(
                 messages=request.messages,
                 model=request.model,
                 temperature=request.temperature,
                 max_tokens=request.max_tokens,
                 **request.model_extra or {}
-            )
-            
-            async for chunk in stream:
-                yield f"data: {json.dumps(chunk)}\n\n"
+            ):
+                yield _SSE_CONTENT_PREFIX + orjson.dumps(content) + _SSE_CONTENT_SUFFIX
                 
         except Exception as e:
             error_msg = {"error": f"AI服务错误: {str(e)}"}
-            yield f"data: {json.dumps(error_msg)}\n\n"
+            yield _SSE_PREFIX + orjson.dumps(error_msg) + _SSE_SUFFIX
         
-        yield "data: [DONE]\n\n"
+        yield _SSE_DONE
     
     return StreamingResponse(
         generate(),
@@ -107,106 +124,262 @@ async def generate_chapter_content(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"生成内容失败: {str(e)}"
         )
-    
-    @staticmethod
-    def generate_chapter_content(
-        topic: str,
-        style: str = "academic",
-        language: str = "zh",
-        length: str = "medium",
-        **kwargs
-    ) -> Dict[str, Any]:
-        """
-        生成章节内容
+
+@router.post("/generate/chapters/batch", response_model=List[AIGenerateResponse])
+async def generate_chapters_batch(
+    requests: List[AIGenerateRequest],
+    current_user: User = Depends(get_current_active_user),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    批量生成章节内容
+    """
+    try:
+        contents = await ai_service.generate_chapters_batch([
+            {
+                "title": request.title,
+                "style": request.style,
+                "language": request.language,
+                "length": request.length,
+                **(request.model_extra or {})
+            }
+            for request in requests
+        ])
+        return [{"content": content} for content in contents]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"批量生成内容失败: {str(e)}"
+        )
+
+# 章节生成的系统提示词
+# 风格、长度等说明全部固定在这里，变化的参数只出现在用户消息中，
+# 保证每次请求的前缀逐字节一致，从而命中服务商的前缀缓存(要求前缀不少于1024个token)
+CHAPTER_SYSTEM_PROMPT = """你是一位经验丰富的技术图书作者，负责根据用户给出的主题撰写技术图书中的一个完整章节。
+
+用户消息会以如下字段给出本次写作的参数：
+- 主题：本章要讲述的技术主题
+- 写作风格：风格代码，含义见下方“风格说明”
+- 输出语言：撰写正文使用的语言代码，例如 zh 表示简体中文，en 表示英文
+- 内容长度：长度代码，含义见下方“长度说明”
+- 额外要求：可选，用户对本章的补充要求，优先级高于通用要求
+
+风格说明：
+- academic：学术性、正式、严谨。术语使用规范，论述有理有据，必要时说明概念的来源与演进，避免口语化表达和夸张修辞。
+- technical：技术性强，包含代码示例。以工程实践为中心，解释实现原理与关键细节，给出可运行的代码片段，并说明代码的输入、输出和适用场景。
+- casual：轻松、非正式。用通俗的语言和生活化的类比解释概念，降低阅读门槛，但不能牺牲技术上的准确性。
+- instructional：教学式，步骤清晰。按照“目标—准备—步骤—验证—常见问题”的顺序组织内容，每一步都给出明确的操作和预期结果。
+- 其他或未识别的风格代码：按专业、清晰的通用技术写作风格处理。
+
+长度说明：
+- short：约500字，聚焦一个核心概念，只保留最关键的示例。
+- medium：约1000-1500字，覆盖核心概念、一个完整示例和实践建议。
+- long：2000字以上，系统性地展开原理、多个示例、进阶话题和常见陷阱。
+- 其他或未识别的长度代码：按约1000-1500字处理。
+
+通用要求：
+1. 内容完整，结构清晰。以一级标题给出章节名，使用二级、三级标题组织小节，层次不超过三级。
+2. 开头用一段简短的概述说明本章要解决的问题和读者将获得的收获。
+3. 包含适当的标题、小标题和段落，段落长度适中，避免大段堆砌。
+4. 如适用，包含代码示例。代码使用带语言标识的Markdown代码块，并配有必要的注释和解释。
+5. 对比多种方案、列举参数或配置项时，优先使用Markdown表格。
+6. 列举要点时使用有序或无序列表，每个要点简洁明确。
+7. 结尾给出小结，回顾本章要点，并可提示与后续章节的衔接。
+8. 使用Markdown格式输出正文，不要输出与章节内容无关的说明或寒暄。
+9. 保证技术内容准确，不编造不存在的API、参数或引用；不确定的内容应明确说明适用前提。
+10. 全文使用“输出语言”指定的语言撰写，代码中的标识符保持原样。
+"""
+
+# 各长度代码对应的输出token上限，与上面的长度说明保持一致
+CHAPTER_MAX_TOKENS = {
+    "short": 800,
+    "medium": 2000,
+    "long": 3500,
+}
+
+# 章节生成的用户消息模板，在导入时构建一次
+_CHAPTER_PROMPT_TEMPLATE = (
+    "主题：{topic}\n"
+    "写作风格：{style}\n"
+    "输出语言：{language}\n"
+    "内容长度：{length}"
+)
+
+def _build_chapter_prompt(
+    topic: str,
+    style: str,
+    language: str,
+    length: str,
+    **kwargs
+) -> str:
+    """构建章节生成的用户消息（只包含本次请求变化的参数）"""
+    prompt = _CHAPTER_PROMPT_TEMPLATE.format_map({
+        "topic": topic,
+        "style": style,
+        "language": language,
+        "length": length,
+    })
+    # 添加额外提示
+    if "additional_instructions" in kwargs:
+        prompt += f"\n额外要求：{kwargs['additional_instructions']}"
         
-        Args:
-            topic: 章节主题
-            style: 写作风格 (academic, technical, casual, etc.)
-            language: 输出语言
-            length: 内容长度 (short, medium, long)
-            **kwargs: 其他参数
-            
-        Returns:
-            Dict: 生成的章节内容
-        """
-        # 构建提示词
-        prompt = self._build_chapter_prompt(topic, style, language, length, **kwargs)
+    return prompt
+
+def _chapter_cache_key(
+    model: str,
+    temperature: float,
+    topic: str,
+    style: str,
+    language: str,
+    length: str,
+    additional_instructions: Optional[str]
+) -> str:
+    """根据归一化后的生成参数计算稳定的缓存键"""
+    payload = orjson.dumps(
+        {
+            "model": model,
+            "temperature": temperature,
+            "topic": topic,
+            "style": style,
+            "language": language,
+            "length": length,
+            "extra": additional_instructions,
+        },
+        option=orjson.OPT_SORT_KEYS
+    )
+    return "chapter_generation:" + xxhash.xxh3_128_hexdigest(payload)
+
+async def _request_chapter_content(
+    ai_service: AIService,
+    prompt: str,
+    temperature: float,
+    max_tokens: int
+) -> Dict[str, Any]:
+    """调用LLM生成章节内容，失败时返回错误信息而不是抛出异常"""
+    try:
+        response = await ai_service.chat_completion(
+            messages=[
+                {"role": "system", "content": CHAPTER_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
         
-        try:
-            # 调用OpenAI API
-            response = openai.ChatCompletion.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "你是一位经验丰富的技术图书作者。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            # 解析响应
-            content = response.choices[0].message.content
-            return {
-                "success": True,
-                "content": content,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
+        # 解析响应
+        content = response["choices"][0]["message"]["content"]
+        usage = response.get("usage") or {}
+        return {
+            "success": True,
+            "content": content,
+            "usage": {
+                "prompt_tokens": usage.get("prompt_tokens"),
+                "completion_tokens": usage.get("completion_tokens"),
+                "total_tokens": usage.get("total_tokens")
             }
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
-    
-    @staticmethod
-    def _build_chapter_prompt(
-        topic: str,
-        style: str,
-        language: str,
-        length: str,
-        **kwargs
-    ) -> str:
-        """构建章节生成的提示词"""
-        # 长度映射
-        length_map = {
-            "short": "约500字",
-            "medium": "约1000-1500字",
-            "long": "2000字以上"
         }
         
-        # 风格描述
-        style_map = {
-            "academic": "学术性、正式、严谨",
-            "technical": "技术性强，包含代码示例",
-            "casual": "轻松、非正式",
-            "instructional": "教学式，步骤清晰"
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
         }
+
+async def _generate_chapter_content(
+    ai_service: AIService,
+    topic: str,
+    style: str = "academic",
+    language: str = "zh",
+    length: str = "medium",
+    temperature: float = 0.7,
+    use_cache: bool = False,
+    **kwargs
+) -> Dict[str, Any]:
+    """
+    生成章节内容
+    
+    通过异步LLM客户端调用模型，等待期间不阻塞事件循环。
+    temperature为0或显式指定use_cache时，相同参数的结果会缓存到Redis；
+    参数完全相同的并发请求只会触发一次LLM调用。
+    
+    Args:
+        ai_service: AI服务实例
+        topic: 章节主题
+        style: 写作风格 (academic, technical, casual, etc.)
+        language: 输出语言
+        length: 内容长度 (short, medium, long)
+        temperature: 温度参数
+        use_cache: 是否缓存非确定性(temperature>0)的生成结果
+        **kwargs: 其他参数
         
-        # 构建提示词
-        prompt = f"""请以{style_map.get(style, '专业')}的风格，用{language}撰写一篇关于"{topic}"的技术章节。
+    Returns:
+        Dict: 生成的章节内容
+    """
+    cacheable = use_cache or temperature == 0
+    additional_instructions = kwargs.get("additional_instructions")
+    cache_key = _chapter_cache_key(
+        settings.OPENAI_MODEL,
+        temperature,
+        topic.strip(),
+        style,
+        language,
+        length,
+        additional_instructions
+    )
+    semantic_namespace = f"chapter_generation:{settings.OPENAI_MODEL}:{temperature}"
+    semantic_text = f"{style}|{language}|{length}|{topic.strip()}|{additional_instructions or ''}"
+    
+    if cacheable:
+        cached_result = await cache_manager.get(cache_key)
+        if cached_result is not None:
+            return {**cached_result, "cache_hit": True}
         
-要求：
-1. 内容完整，结构清晰
-2. 长度：{length_map.get(length, '约1000-1500字')}
-3. 包含适当的标题、小标题和段落
-4. 如适用，包含代码示例
-5. 使用Markdown格式
-"""
-        # 添加额外提示
-        if "additional_instructions" in kwargs:
-            prompt += f"\n额外要求：{kwargs['additional_instructions']}"
-            
-        return prompt
+        # 精确匹配未命中时，再查找语义相近的历史结果
+        cached_result = await semantic_cache.lookup(semantic_namespace, semantic_text)
+        if cached_result is not None:
+            return {**cached_result, "cache_hit": True}
+    
+    # 构建提示词；参数完全相同的并发请求由AIService合并为一次模型调用
+    prompt = _build_chapter_prompt(topic, style, language, length, **kwargs)
+    max_tokens = CHAPTER_MAX_TOKENS.get(length, CHAPTER_MAX_TOKENS["medium"])
+    result = await _request_chapter_content(ai_service, prompt, temperature, max_tokens)
+    
+    if cacheable and result["success"]:
+        await cache_manager.set(cache_key, result, expire=settings.CHAPTER_CACHE_TTL)
+        await semantic_cache.add(semantic_namespace, semantic_text, result)
+    
+    return {**result, "cache_hit": False}
+
+async def _get_owned_chapter(db: AsyncSession, chapter_id: int, user: User) -> Chapter:
+    """获取章节并检查当前用户是否有权限操作"""
+    result = await db.execute(
+        select(Chapter)
+        .options(joinedload(Chapter.book))
+        .where(Chapter.id == chapter_id)
+    )
+    chapter = result.scalar_one_or_none()
+    if not chapter:
+        raise HTTPException(status_code=404, detail="章节不存在")
+    
+    if chapter.book.author_id != user.id and not user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="没有权限操作此章节"
+        )
+    return chapter
+
+def _chapter_params(request: AIChapterOptions, chapter: Chapter) -> Dict[str, Any]:
+    """构建为现有章节生成内容的参数，未提供主题时使用章节标题"""
+    params = request.model_dump(exclude_none=True)
+    if not params.get("topic"):
+        params["topic"] = chapter.title
+    return params
 
 @router.post("/ai/generate/chapter")
 async def generate_chapter(
-    data: Dict[str, Any],
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    request: AIChapterRequest,
+    current_user: User = Depends(get_current_active_user),
+    ai_service: AIService = Depends(get_ai_service)
 ):
     """
     生成章节内容
@@ -217,16 +390,13 @@ async def generate_chapter(
     - language: 输出语言 (可选, 默认: zh)
     - length: 内容长度 (可选, 默认: medium)
     - additional_instructions: 额外指令 (可选)
+    - temperature: 温度参数 (可选, 默认: 0.7)
+    - use_cache: 是否缓存生成结果 (可选, temperature为0时总是缓存)
     """
-    # 验证必填参数
-    if "topic" not in data or not data["topic"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="必须提供章节主题(topic)"
-        )
-    
     # 调用AI服务生成内容
-    result = AIService.generate_chapter_content(**data)
+    result = await _generate_chapter_content(
+        ai_service, **request.model_dump(exclude_none=True)
+    )
     
     if not result["success"]:
         raise HTTPException(
@@ -237,36 +407,23 @@ async def generate_chapter(
     return result
 
 @router.post("/ai/generate/chapter/{chapter_id}")
-async def generate_chapter_content(
+async def generate_existing_chapter_content(
     chapter_id: int,
-    data: Dict[str, Any],
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    request: AIChapterOptions,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user),
+    ai_service: AIService = Depends(get_ai_service)
 ):
     """
     为现有章节生成内容
     
     参数同 /ai/generate/chapter
     """
-    # 获取章节
-    chapter = db.query(Chapter).filter(Chapter.id == chapter_id).first()
-    if not chapter:
-        raise HTTPException(status_code=404, detail="章节不存在")
-    
-    # 检查权限
-    book = db.query(Book).filter(Book.id == chapter.book_id).first()
-    if book.author_id != current_user.id and not current_user.is_superuser:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="没有权限操作此章节"
-        )
-    
-    # 使用章节标题作为主题（如果未提供）
-    if "topic" not in data or not data["topic"]:
-        data["topic"] = chapter.title
+    chapter = await _get_owned_chapter(db, chapter_id, current_user)
+    params = _chapter_params(request, chapter)
     
     # 调用AI服务生成内容
-    result = AIService.generate_chapter_content(**data)
+    result = await _generate_chapter_content(ai_service, **params)
     
     if not result["success"]:
         raise HTTPException(
@@ -277,8 +434,7 @@ async def generate_chapter_content(
     # 更新章节内容
     chapter.content = result["content"]
     db.add(chapter)
-    db.commit()
-    db.refresh(chapter)
+    await db.commit()
     
     return {
         "success": True,
@@ -286,3 +442,57 @@ async def generate_chapter_content(
         "content": chapter.content,
         "usage": result.get("usage")
     }
+
+@router.post("/jobs/chapter", response_model=TaskResponse, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_chapter_generation(
+    request: AIChapterRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    提交章节内容生成任务
+    
+    参数同 /ai/generate/chapter。生成在后台worker中执行，
+    立即返回任务ID，通过 /ai/jobs/{job_id} 查询状态和结果。
+    """
+    params = request.model_dump(exclude_none=True)
+    job_id = await run_in_threadpool(
+        task_manager.start_chapter_generation, params, None, current_user.id
+    )
+    return TaskResponse(task_id=job_id, status="PENDING", message="章节生成任务已提交")
+
+@router.post(
+    "/jobs/chapter/{chapter_id}",
+    response_model=TaskResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def enqueue_existing_chapter_generation(
+    chapter_id: int,
+    request: AIChapterOptions,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    提交为现有章节生成内容的任务，生成完成后由worker写回章节
+    
+    参数同 /ai/generate/chapter
+    """
+    chapter = await _get_owned_chapter(db, chapter_id, current_user)
+    params = _chapter_params(request, chapter)
+    job_id = await run_in_threadpool(
+        task_manager.start_chapter_generation, params, chapter_id, current_user.id
+    )
+    return TaskResponse(task_id=job_id, status="PENDING", message="章节生成任务已提交")
+
+@router.get("/jobs/{job_id}", response_model=TaskStatus)
+async def get_job_status(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """查询章节生成任务的状态和结果，只能查询自己提交的任务"""
+    if not await run_in_threadpool(task_manager.is_task_owner, job_id, current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="任务不存在"
+        )
+    job_status = await run_in_threadpool(task_manager.get_task_status, job_id)
+    return TaskStatus(**job_status)
@@ -3,35 +3,47 @@
 """
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core import security
 from ..core.config import settings
-from ..core.database import get_db
+from ..core.database import get_async_db
 from ..models.user import User
 from ..schemas.token import Token
 from ..schemas.user import User as UserSchema
 
 router = APIRouter(tags=["authentication"])
 
-def authenticate_user(db: Session, username: str, password: str):
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     """验证用户"""
-    user = db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalar_one_or_none()
     if not user:
         return False
-    if not security.verify_password(password, user.hashed_password):
+    # 密码校验是CPU密集操作，放到线程池执行
+    verified, new_hash = await run_in_threadpool(
+        security.verify_and_update_password, password, user.hashed_password
+    )
+    if not verified:
         return False
+    if new_hash:
+        # 旧的bcrypt哈希在登录成功时升级为argon2
+        user.hashed_password = new_hash
+        db.add(user)
+        await db.commit()
     return user
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """获取访问令牌"""
     # 验证用户
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
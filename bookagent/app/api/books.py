@@ -2,80 +2,118 @@
 图书相关API
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from ..core import security
-from ..core.database import get_db
+from ..core.database import get_async_db
+from ..core.pagination import set_next_cursor
 from ..models.book import Book
 from ..models.user import User
 from ..schemas.book import Book as BookSchema, BookCreate, BookUpdate, BookInDB
 
 router = APIRouter()
 
-def get_books(
-    db: Session, 
+# 列表视图只需要的列，避免加载完整ORM对象及其关联关系
+BOOK_LIST_COLUMNS = (
+    Book.id,
+    Book.title,
+    Book.description,
+    Book.status,
+    Book.is_public,
+    Book.cover_image,
+    Book.author_id,
+    Book.created_at,
+    Book.updated_at,
+)
+
+async def get_books(
+    db: AsyncSession, 
     skip: int = 0, 
     limit: int = 100,
-    user_id: Optional[int] = None
+    user_id: Optional[int] = None,
+    after_id: Optional[int] = None
 ):
-    """获取图书列表"""
-    query = db.query(Book)
+    """获取图书列表
+    
+    Args:
+        db: 数据库会话
+        skip: 偏移量分页的跳过条数
+        limit: 返回条数
+        user_id: 只返回该用户的图书
+        after_id: 键集分页游标，提供时返回ID大于该值的图书并忽略skip
+        
+    Returns:
+        只包含列表所需列的行对象
+    """
+    query = select(*BOOK_LIST_COLUMNS).order_by(Book.id)
     if user_id is not None:
-        query = query.filter(Book.author_id == user_id)
-    return query.offset(skip).limit(limit).all()
+        query = query.where(Book.author_id == user_id)
+    if after_id is not None:
+        # 键集分页走主键索引，翻页越深也不需要扫描被跳过的行
+        query = query.where(Book.id > after_id)
+    else:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    return result.all()
 
-def get_book(db: Session, book_id: int):
+async def get_book(db: AsyncSession, book_id: int):
     """获取单个图书"""
-    return db.query(Book).filter(Book.id == book_id).first()
+    result = await db.execute(
+        select(Book).options(selectinload(Book.chapters)).where(Book.id == book_id)
+    )
+    return result.scalar_one_or_none()
 
-def create_book(db: Session, book: BookCreate, author_id: int):
+async def create_book(db: AsyncSession, book: BookCreate, author_id: int):
     """创建图书"""
-    db_book = Book(**book.dict(), author_id=author_id)
+    # 新建图书没有章节，显式初始化以免响应序列化时触发懒加载
+    db_book = Book(**book.model_dump(), author_id=author_id, chapters=[])
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
     return db_book
 
-def update_book(db: Session, book_id: int, book: BookUpdate):
+async def update_book(db: AsyncSession, book_id: int, book: BookUpdate):
     """更新图书"""
-    db_book = get_book(db, book_id=book_id)
+    db_book = await get_book(db, book_id=book_id)
     if not db_book:
         return None
     
-    update_data = book.dict(exclude_unset=True)
+    update_data = book.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_book, field, value)
     
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
     return db_book
 
-def delete_book(db: Session, book_id: int):
+async def delete_book(db: AsyncSession, book_id: int):
     """删除图书"""
-    db_book = get_book(db, book_id=book_id)
+    db_book = await get_book(db, book_id=book_id)
     if not db_book:
         return None
-    db.delete(db_book)
-    db.commit()
+    await db.delete(db_book)
+    await db.commit()
     return db_book
 
 @router.post("/books/", response_model=BookSchema, status_code=status.HTTP_201_CREATED)
-def create_book_endpoint(
+async def create_book_endpoint(
     book: BookCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """创建新图书"""
-    return create_book(db=db, book=book, author_id=current_user.id)
+    return await create_book(db=db, book=book, author_id=current_user.id)
 
-@router.get("/books/", response_model=List[BookSchema])
-def read_books(
+@router.get("/books/", response_model=List[BookInDB], response_model_exclude_none=True)
+async def read_books(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     user_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """获取图书列表"""
@@ -83,17 +121,18 @@ def read_books(
     if not current_user.is_superuser and user_id != current_user.id:
         user_id = current_user.id
     
-    books = get_books(db, skip=skip, limit=limit, user_id=user_id)
+    books = await get_books(db, skip=skip, limit=limit, user_id=user_id, after_id=after_id)
+    set_next_cursor(response, books, limit)
     return books
 
 @router.get("/books/{book_id}", response_model=BookSchema)
-def read_book(
+async def read_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """获取指定图书"""
-    db_book = get_book(db, book_id=book_id)
+    db_book = await get_book(db, book_id=book_id)
     if db_book is None:
         raise HTTPException(status_code=404, detail="图书不存在")
     
@@ -107,14 +146,14 @@ def read_book(
     return db_book
 
 @router.put("/books/{book_id}", response_model=BookSchema)
-def update_book_endpoint(
+async def update_book_endpoint(
     book_id: int,
     book: BookUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """更新图书信息"""
-    db_book = get_book(db, book_id=book_id)
+    db_book = await get_book(db, book_id=book_id)
     if db_book is None:
         raise HTTPException(status_code=404, detail="图书不存在")
     
@@ -125,16 +164,16 @@ def update_book_endpoint(
             detail="没有权限修改此资源"
         )
     
-    return update_book(db=db, book_id=book_id, book=book)
+    return await update_book(db=db, book_id=book_id, book=book)
 
 @router.delete("/books/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_book_endpoint(
+async def delete_book_endpoint(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """删除图书"""
-    db_book = get_book(db, book_id=book_id)
+    db_book = await get_book(db, book_id=book_id)
     if db_book is None:
         raise HTTPException(status_code=404, detail="图书不存在")
     
@@ -145,5 +184,5 @@ def delete_book_endpoint(
             detail="没有权限删除此资源"
         )
     
-    delete_book(db=db, book_id=book_id)
+    await delete_book(db=db, book_id=book_id)
     return {"ok": True}
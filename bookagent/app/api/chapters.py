@@ -1,98 +1,110 @@
 """
 章节相关API
 """
-from typing import List, Optional
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, undefer
 
 from ..core import security
-from ..core.database import get_db
+from ..core.database import get_async_db
 from ..models.chapter import Chapter
 from ..models.book import Book
 from ..models.user import User
-from ..schemas.chapter import Chapter as ChapterSchema, ChapterCreate, ChapterUpdate
+from ..schemas.chapter import Chapter as ChapterSchema, ChapterCreate, ChapterSummary, ChapterUpdate
 
 router = APIRouter()
 
-def get_chapters(
-    db: Session, 
+# 章节目录接口返回的列，与 ChapterSummary 的字段一一对应
+_CHAPTER_SUMMARY_COLUMNS = tuple(getattr(Chapter, name) for name in ChapterSummary.model_fields)
+
+async def get_chapters(
+    db: AsyncSession, 
     book_id: int,
     skip: int = 0, 
     limit: int = 100
 ):
-    """获取章节列表"""
-    return (
-        db.query(Chapter)
-        .filter(Chapter.book_id == book_id)
+    """获取章节列表（只查询目录所需的列，返回行元组而不构造ORM对象）"""
+    result = await db.execute(
+        select(*_CHAPTER_SUMMARY_COLUMNS)
+        .where(Chapter.book_id == book_id)
         .order_by(Chapter.order)
         .offset(skip)
         .limit(limit)
-        .all()
     )
+    return result.all()
 
-def get_chapter(db: Session, chapter_id: int):
-    """获取单个章节"""
-    return db.query(Chapter).filter(Chapter.id == chapter_id).first()
+async def get_chapter(db: AsyncSession, chapter_id: int):
+    """获取单个章节（同时通过JOIN加载所属图书，供权限检查使用）"""
+    result = await db.execute(
+        select(Chapter)
+        .options(joinedload(Chapter.book), undefer(Chapter.content))
+        .where(Chapter.id == chapter_id)
+    )
+    return result.scalar_one_or_none()
 
-def create_chapter(db: Session, chapter: ChapterCreate, book_id: int, author_id: int):
+async def create_chapter(db: AsyncSession, chapter: ChapterCreate, book_id: int, author_id: int):
     """创建章节"""
     # 验证图书存在且属于当前用户
-    book = db.query(Book).filter(Book.id == book_id, Book.author_id == author_id).first()
-    if not book:
+    result = await db.execute(
+        select(Book.id).where(Book.id == book_id, Book.author_id == author_id)
+    )
+    if result.scalar_one_or_none() is None:
         return None
     
-    db_chapter = Chapter(**chapter.dict(), book_id=book_id)
+    db_chapter = Chapter(**chapter.model_dump(), book_id=book_id)
     db.add(db_chapter)
-    db.commit()
-    db.refresh(db_chapter)
+    await db.commit()
     return db_chapter
 
-def update_chapter(db: Session, chapter_id: int, chapter: ChapterUpdate):
+async def update_chapter(db: AsyncSession, chapter_id: int, chapter: ChapterUpdate):
     """更新章节"""
-    db_chapter = get_chapter(db, chapter_id=chapter_id)
+    db_chapter = await get_chapter(db, chapter_id=chapter_id)
     if not db_chapter:
         return None
     
-    update_data = chapter.dict(exclude_unset=True)
+    update_data = chapter.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_chapter, field, value)
     
     db.add(db_chapter)
-    db.commit()
-    db.refresh(db_chapter)
+    await db.commit()
     return db_chapter
 
-def delete_chapter(db: Session, chapter_id: int):
+async def delete_chapter(db: AsyncSession, chapter_id: int):
     """删除章节"""
-    db_chapter = get_chapter(db, chapter_id=chapter_id)
+    db_chapter = await get_chapter(db, chapter_id=chapter_id)
     if not db_chapter:
         return None
-    db.delete(db_chapter)
-    db.commit()
+    await db.delete(db_chapter)
+    await db.commit()
     return db_chapter
 
-def check_book_ownership(db: Session, book_id: int, user_id: int):
+async def check_book_ownership(db: AsyncSession, book_id: int, user_id: int):
     """检查用户是否有权限操作该图书"""
-    book = db.query(Book).filter(Book.id == book_id).first()
-    if not book:
+    # 只查询作者ID一列，无需加载整个图书对象
+    result = await db.execute(select(Book.author_id).where(Book.id == book_id))
+    author_id = result.scalar_one_or_none()
+    if author_id is None:
         raise HTTPException(status_code=404, detail="图书不存在")
-    if book.author_id != user_id:
+    if author_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="没有权限操作此资源"
         )
-    return book
+    return author_id
 
 @router.post("/books/{book_id}/chapters/", response_model=ChapterSchema, status_code=status.HTTP_201_CREATED)
-def create_chapter_endpoint(
+async def create_chapter_endpoint(
     book_id: int,
     chapter: ChapterCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """创建新章节"""
-    check_book_ownership(db, book_id, current_user.id)
-    db_chapter = create_chapter(
+    await check_book_ownership(db, book_id, current_user.id)
+    db_chapter = await create_chapter(
         db=db, 
         chapter=chapter, 
         book_id=book_id,
@@ -102,33 +114,32 @@ def create_chapter_endpoint(
         raise HTTPException(status_code=400, detail="创建章节失败")
     return db_chapter
 
-@router.get("/books/{book_id}/chapters/", response_model=List[ChapterSchema])
-def read_chapters(
+@router.get("/books/{book_id}/chapters/", response_model=List[ChapterSummary], response_model_exclude_none=True)
+async def read_chapters(
     book_id: int,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
-    """获取章节列表"""
-    check_book_ownership(db, book_id, current_user.id)
-    chapters = get_chapters(db, book_id=book_id, skip=skip, limit=limit)
+    """获取章节目录（不含正文，正文通过单个章节接口获取）"""
+    await check_book_ownership(db, book_id, current_user.id)
+    chapters = await get_chapters(db, book_id=book_id, skip=skip, limit=limit)
     return chapters
 
 @router.get("/chapters/{chapter_id}", response_model=ChapterSchema)
-def read_chapter(
+async def read_chapter(
     chapter_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """获取指定章节"""
-    db_chapter = get_chapter(db, chapter_id=chapter_id)
+    db_chapter = await get_chapter(db, chapter_id=chapter_id)
     if db_chapter is None:
         raise HTTPException(status_code=404, detail="章节不存在")
     
     # 检查权限
-    book = db.query(Book).filter(Book.id == db_chapter.book_id).first()
-    if book.author_id != current_user.id and not current_user.is_superuser:
+    if db_chapter.book.author_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="没有权限访问此资源"
@@ -137,45 +148,43 @@ def read_chapter(
     return db_chapter
 
 @router.put("/chapters/{chapter_id}", response_model=ChapterSchema)
-def update_chapter_endpoint(
+async def update_chapter_endpoint(
     chapter_id: int,
     chapter: ChapterUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """更新章节信息"""
-    db_chapter = get_chapter(db, chapter_id=chapter_id)
+    db_chapter = await get_chapter(db, chapter_id=chapter_id)
     if db_chapter is None:
         raise HTTPException(status_code=404, detail="章节不存在")
     
     # 检查权限
-    book = db.query(Book).filter(Book.id == db_chapter.book_id).first()
-    if book.author_id != current_user.id and not current_user.is_superuser:
+    if db_chapter.book.author_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="没有权限修改此资源"
         )
     
-    return update_chapter(db=db, chapter_id=chapter_id, chapter=chapter)
+    return await update_chapter(db=db, chapter_id=chapter_id, chapter=chapter)
 
 @router.delete("/chapters/{chapter_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_chapter_endpoint(
+async def delete_chapter_endpoint(
     chapter_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """删除章节"""
-    db_chapter = get_chapter(db, chapter_id=chapter_id)
+    db_chapter = await get_chapter(db, chapter_id=chapter_id)
     if db_chapter is None:
         raise HTTPException(status_code=404, detail="章节不存在")
     
     # 检查权限
-    book = db.query(Book).filter(Book.id == db_chapter.book_id).first()
-    if book.author_id != current_user.id and not current_user.is_superuser:
+    if db_chapter.book.author_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="没有权限删除此资源"
         )
     
-    delete_chapter(db=db, chapter_id=chapter_id)
+    await delete_chapter(db=db, chapter_id=chapter_id)
     return {"ok": True}
@@ -1,29 +1,22 @@
 """
 API依赖注入
 """
-from typing import Generator, Optional
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.core.database import SessionLocal
+from app.core.database import get_async_db, get_db  # noqa: F401
 from app.models.user import User
 
 security = HTTPBearer()
 
-def get_db() -> Generator:
-    """获取数据库会话"""
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
-
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """获取当前用户"""
     credentials_exception = HTTPException(
@@ -44,7 +37,8 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == username).first()
+    result = await db.execute(select(User).where(User.email == username))
+    user = result.scalar_one_or_none()
     if user is None:
         raise credentials_exception
     
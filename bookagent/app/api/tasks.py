@@ -2,32 +2,52 @@
 任务管理API
 处理异步任务的创建、查询和管理
 """
-from typing import Dict, Any, Optional
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from sqlalchemy.orm import Session
+from typing import Dict, Any
+import msgpack
+import orjson
+from celery import states
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.core.tasks import task_manager
-from app.schemas.task import TaskCreate, TaskResponse, TaskStatus
+from app.core.cache import cache_manager
+from app.core.database import get_async_db
+from app.core.tasks import task_channel, task_manager
+from app.schemas.task import TaskResponse, TaskStatus
 from app.api.deps import get_current_user
 from app.models.user import User
 
 router = APIRouter()
 
+# 任务进度流在没有事件时发送心跳注释的间隔(秒)，防止代理断开空闲连接
+TASK_STREAM_HEARTBEAT = 15.0
+
+def _sse_event(event: Dict[str, Any]) -> bytes:
+    """编码一条SSE事件"""
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+async def _check_task_owner(task_id: str, user: User):
+    """检查任务是否由当前用户提交，不是则按任务不存在处理"""
+    if not await run_in_threadpool(task_manager.is_task_owner, task_id, user.id):
+        raise HTTPException(status_code=404, detail="任务不存在")
+
 @router.post("/generate-book", response_model=TaskResponse)
 async def start_book_generation(
     book_id: int,
     chapters: list,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """启动图书生成任务"""
     try:
         # 验证用户权限和图书存在性
         # TODO: 添加权限检查逻辑
         
-        # 启动异步任务
-        task_id = task_manager.start_book_generation(book_id, chapters)
+        # 启动异步任务（投递到消息队列是阻塞I/O，放到线程池执行）
+        task_id = await run_in_threadpool(
+            task_manager.start_book_generation, book_id, chapters, current_user.id
+        )
         
         return TaskResponse(
             task_id=task_id,
@@ -42,7 +62,7 @@ async def start_book_export(
     book_id: int,
     format: str = "docx",
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """启动图书导出任务"""
     try:
@@ -55,7 +75,9 @@ async def start_book_export(
             )
         
         # 启动异步任务
-        task_id = task_manager.start_book_export(book_id, format)
+        task_id = await run_in_threadpool(
+            task_manager.start_book_export, book_id, format, current_user.id
+        )
         
         return TaskResponse(
             task_id=task_id,
@@ -71,20 +93,69 @@ async def get_task_status(
     current_user: User = Depends(get_current_user)
 ):
     """获取任务状态"""
+    await _check_task_owner(task_id, current_user)
     try:
-        status = task_manager.get_task_status(task_id)
+        status = await run_in_threadpool(task_manager.get_task_status, task_id)
         return TaskStatus(**status)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取任务状态失败: {str(e)}")
 
+@router.get("/stream/{task_id}")
+async def stream_task_status(
+    task_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """以SSE推送任务状态变化，任务结束后关闭连接
+    
+    由worker通过Redis发布订阅推送进度，替代客户端轮询 /status/{task_id}。
+    """
+    await _check_task_owner(task_id, current_user)
+    
+    async def event_stream():
+        pubsub = cache_manager.pubsub()
+        # 先订阅再读取当前状态，避免错过两者之间发布的事件
+        await pubsub.subscribe(task_channel(task_id))
+        try:
+            current = await run_in_threadpool(task_manager.get_task_status, task_id)
+            yield _sse_event(current)
+            if current["state"] in states.READY_STATES:
+                return
+            
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=TASK_STREAM_HEARTBEAT
+                )
+                if message is None:
+                    yield b": ping\n\n"
+                    continue
+                event = msgpack.unpackb(message["data"], raw=False)
+                yield _sse_event(event)
+                if event.get("state") in states.READY_STATES:
+                    return
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.reset()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.delete("/cancel/{task_id}")
 async def cancel_task(
     task_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """取消任务"""
+    await _check_task_owner(task_id, current_user)
     try:
-        success = task_manager.cancel_task(task_id)
+        success = await run_in_threadpool(task_manager.cancel_task, task_id)
         if success:
             return {"message": "任务已取消"}
         else:
@@ -2,101 +2,146 @@
 模板相关API
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy import delete, exists, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..core import security
-from ..core.database import get_db
+from ..core.database import get_async_db
+from ..core.http_cache import make_etag, not_modified
+from ..core.pagination import set_next_cursor
+from ..models.chapter import Chapter
 from ..models.template import Template
 from ..models.user import User
 from ..schemas.template import Template as TemplateSchema, TemplateCreate, TemplateUpdate
 
 router = APIRouter()
 
-def get_templates(
-    db: Session, 
+async def get_templates(
+    db: AsyncSession, 
     skip: int = 0, 
     limit: int = 100,
     template_type: Optional[str] = None,
-    is_default: Optional[bool] = None
+    is_default: Optional[bool] = None,
+    after_id: Optional[int] = None
 ):
-    """获取模板列表"""
-    query = db.query(Template)
+    """获取模板列表（提供after_id时使用键集分页并忽略skip）"""
+    query = select(Template).order_by(Template.id)
     
     if template_type:
-        query = query.filter(Template.template_type == template_type)
+        query = query.where(Template.template_type == template_type)
     if is_default is not None:
-        query = query.filter(Template.is_default == is_default)
+        query = query.where(Template.is_default == is_default)
+    if after_id is not None:
+        query = query.where(Template.id > after_id)
+    else:
+        query = query.offset(skip)
+    
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+async def get_templates_version(
+    db: AsyncSession,
+    template_type: Optional[str] = None,
+    is_default: Optional[bool] = None
+):
+    """获取模板列表的版本信息（版本号之和、数量、最大ID），用于生成ETag
     
-    return query.offset(skip).limit(limit).all()
+    任何修改都会使版本号之和增大，新增会改变最大ID，删除会改变数量
+    """
+    query = select(func.coalesce(func.sum(Template.row_version), 0), func.count(Template.id), func.max(Template.id))
+    if template_type:
+        query = query.where(Template.template_type == template_type)
+    if is_default is not None:
+        query = query.where(Template.is_default == is_default)
+    result = await db.execute(query)
+    return tuple(result.one())
 
-def get_template(db: Session, template_id: int):
+async def get_template(db: AsyncSession, template_id: int):
     """获取单个模板"""
-    return db.query(Template).filter(Template.id == template_id).first()
+    result = await db.execute(select(Template).where(Template.id == template_id))
+    return result.scalar_one_or_none()
 
-def create_template(db: Session, template: TemplateCreate, author_id: Optional[int] = None):
+async def create_template(db: AsyncSession, template: TemplateCreate, author_id: Optional[int] = None):
     """创建模板"""
-    # 如果设置为默认模板，则取消其他同类型模板的默认状态
+    # 如果设置为默认模板，则取消其他同类型模板的默认状态（与插入在同一事务中提交）
     if template.is_default:
-        db.query(Template).filter(
-            Template.template_type == template.template_type,
-            Template.is_default == True
-        ).update({"is_default": False})
+        await db.execute(
+            update(Template)
+            .where(
+                Template.template_type == template.template_type,
+                Template.is_default == True
+            )
+            .values(is_default=False)
+            .execution_options(synchronize_session=False)
+        )
     
-    db_template = Template(**template.dict(), author_id=author_id)
+    db_template = Template(**template.model_dump(), author_id=author_id)
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
     return db_template
 
-def update_template(db: Session, template_id: int, template: TemplateUpdate):
+async def update_template(db: AsyncSession, template_id: int, template: TemplateUpdate):
     """更新模板"""
-    db_template = get_template(db, template_id=template_id)
+    update_data = template.model_dump(exclude_unset=True)
+    if not update_data:
+        return await get_template(db, template_id=template_id)
+    
+    # UPDATE ... RETURNING 一次往返完成更新并取回结果，无需先查询模板
+    result = await db.execute(
+        update(Template)
+        .where(Template.id == template_id)
+        .values(**update_data)
+        .returning(Template)
+    )
+    db_template = result.scalar_one_or_none()
     if not db_template:
         return None
     
-    update_data = template.dict(exclude_unset=True)
-    
     # 如果更新为默认模板，则取消其他同类型模板的默认状态
     if update_data.get('is_default', False):
-        db.query(Template).filter(
-            Template.template_type == (update_data.get('template_type') or db_template.template_type),
-            Template.is_default == True,
-            Template.id != template_id
-        ).update({"is_default": False})
-    
-    for field, value in update_data.items():
-        setattr(db_template, field, value)
+        await db.execute(
+            update(Template)
+            .where(
+                Template.template_type == db_template.template_type,
+                Template.is_default == True,
+                Template.id != template_id
+            )
+            .values(is_default=False)
+            .execution_options(synchronize_session=False)
+        )
     
-    db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
     return db_template
 
-def delete_template(db: Session, template_id: int):
+async def delete_template(db: AsyncSession, template_id: int):
     """删除模板"""
-    db_template = get_template(db, template_id=template_id)
+    # 检查是否有章节在使用此模板，EXISTS在命中第一行时即停止扫描
+    in_use = await db.scalar(select(exists().where(Chapter.template_id == template_id)))
+    if in_use:
+        return "in_use"
+    
+    # 未被使用的模板没有关联章节，直接 DELETE ... RETURNING，无需加载模板及其章节
+    result = await db.execute(
+        delete(Template)
+        .where(Template.id == template_id)
+        .returning(Template)
+    )
+    db_template = result.scalar_one_or_none()
     if not db_template:
         return None
     
-    # 检查是否有章节在使用此模板
-    from ..models.chapter import Chapter
-    chapter_count = db.query(Chapter).filter(Chapter.template_id == template_id).count()
-    if chapter_count > 0:
-        return "in_use"
-    
-    db.delete(db_template)
-    db.commit()
+    await db.commit()
     return db_template
 
 @router.post("/", response_model=TemplateSchema, status_code=status.HTTP_201_CREATED)
-def create_template_endpoint(
+async def create_template_endpoint(
     template: TemplateCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """创建新模板"""
-    db_template = create_template(
+    db_template = await create_template(
         db=db, 
         template=template,
         author_id=current_user.id
@@ -105,57 +150,69 @@ def create_template_endpoint(
         raise HTTPException(status_code=400, detail="创建模板失败")
     return db_template
 
-@router.get("/", response_model=List[TemplateSchema])
-def read_templates(
+@router.get("/", response_model=List[TemplateSchema], response_model_exclude_none=True)
+async def read_templates(
+    request: Request,
+    response: Response,
     template_type: Optional[str] = None,
     is_default: Optional[bool] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取模板列表"""
-    templates = get_templates(
+    # 模板很少变化，先用聚合查询计算ETag，未变化时直接返回304而不查询和序列化列表
+    version = await get_templates_version(db, template_type=template_type, is_default=is_default)
+    etag = make_etag(*version, template_type, is_default, skip, limit, after_id)
+    cached_response = not_modified(request, response, etag)
+    if cached_response is not None:
+        return cached_response
+    
+    templates = await get_templates(
         db, 
         template_type=template_type,
         is_default=is_default,
         skip=skip, 
-        limit=limit
+        limit=limit,
+        after_id=after_id
     )
+    set_next_cursor(response, templates, limit)
     return templates
 
 @router.get("/{template_id}", response_model=TemplateSchema)
-def read_template(
+async def read_template(
     template_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """获取指定模板"""
-    db_template = get_template(db, template_id=template_id)
+    db_template = await get_template(db, template_id=template_id)
     if db_template is None:
         raise HTTPException(status_code=404, detail="模板不存在")
     return db_template
 
 @router.put("/{template_id}", response_model=TemplateSchema)
-def update_template_endpoint(
+async def update_template_endpoint(
     template_id: int,
     template: TemplateUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_superuser)
 ):
     """更新模板信息（管理员）"""
-    db_template = update_template(db=db, template_id=template_id, template=template)
+    db_template = await update_template(db=db, template_id=template_id, template=template)
     if db_template is None:
         raise HTTPException(status_code=404, detail="模板不存在")
     return db_template
 
 @router.delete("/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_template_endpoint(
+async def delete_template_endpoint(
     template_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_superuser)
 ):
     """删除模板（管理员）"""
-    result = delete_template(db=db, template_id=template_id)
+    result = await delete_template(db=db, template_id=template_id)
     if result is None:
         raise HTTPException(status_code=404, detail="模板不存在")
     if result == "in_use":
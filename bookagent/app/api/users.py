@@ -1,34 +1,75 @@
 """
 用户相关API
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from ..core import security
-from ..core.database import get_db
+from ..core.database import get_async_db
+from ..core.http_cache import make_etag, not_modified
+from ..core.pagination import set_next_cursor
 from ..models.user import User
 from ..schemas.user import User as UserSchema, UserCreate, UserUpdate
 
 router = APIRouter()
 
-def get_user(db: Session, user_id: int):
+async def get_user(db: AsyncSession, user_id: int):
     """获取单个用户"""
-    return db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).where(User.id == user_id))
+    return result.scalar_one_or_none()
 
-def get_user_by_username(db: Session, username: str):
+async def get_user_by_username(db: AsyncSession, username: str):
     """根据用户名获取用户"""
-    return db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalar_one_or_none()
 
-def get_user_by_email(db: Session, email: str):
+async def get_user_by_email(db: AsyncSession, email: str):
     """根据邮箱获取用户"""
-    return db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalar_one_or_none()
+
+async def get_user_conflict(db: AsyncSession, username: str, email: str):
+    """一次查询检查用户名和邮箱是否已被占用，返回 (用户名冲突, 邮箱冲突)"""
+    result = await db.execute(
+        select(User.username, User.email)
+        .where(or_(User.username == username, User.email == email))
+        .limit(2)
+    )
+    rows = result.all()
+    return (
+        any(row.username == username for row in rows),
+        any(row.email == email for row in rows)
+    )
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    """获取用户列表"""
-    return db.query(User).offset(skip).limit(limit).all()
+def _raise_user_conflict(hit_username: bool, hit_email: bool):
+    """根据冲突字段抛出相应的400错误"""
+    if hit_username:
+        raise HTTPException(
+            status_code=400,
+            detail="用户名已存在"
+        )
+    if hit_email:
+        raise HTTPException(
+            status_code=400,
+            detail="邮箱已存在"
+        )
 
-def create_user(db: Session, user: UserCreate):
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    """获取用户列表（提供after_id时使用键集分页并忽略skip）"""
+    query = select(User).order_by(User.id)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    else:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+async def create_user(db: AsyncSession, user: UserCreate):
     """创建用户"""
     db_user = User(
         email=user.email,
@@ -36,21 +77,22 @@ def create_user(db: Session, user: UserCreate):
         full_name=user.full_name,
         is_superuser=user.is_superuser
     )
-    db_user.set_password(user.password)
+    # 密码哈希是CPU密集操作，放到线程池执行
+    await db_user.aset_password(user.password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return db_user
 
-def update_user(db: Session, user_id: int, user: UserUpdate):
+async def update_user(db: AsyncSession, user_id: int, user: UserUpdate):
     """更新用户"""
-    db_user = get_user(db, user_id=user_id)
+    db_user = await get_user(db, user_id=user_id)
     if not db_user:
         return None
     
-    update_data = user.dict(exclude_unset=True)
+    username = db_user.username
+    update_data = user.model_dump(exclude_unset=True)
     if "password" in update_data:
-        hashed_password = security.get_password_hash(update_data["password"])
+        hashed_password = await run_in_threadpool(security.get_password_hash, update_data["password"])
         del update_data["password"]
         update_data["hashed_password"] = hashed_password
     
@@ -58,101 +100,114 @@ def update_user(db: Session, user_id: int, user: UserUpdate):
         setattr(db_user, field, value)
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await security.invalidate_user_cache(username)
     return db_user
 
-def delete_user(db: Session, user_id: int):
+async def delete_user(db: AsyncSession, user_id: int):
     """删除用户"""
-    db_user = get_user(db, user_id=user_id)
+    # 删除时ORM需要处理关联的图书和模板，异步会话中须预先加载
+    result = await db.execute(
+        select(User)
+        .options(selectinload(User.books), selectinload(User.templates))
+        .where(User.id == user_id)
+    )
+    db_user = result.scalar_one_or_none()
     if not db_user:
         return None
-    db.delete(db_user)
-    db.commit()
+    username = db_user.username
+    await db.delete(db_user)
+    await db.commit()
+    await security.invalidate_user_cache(username)
     return db_user
 
 @router.post("/users/", response_model=UserSchema, status_code=status.HTTP_201_CREATED)
-def create_user_endpoint(
+async def create_user_endpoint(
     user: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_superuser)
 ):
     """创建新用户（管理员）"""
-    db_user = get_user_by_username(db, username=user.username)
-    if db_user:
-        raise HTTPException(
-            status_code=400,
-            detail="用户名已存在"
-        )
-    db_user = get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(
-            status_code=400,
-            detail="邮箱已存在"
-        )
-    return create_user(db=db, user=user)
-
-@router.get("/users/", response_model=List[UserSchema])
-def read_users(
+    _raise_user_conflict(*await get_user_conflict(db, user.username, user.email))
+    try:
+        return await create_user(db=db, user=user)
+    except IntegrityError:
+        # 并发注册时预检查可能放行，由数据库唯一约束兜底
+        await db.rollback()
+        _raise_user_conflict(*await get_user_conflict(db, user.username, user.email))
+        raise
+
+@router.get("/users/", response_model=List[UserSchema], response_model_exclude_none=True)
+async def read_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_superuser)
 ):
     """获取用户列表（管理员）"""
-    users = get_users(db, skip=skip, limit=limit)
+    users = await get_users(db, skip=skip, limit=limit, after_id=after_id)
+    set_next_cursor(response, users, limit)
     return users
 
 @router.get("/users/me", response_model=UserSchema)
-def read_user_me(
+async def read_user_me(
+    request: Request,
+    response: Response,
     current_user: User = Depends(security.get_current_active_user)
 ):
     """获取当前用户信息"""
+    # 认证依赖已取得用户（更新和删除时会清除其缓存），ETag和响应内容都直接由它生成，无需再查询数据库
+    etag = make_etag(current_user.id, current_user.row_version)
+    cached_response = not_modified(request, response, etag, cache_control="private, no-cache")
+    if cached_response is not None:
+        return cached_response
     return current_user
 
 @router.get("/users/{user_id}", response_model=UserSchema)
-def read_user(
+async def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_superuser)
 ):
     """获取指定用户信息（管理员）"""
-    db_user = get_user(db, user_id=user_id)
+    db_user = await get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="用户不存在")
     return db_user
 
 @router.put("/users/me", response_model=UserSchema)
-def update_user_me(
+async def update_user_me(
     user: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_user)
 ):
     """更新当前用户信息"""
-    return update_user(db=db, user_id=current_user.id, user=user)
+    return await update_user(db=db, user_id=current_user.id, user=user)
 
 @router.put("/users/{user_id}", response_model=UserSchema)
-def update_user_endpoint(
+async def update_user_endpoint(
     user_id: int,
     user: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_superuser)
 ):
     """更新指定用户信息（管理员）"""
-    db_user = get_user(db, user_id=user_id)
+    db_user = await get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="用户不存在")
-    return update_user(db=db, user_id=user_id, user=user)
+    return await update_user(db=db, user_id=user_id, user=user)
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user_endpoint(
+async def delete_user_endpoint(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(security.get_current_active_superuser)
 ):
     """删除用户（管理员）"""
-    db_user = get_user(db, user_id=user_id)
+    db_user = await get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="用户不存在")
-    delete_user(db=db, user_id=user_id)
+    await delete_user(db=db, user_id=user_id)
     return {"ok": True}
@@ -2,32 +2,168 @@
 缓存管理模块
 提供Redis缓存功能和装饰器
 """
-import json
-import pickle
-import hashlib
-from typing import Any, Optional, Union, Callable
+import asyncio
+import uuid
+import orjson
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from functools import wraps
+import msgpack
 import redis.asyncio as redis
+import xxhash
+from cachetools import TTLCache
+from pydantic import BaseModel
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 缓存值编码格式的版本前缀，更换编码时无需清空Redis
+_MSGPACK_V1 = b"\x01"
+
+# 只有锁的持有者才能释放锁（比较令牌后删除）
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+# 等待其他进程计算结果时的轮询间隔(秒)
+_LOCK_POLL_INTERVAL = 0.5
+
+# 转换MessagePack不支持的类型时使用的orjson选项
+_ORJSON_FALLBACK_OPTIONS = (
+    orjson.OPT_NAIVE_UTC
+    | orjson.OPT_SERIALIZE_NUMPY
+    | orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_UTC_Z
+)
+
+def _msgpack_default(value: Any) -> Any:
+    """将datetime、UUID、numpy数组、Pydantic模型等转换为MessagePack可编码的值"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return orjson.loads(orjson.dumps(value, option=_ORJSON_FALLBACK_OPTIONS))
+
+def _dumps(value: Any) -> bytes:
+    """序列化缓存值（版本前缀 + MessagePack）"""
+    return _MSGPACK_V1 + msgpack.packb(value, use_bin_type=True, default=_msgpack_default)
+
+def _loads(value: bytes) -> Any:
+    """反序列化缓存值，兼容没有版本前缀的旧JSON缓存"""
+    if value[:1] == _MSGPACK_V1:
+        return msgpack.unpackb(value[1:], raw=False, strict_map_key=False)
+    return orjson.loads(value)
+
+def _mark_retrieved(future: asyncio.Future):
+    """读取已完成future的异常，没有等待者时也不会产生"Future exception was never retrieved"警告"""
+    if not future.cancelled():
+        future.exception()
+
+async def single_flight(
+    inflight: Dict[str, asyncio.Future],
+    key: str,
+    factory: Callable[[], Awaitable[Any]]
+) -> Any:
+    """相同键的并发调用只执行一次，其余调用等待并共享其结果
+    
+    执行者失败时，等待者收到同一个异常；执行者被取消（如客户端断开连接）时，
+    等待者不会跟着被取消，而是重新检查并由其中一个接替执行。
+    
+    Args:
+        inflight: 正在执行中的调用，键为调用标识
+        key: 本次调用的标识
+        factory: 创建实际执行协程的函数
+    """
+    while True:
+        future = inflight.get(key)
+        if future is None:
+            break
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                # 被取消的是当前调用自身
+                raise
+    
+    future = asyncio.get_running_loop().create_future()
+    future.add_done_callback(_mark_retrieved)
+    inflight[key] = future
+    try:
+        result = await factory()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        if inflight.get(key) is future:
+            del inflight[key]
+
 class CacheManager:
     """缓存管理器"""
     
+    __slots__ = ("redis_client", "pubsub_client", "_inflight", "_stats")
+    
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
+        # 发布订阅使用独立的连接池：每个订阅在整个订阅期间独占一个连接，不能挤占缓存读写的连接
+        self.pubsub_client: Optional[redis.Redis] = None
+        # 正在执行中的缓存函数调用，相同键的并发调用共享同一次执行
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 缓存装饰器各层的命中统计
+        self._stats: Dict[str, int] = {"l1_hit": 0, "l2_hit": 0, "miss": 0}
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """缓存装饰器的命中统计：l1_hit为进程内命中，l2_hit为Redis命中，miss为未命中"""
+        return dict(self._stats)
+    
+    def init(self, max_connections: Optional[int] = None):
+        """创建共享连接池的Redis客户端，应用启动时调用
+        
+        Args:
+            max_connections: 连接池最大连接数，默认使用配置值
+        """
+        if self.redis_client is not None:
+            return
+        # 缓存值为二进制编码，不做响应解码
+        pool = redis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=max_connections or settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=False
+        )
+        self.redis_client = redis.Redis(connection_pool=pool)
+    
+    async def close(self):
+        """关闭Redis客户端及其连接池"""
+        if self.redis_client is not None:
+            await self.redis_client.close()
+            await self.redis_client.connection_pool.disconnect()
+            self.redis_client = None
+        if self.pubsub_client is not None:
+            await self.pubsub_client.close()
+            await self.pubsub_client.connection_pool.disconnect()
+            self.pubsub_client = None
     
     async def get_redis_client(self) -> redis.Redis:
-        """获取Redis客户端"""
-        if not self.redis_client:
-            self.redis_client = redis.from_url(
+        """获取Redis客户端（未经应用启动初始化时，如在Celery worker中，首次使用时创建）"""
+        if self.redis_client is None:
+            self.init()
+        return self.redis_client
+    
+    def pubsub(self) -> redis.client.PubSub:
+        """创建使用发布订阅专用连接池的订阅对象（首次使用时创建连接池）"""
+        if self.pubsub_client is None:
+            pool = redis.ConnectionPool.from_url(
                 settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True
+                max_connections=settings.REDIS_PUBSUB_MAX_CONNECTIONS,
+                decode_responses=False
             )
-        return self.redis_client
+            self.pubsub_client = redis.Redis(connection_pool=pool)
+        return self.pubsub_client.pubsub()
     
     async def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
@@ -35,11 +171,23 @@ class CacheManager:
             client = await self.get_redis_client()
             value = await client.get(key)
             if value:
-                return json.loads(value)
+                return _loads(value)
         except Exception as e:
             logger.error(f"缓存获取失败: {e}")
         return None
     
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """批量获取缓存值，一次往返取回所有键，未命中的位置为None"""
+        if not keys:
+            return []
+        try:
+            client = await self.get_redis_client()
+            values = await client.mget(keys)
+            return [_loads(value) if value else None for value in values]
+        except Exception as e:
+            logger.error(f"缓存批量获取失败: {e}")
+        return [None] * len(keys)
+    
     async def set(
         self, 
         key: str, 
@@ -49,7 +197,7 @@ class CacheManager:
         """设置缓存值"""
         try:
             client = await self.get_redis_client()
-            serialized_value = json.dumps(value, ensure_ascii=False)
+            serialized_value = _dumps(value)
             return await client.set(key, serialized_value, ex=expire)
         except Exception as e:
             logger.error(f"缓存设置失败: {e}")
@@ -64,6 +212,43 @@ class CacheManager:
             logger.error(f"缓存删除失败: {e}")
             return False
     
+    async def acquire_lock(self, key: str, ttl: int) -> Optional[str]:
+        """获取跨进程的互斥锁
+        
+        Returns:
+            获取成功时返回用于释放锁的令牌；锁已被其他进程持有时返回None。
+            Redis不可用时视为获取成功，调用方照常执行。
+        """
+        token = uuid.uuid4().hex
+        try:
+            client = await self.get_redis_client()
+            if not await client.set(key, token, nx=True, ex=ttl):
+                return None
+        except Exception as e:
+            logger.error(f"获取缓存锁失败: {e}")
+        return token
+    
+    async def release_lock(self, key: str, token: str):
+        """释放互斥锁（锁已过期并被其他进程获取时不做任何操作）"""
+        try:
+            client = await self.get_redis_client()
+            await client.eval(_RELEASE_LOCK_SCRIPT, 1, key, token)
+        except Exception as e:
+            logger.error(f"释放缓存锁失败: {e}")
+    
+    async def wait_for(self, key: str, lock_key: str, timeout: float) -> Optional[Any]:
+        """等待持有锁的其他进程写入缓存值，锁释放或超时仍未写入时返回None"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(_LOCK_POLL_INTERVAL)
+            value = await self.get(key)
+            if value is not None:
+                return value
+            if not await self.exists(lock_key):
+                return None
+        return None
+    
     async def exists(self, key: str) -> bool:
         """检查缓存是否存在"""
         try:
@@ -76,35 +261,119 @@ class CacheManager:
 # 全局缓存管理器实例
 cache_manager = CacheManager()
 
+# 请求模型中参与缓存键计算的字段
+CACHE_KEY_FIELDS = {"model", "temperature", "max_tokens", "messages"}
+
+def _cache_key_default(value: Any) -> Any:
+    """序列化缓存键中orjson不能直接处理的参数
+    
+    Raises:
+        TypeError: 参数无法确定性地序列化（如任意对象、被装饰方法的self），
+            按类型名或实例地址计算缓存键会使不同参数的调用互相命中或永不命中
+    """
+    if isinstance(value, BaseModel):
+        # 只提取与缓存相关的字段；不含这些字段的模型按全部字段计算
+        fields = CACHE_KEY_FIELDS & set(type(value).model_fields)
+        return value.model_dump(include=fields or None)
+    raise TypeError(f"无法用于计算缓存键的参数类型: {type(value).__qualname__}")
+
 def cache_key(*args, **kwargs) -> str:
     """生成缓存键"""
-    key_data = str(args) + str(sorted(kwargs.items()))
-    return hashlib.md5(key_data.encode()).hexdigest()
+    hasher = xxhash.xxh3_128()
+    hasher.update(orjson.dumps(args, default=_cache_key_default))
+    hasher.update(orjson.dumps(
+        kwargs,
+        default=_cache_key_default,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+    ))
+    return hasher.hexdigest()
 
-def cached(expire: int = 3600, key_prefix: str = ""):
+def cached(
+    expire: int = 3600,
+    key_prefix: str = "",
+    local_size: Optional[int] = None,
+    lock_timeout: int = 0,
+    key_builder: Optional[Callable[..., Tuple[tuple, dict]]] = None
+):
     """缓存装饰器
     
+    先查进程内LRU缓存，再查Redis；Redis命中的结果同时放入进程内缓存。
+    进程内条目与Redis使用相同的过期时间，不会比Redis中的结果存活更久。
+    进程内相同键的并发调用只执行一次；设置lock_timeout时，
+    多个进程(如多个Celery worker)之间也通过Redis锁只执行一次，其余进程等待结果写入缓存。
+    
     Args:
         expire: 过期时间(秒)
         key_prefix: 键前缀
+        local_size: 进程内缓存的最大条目数，默认使用配置值，为0时不使用进程内缓存
+        lock_timeout: 跨进程锁的过期时间(秒)，应大于函数的最长执行时间，为0时不加锁
+        key_builder: 将调用参数规范化为 (args, kwargs) 后再计算缓存键，使等价的调用命中同一缓存；
+            装饰实例方法时应在此去掉self等无法序列化的参数
     """
+    local_size = settings.LOCAL_CACHE_SIZE if local_size is None else local_size
+    
     def decorator(func: Callable):
+        local: Optional[TTLCache] = TTLCache(maxsize=local_size, ttl=expire) if local_size else None
+        stats = cache_manager._stats
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # 生成缓存键
-            cache_key_str = f"{key_prefix}:{func.__name__}:{cache_key(*args, **kwargs)}"
+            if key_builder is not None:
+                key_args, key_kwargs = key_builder(*args, **kwargs)
+            else:
+                key_args, key_kwargs = args, kwargs
+            cache_key_str = f"{key_prefix}:{func.__name__}:{cache_key(*key_args, **key_kwargs)}"
             
-            # 尝试从缓存获取
+            # 进程内缓存命中时无需访问Redis
+            if local is not None:
+                cached_result = local.get(cache_key_str)
+                if cached_result is not None:
+                    stats["l1_hit"] += 1
+                    return cached_result
+            
+            # 尝试从Redis获取
             cached_result = await cache_manager.get(cache_key_str)
             if cached_result is not None:
+                stats["l2_hit"] += 1
                 logger.info(f"缓存命中: {cache_key_str}")
+                if local is not None:
+                    local[cache_key_str] = cached_result
                 return cached_result
+            stats["miss"] += 1
             
-            # 执行函数并缓存结果
-            result = await func(*args, **kwargs)
-            await cache_manager.set(cache_key_str, result, expire)
-            logger.info(f"缓存设置: {cache_key_str}")
+            # 相同键的调用正在执行中时直接等待其结果
+            result = await single_flight(
+                cache_manager._inflight,
+                cache_key_str,
+                lambda: compute(cache_key_str, args, kwargs)
+            )
             
+            if local is not None:
+                local[cache_key_str] = result
             return result
+        
+        async def compute(cache_key_str: str, args: tuple, kwargs: dict) -> Any:
+            """执行函数并写入Redis；其他进程正在计算同一个键时等待其结果"""
+            lock_key = f"{cache_key_str}:lock"
+            token = None
+            if lock_timeout:
+                token = await cache_manager.acquire_lock(lock_key, lock_timeout)
+                if token is None:
+                    result = await cache_manager.wait_for(cache_key_str, lock_key, lock_timeout)
+                    if result is not None:
+                        return result
+                    # 持有锁的进程失败或超时，由当前进程自行计算
+                    token = await cache_manager.acquire_lock(lock_key, lock_timeout)
+            try:
+                result = await func(*args, **kwargs)
+                # 先写入缓存再释放锁，等待中的进程释放锁后一定能读到结果
+                await cache_manager.set(cache_key_str, result, expire)
+                logger.info(f"缓存设置: {cache_key_str}")
+                return result
+            finally:
+                if token is not None:
+                    await cache_manager.release_lock(lock_key, token)
+        
         return wrapper
     return decorator
\ No newline at end of file
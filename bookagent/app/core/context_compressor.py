@@ -0,0 +1,91 @@
+"""
+上下文压缩模块
+章节生成的上下文(如前文摘要)过长时，只保留与章节标题最相关的句子，减少提示词token数
+"""
+import asyncio
+import logging
+import re
+from typing import List, Optional
+
+import xxhash
+from cachetools import LRUCache
+
+from .config import settings
+from .semantic_cache import semantic_cache
+
+logger = logging.getLogger(__name__)
+
+# 按中英文句末标点和换行切分句子，标点保留在句子末尾；
+# 英文标点后须有空白才切分，避免拆开小数、版本号、文件名和缩写(如 3.14、v1.2、e.g.)
+_SENTENCE_SPLIT = re.compile(r"(?<=[。！？；])\s*|(?<=[.!?;])\s+|\n+")
+# 以中日韩文字或全角标点结尾的句子，与下一句之间不需要空格
+_CJK_END = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]$")
+
+def _split_sentences(text: str) -> List[str]:
+    """切分句子，去掉空白句"""
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT.split(text) if sentence and sentence.strip()]
+
+def _join_sentences(sentences: List[str]) -> str:
+    """拼接句子：中文句子直接相连，其他句子之间用空格分隔"""
+    parts = []
+    for i, sentence in enumerate(sentences):
+        if i and not _CJK_END.search(sentences[i - 1]):
+            parts.append(" ")
+        parts.append(sentence)
+    return "".join(parts)
+
+def _bigrams(text: str) -> set:
+    """字符二元组集合，用于无句向量模型时的词面相似度"""
+    text = text.lower()
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+class ContextCompressor:
+    """抽取式上下文压缩器
+
+    按与查询(章节标题)的相关度给句子打分，在字符预算内保留得分最高的句子，
+    并按原文顺序拼接。安装了句向量模型时使用余弦相似度，否则使用字符二元组重合度。
+    压缩结果按(上下文, 查询)缓存在进程内。
+    """
+
+    def __init__(self, max_chars: Optional[int] = None, cache_size: int = 256):
+        self.max_chars = max_chars or settings.CONTEXT_MAX_CHARS
+        self._cache: LRUCache = LRUCache(maxsize=cache_size)
+
+    async def compress(self, context: str, query: str) -> str:
+        """压缩上下文，长度未超过预算时原样返回"""
+        if len(context) <= self.max_chars:
+            return context
+        key = xxhash.xxh3_128_hexdigest(f"{query}\0{context}".encode())
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            return compressed
+
+        sentences = _split_sentences(context)
+        scores = await self._score(sentences, query)
+        # 按得分从高到低选取句子，直到用完字符预算（每句按多一个分隔空格计算）
+        selected = []
+        used = 0
+        for i in sorted(range(len(sentences)), key=scores.__getitem__, reverse=True):
+            if used + len(sentences[i]) + 1 > self.max_chars:
+                continue
+            selected.append(i)
+            used += len(sentences[i]) + 1
+        compressed = _join_sentences([sentences[i] for i in sorted(selected)]) or context[:self.max_chars]
+
+        self._cache[key] = compressed
+        logger.debug("Context compressed from %d to %d chars", len(context), len(compressed))
+        return compressed
+
+    async def _score(self, sentences: List[str], query: str) -> List[float]:
+        """计算每个句子与查询的相关度"""
+        if semantic_cache.enabled:
+            try:
+                vectors = await asyncio.to_thread(semantic_cache.encode, [query, *sentences])
+                return (vectors[1:] @ vectors[0]).tolist()
+            except Exception as e:
+                logger.warning(f"句向量打分失败，改用词面相似度: {e}")
+        query_grams = _bigrams(query)
+        return [len(query_grams & _bigrams(sentence)) / len(query_grams) for sentence in sentences]
+
+# 全局上下文压缩器实例
+context_compressor = ContextCompressor()
@@ -2,13 +2,13 @@
 数据库配置和会话管理
 """
 import logging
-from contextlib import contextmanager
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session, Session as SessionType
+from sqlalchemy.orm import sessionmaker, Session as SessionType
 
 from .config import settings
 
@@ -20,14 +20,51 @@ engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
     pool_recycle=3600,  # 连接池回收时间（秒）
-    pool_size=10,       # 连接池大小
-    max_overflow=20,    # 超过连接池大小后最大连接数
+    pool_size=settings.DB_POOL_SIZE,        # 连接池大小（每个进程）
+    max_overflow=settings.DB_MAX_OVERFLOW,  # 超过连接池大小后最大连接数
+    pool_timeout=10,    # 获取连接的等待超时（秒）
+    pool_use_lifo=True, # 优先复用最近归还的连接，让少量热连接保持活跃
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
     echo=settings.DEBUG,
 )
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_database_url(url: str) -> str:
+    """将同步数据库URL转换为对应的异步驱动URL"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    return url
+
+# 创建异步数据库引擎，数据库I/O不再阻塞事件循环
+_async_engine_options = {
+    "pool_pre_ping": True,
+    "query_cache_size": settings.DB_QUERY_CACHE_SIZE,
+    "echo": settings.DEBUG,
+}
+if not settings.DATABASE_URL.startswith("sqlite"):
+    _async_engine_options.update(
+        pool_recycle=3600,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=10,
+        pool_use_lifo=True,
+    )
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    **_async_engine_options,
+)
+
+# 创建异步会话工厂（提交后不过期对象，便于在响应中继续访问属性）
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # 声明基类
 Base = declarative_base()
 
@@ -35,37 +72,49 @@ Base = declarative_base()
 from ..models import book, chapter, template, user  # noqa
 
 # 数据库连接事件处理
-@event.listens_for(Engine, "before_cursor_execute")
 def before_cursor_execute(conn, cursor, statement, params, context, executemany):
     """SQL执行前记录日志"""
-    if settings.DEBUG:
+    if logger.isEnabledFor(logging.DEBUG):
         logger.debug("Executing SQL: %s", statement)
         if params:
             logger.debug("With parameters: %s", params)
 
+# 仅在调试模式下注册，避免每次执行游标时都调用监听器
+if settings.DEBUG:
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+
 @event.listens_for(Engine, "handle_error")
 def handle_error(context):
     """数据库错误处理"""
     logger.error("Database error: %s", context.original_exception)
 
-@contextmanager
 def get_db() -> Generator[SessionType, None, None]:
     """
-    获取数据库会话的上下文管理器
+    获取同步数据库会话（FastAPI依赖）
     
     Yields:
         Session: SQLAlchemy 数据库会话
     """
-    session = scoped_session(SessionLocal)
+    session = SessionLocal()
     try:
         yield session
-        session.commit()
-    except Exception as e:
-        session.rollback()
-        logger.error("Database error: %s", str(e))
-        raise
     finally:
-        session.remove()
+        session.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    获取异步数据库会话（FastAPI依赖）
+    
+    Yields:
+        AsyncSession: SQLAlchemy 异步数据库会话
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+        except Exception as e:
+            await session.rollback()
+            logger.error("Database error: %s", str(e))
+            raise
 
 def init_db():
     """
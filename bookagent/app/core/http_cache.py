@@ -0,0 +1,34 @@
+"""
+HTTP条件请求工具
+根据ETag处理If-None-Match，资源未变化时直接返回304
+"""
+from typing import Any, Optional
+import xxhash
+from fastapi import Request, Response
+
+def make_etag(*parts: Any) -> str:
+    """根据决定资源版本的各个部分生成弱ETag"""
+    digest = xxhash.xxh3_64_hexdigest("|".join(map(str, parts)).encode())
+    return f'W/"{digest}"'
+
+def not_modified(request: Request, response: Response, etag: str, cache_control: str = "no-cache") -> Optional[Response]:
+    """设置ETag响应头；客户端缓存仍然有效时返回304响应，否则返回None
+
+    Args:
+        request: 当前请求
+        response: 当前响应对象（用于设置正常响应的缓存头）
+        etag: 资源当前的ETag
+        cache_control: Cache-Control响应头，默认要求客户端每次重新验证
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # 弱比较：忽略W/前缀，并支持逗号分隔的多个ETag
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in candidates or etag.removeprefix("W/") in candidates:
+            return Response(
+                status_code=304,
+                headers={"ETag": etag, "Cache-Control": cache_control}
+            )
+    return None
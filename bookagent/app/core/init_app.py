@@ -1,23 +1,37 @@
 """
 应用初始化
 """
+import asyncio
+import atexit
 import logging
+import queue
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
 
 from .config import settings
-from .database import Base, engine, get_db
+from .database import Base, engine
+from .cache import cache_manager
+from .llm import get_llm_client, close_llm_client
 from ..models import user, book, chapter, template  # noqa
 
 # 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-    ]
-)
+# 请求处理中的日志调用只把记录放入队列，由后台线程负责格式化输出，避免日志I/O阻塞事件循环
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, _log_handler, respect_handler_level=True)
+_root_logger = logging.getLogger()
+# 与 logging.basicConfig 一致，根日志器已有处理器时不重复配置
+if not _root_logger.handlers:
+    _root_logger.setLevel(logging.INFO)
+    _root_logger.addHandler(QueueHandler(_log_queue))
+    _log_listener.start()
+    # 进程退出时输出队列中剩余的日志
+    atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 def create_tables():
@@ -26,6 +40,29 @@ def create_tables():
     Base.metadata.create_all(bind=engine)
     logger.info("数据库表创建完成")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时创建共享的LLM客户端和Redis连接池，关闭时释放"""
+    from ..services.ai_service import AIService
+
+    # 整个进程复用同一个HTTP连接池，避免每次请求重新建立TCP/TLS连接
+    app.state.llm_client = await get_llm_client()
+    app.state.ai_service = AIService(client=app.state.llm_client)
+    # 后台预热上游连接，不阻塞启动；任务引用保存在app.state上，避免被垃圾回收
+    if settings.LLM_WARMUP:
+        app.state.llm_warmup = asyncio.create_task(app.state.llm_client.warmup())
+    cache_manager.init()
+    # 启动时生成并缓存OpenAPI文档（包含各请求/响应模型的JSON Schema），避免首个文档请求承担构建开销
+    app.openapi()
+    try:
+        yield
+    finally:
+        warmup = getattr(app.state, "llm_warmup", None)
+        if warmup is not None:
+            warmup.cancel()
+        await close_llm_client()
+        await cache_manager.close()
+
 def register_middleware(app: FastAPI):
     """注册中间件"""
     # CORS 中间件
@@ -61,7 +98,9 @@ def create_application() -> FastAPI:
         version=settings.VERSION,
         docs_url="/api/docs",
         redoc_url="/api/redoc",
-        openapi_url=f"{settings.API_V1_STR}/openapi.json"
+        openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
     )
     
     # 注册中间件
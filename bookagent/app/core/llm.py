@@ -2,18 +2,23 @@
 大语言模型交互模块
 支持所有兼容OpenAI API格式的模型服务
 """
-import os
+import asyncio
+import random
 from typing import Optional, List, Dict, Any, Union, AsyncGenerator
 import httpx
 from pydantic import BaseModel, HttpUrl
 from enum import Enum
-import json
 import logging
+import orjson
 
 from ..core.config import settings
+from ..core.tokens import fit_messages
 
 logger = logging.getLogger(__name__)
 
+# 流式响应结束标记
+_SSE_DONE = object()
+
 class ModelProvider(str, Enum):
     """支持的模型提供商"""
     OPENAI = "openai"
@@ -31,6 +36,11 @@ class LLMConfig(BaseModel):
     max_tokens: int = 2000
     timeout: int = 60
     max_retries: int = 3
+    
+    @property
+    def base_url(self) -> str:
+        """API基础URL的字符串形式"""
+        return str(self.api_base or "https://api.openai.com/v1")
 
 class Message(BaseModel):
     """消息模型"""
@@ -43,6 +53,12 @@ class LLMClient:
     def __init__(self, config: Optional[LLMConfig] = None):
         self.config = config or self._get_default_config()
         self.client = self._init_client()
+        # 配置不变，端点URL和提供商附加参数只需计算一次
+        self._chat_url = self._get_endpoint("chat/completions")
+        self._provider_payload = (
+            {"api-version": self.config.api_version}
+            if self.config.provider == ModelProvider.AZURE else {}
+        )
     
     def _get_default_config(self) -> LLMConfig:
         """获取默认配置"""
@@ -69,10 +85,17 @@ class LLMClient:
         if self.config.provider == ModelProvider.AZURE and self.config.api_version:
             headers["api-version"] = self.config.api_version
         
+        # 单例客户端共享连接池，HTTP/2下并发请求复用少量TLS连接
         return httpx.AsyncClient(
-            base_url=str(self.config.api_base or "https://api.openai.com/v1"),
+            base_url=httpx.URL(self.config.base_url),
             headers=headers,
-            timeout=self.config.timeout,
+            timeout=httpx.Timeout(self.config.timeout, connect=5.0),
+            http2=settings.LLM_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
         )
     
     async def chat_completion(
@@ -98,59 +121,102 @@ class LLMClient:
         Returns:
             响应数据或响应生成器
         """
-        url = self._get_endpoint("chat/completions")
+        url = self._chat_url
+        model = model or self.config.model
+        max_tokens = max_tokens or self.config.max_tokens
+        # 发送前检查提示词长度，超出上下文时裁剪早期对话，避免上游返回400
+        messages = fit_messages(messages, model, max_tokens)
         
         data = {
             "messages": messages,
-            "model": model or self.config.model,
+            "model": model,
             "temperature": temperature if temperature is not None else self.config.temperature,
-            "max_tokens": max_tokens or self.config.max_tokens,
+            "max_tokens": max_tokens,
             "stream": stream,
-            **kwargs
+            **kwargs,
+            **self._provider_payload
         }
         
-        if self.config.provider == ModelProvider.AZURE:
-            data["api-version"] = self.config.api_version
-        
-        logger.debug(f"Sending request to {url}")
+        logger.debug("Sending request to %s", url)
         
         if stream:
             return self._stream_response(url, data)
         else:
             return await self._request(url, data)
     
+    @staticmethod
+    def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """计算重试等待时间：优先使用Retry-After，否则指数退避加随机抖动，避免所有并发请求同时重试"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(30.0, max(0.0, float(retry_after)))
+                except ValueError:
+                    pass
+        return min(30, 0.5 * 2 ** attempt) + random.uniform(0, 0.25)
+    
     async def _request(self, url: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        """发送请求"""
-        for attempt in range(self.config.max_retries):
+        """发送请求，可重试的错误按退避时间重试，重试耗尽时抛出最后一次的异常"""
+        attempts = max(1, self.config.max_retries)
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
             try:
-                response = await self.client.post(url, json=data)
+                response = await self.client.post(url, content=orjson.dumps(data))
                 response.raise_for_status()
-                return response.json()
+                logger.debug("LLM response via %s", response.http_version)
+                return orjson.loads(response.content)
             except httpx.HTTPStatusError as e:
-                if e.response.status_code == 429 and attempt < self.config.max_retries - 1:
-                    logger.warning(f"Rate limited, retrying... (attempt {attempt + 1}/{self.config.max_retries})")
-                    continue
-                logger.error(f"HTTP error: {e.response.text}")
-                raise
-            except Exception as e:
-                logger.error(f"Request failed: {str(e)}")
-                if attempt == self.config.max_retries - 1:
+                status_code = e.response.status_code
+                if last_attempt or (status_code != 429 and status_code < 500):
+                    logger.error("HTTP error: %s", e.response.text)
                     raise
+                logger.warning("HTTP %s, retrying... (attempt %d/%d)", status_code, attempt + 1, attempts)
+                await asyncio.sleep(self._retry_delay(attempt, e.response))
+            except httpx.TransportError as e:
+                logger.error("Request failed: %s", e)
+                if last_attempt:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt))
+        # 循环只会返回或抛出异常
+        raise RuntimeError("LLM request retries exhausted")
     
     async def _stream_response(self, url: str, data: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
         """处理流式响应"""
-        async with self.client.stream("POST", url, json=data) as response:
+        async with self.client.stream("POST", url, content=orjson.dumps(data)) as response:
             response.raise_for_status()
             
-            async for line in response.aiter_lines():
-                if line.startswith("data: "):
-                    data = line[6:].strip()
-                    if data == "[DONE]":
-                        break
-                    try:
-                        yield json.loads(data)
-                    except json.JSONDecodeError:
-                        logger.warning(f"Failed to parse SSE data: {data}")
+            # 直接按字节切分SSE行并用orjson解析，省去逐行解码为str的开销
+            buffer = b""
+            async for chunk in response.aiter_bytes(65536):
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    event = self._parse_sse_line(line)
+                    if event is _SSE_DONE:
+                        return
+                    if event is not None:
+                        yield event
+            
+            event = self._parse_sse_line(buffer)
+            if event is not None and event is not _SSE_DONE:
+                yield event
+    
+    @staticmethod
+    def _parse_sse_line(line: bytes) -> Optional[Any]:
+        """解析一行SSE数据，非data行返回None，结束标记返回_SSE_DONE"""
+        line = line.strip()
+        if not line.startswith(b"data:"):
+            return None
+        payload = line[5:].strip()
+        if payload == b"[DONE]":
+            return _SSE_DONE
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            # 惰性格式化，只有真正输出日志时才转换可能很大的负载
+            logger.warning("Failed to parse SSE data: %r", payload)
+            return None
     
     def _get_endpoint(self, endpoint: str) -> str:
         """获取API端点"""
@@ -158,6 +224,17 @@ class LLMClient:
             return f"openai/deployments/{self.config.model}/{endpoint}?api-version={self.config.api_version}"
         return endpoint
     
+    async def warmup(self):
+        """预先建立到上游服务的连接（DNS解析、TCP/TLS握手、HTTP/2协商），让首个真实请求直接复用
+        
+        只发送不产生模型调用的HEAD请求，响应状态无关紧要；失败只记录日志。
+        """
+        try:
+            response = await self.client.head(self._chat_url, timeout=5.0)
+            logger.debug("LLM connection warmed up (%s, status %s)", response.http_version, response.status_code)
+        except httpx.HTTPError as e:
+            logger.warning("LLM connection warmup failed: %s", e)
+    
     async def close(self):
         """关闭客户端"""
         await self.client.aclose()
@@ -0,0 +1,109 @@
+"""
+LLM响应缓存模块
+在调用模型前先查精确缓存(Redis)；调用方提供语义匹配文本时，再查语义缓存(本地句向量索引)
+"""
+import logging
+from typing import Any, Dict, List, Optional
+import orjson
+import xxhash
+
+from .cache import cache_manager
+from .config import settings
+from .semantic_cache import semantic_cache
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """LLM补全响应的两级缓存
+
+    精确层以模型、消息、温度和token上限的哈希为键，存放在Redis中；
+    语义层默认关闭，只有调用方传入semantic_text时才启用。
+    完整消息包含系统提示词和模板文本，各请求之间差异很小，且常常超出句向量模型的输入长度，
+    直接嵌入会使不同请求互相命中，因此semantic_text应只包含请求中用户提供的可变字段(如标题、上下文)。
+    """
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.ttl = ttl or settings.LLM_CACHE_TTL
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int, **kwargs) -> str:
+        """计算精确缓存键"""
+        payload = orjson.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "extra": kwargs,
+            },
+            option=orjson.OPT_SORT_KEYS
+        )
+        return "llm_completion:" + xxhash.xxh3_128_hexdigest(payload)
+
+    @staticmethod
+    def _namespace(model: str, temperature: float, max_tokens: int) -> str:
+        """语义缓存命名空间，只在参数相同的请求之间做近似匹配"""
+        return f"llm_completion:{model}:{temperature}:{max_tokens}"
+
+    @property
+    def hit_ratio(self) -> float:
+        """缓存命中率"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    async def get(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        semantic_text: Optional[str] = None,
+        **kwargs
+    ) -> Optional[Dict[str, Any]]:
+        """查找缓存的补全响应，未命中返回None
+        
+        Args:
+            semantic_text: 语义匹配文本，只应包含用户提供的可变字段；为None时只做精确匹配
+        """
+        response = await cache_manager.get(self.key(model, messages, temperature, max_tokens, **kwargs))
+        if response is None and semantic_text and not kwargs:
+            # 带额外参数(如工具调用)的请求只做精确匹配
+            response = await semantic_cache.lookup(
+                self._namespace(model, temperature, max_tokens),
+                semantic_text
+            )
+        if response is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info("LLM缓存命中 (命中率 %.1f%%, %d/%d)", self.hit_ratio * 100, self.hits, self.hits + self.misses)
+        return response
+
+    async def set(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response: Dict[str, Any],
+        semantic_text: Optional[str] = None,
+        **kwargs
+    ):
+        """缓存补全响应，传入semantic_text时同时加入语义缓存"""
+        await cache_manager.set(
+            self.key(model, messages, temperature, max_tokens, **kwargs),
+            response,
+            expire=self.ttl
+        )
+        if semantic_text and not kwargs:
+            await semantic_cache.add(
+                self._namespace(model, temperature, max_tokens),
+                semantic_text,
+                response,
+                ttl=self.ttl
+            )
+
+# 全局LLM缓存实例
+llm_cache = LLMCache()
@@ -0,0 +1,19 @@
+"""
+分页工具
+"""
+from typing import Any, Sequence
+from fastapi import Response
+
+# 下一页键集分页游标的响应头
+NEXT_CURSOR_HEADER = "X-Next-After-Id"
+
+def set_next_cursor(response: Response, items: Sequence[Any], limit: int):
+    """本页已满时，在响应头中返回下一页的after_id游标
+    
+    Args:
+        response: 当前响应对象
+        items: 本页结果，元素需要有id属性
+        limit: 每页条数
+    """
+    if items and len(items) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = str(items[-1].id)
@@ -0,0 +1,90 @@
+"""
+LLM请求限流模块
+限制并发请求数，并按每分钟请求数/token数进行令牌桶限流
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from .config import settings
+
+class RateLimiter:
+    """LLM请求限流器
+
+    并发数由信号量控制；每分钟请求数和token数使用令牌桶，
+    容量随时间线性恢复，不足时等待而不是直接拒绝。
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None
+    ):
+        self.max_concurrent = max_concurrent or settings.LLM_MAX_CONCURRENCY
+        self.requests_per_minute = requests_per_minute or settings.LLM_REQUESTS_PER_MINUTE
+        self.tokens_per_minute = tokens_per_minute or settings.LLM_TOKENS_PER_MINUTE
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._lock = asyncio.Lock()
+        self._available_requests = float(self.requests_per_minute)
+        self._available_tokens = float(self.tokens_per_minute)
+        self._last_refill = time.monotonic()
+
+    def _refill(self):
+        """按流逝时间恢复令牌桶容量"""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._available_requests = min(
+            float(self.requests_per_minute),
+            self._available_requests + elapsed * self.requests_per_minute / 60
+        )
+        self._available_tokens = min(
+            float(self.tokens_per_minute),
+            self._available_tokens + elapsed * self.tokens_per_minute / 60
+        )
+
+    async def _wait_for_capacity(self, tokens: int):
+        """等待令牌桶中有足够的请求数和token数"""
+        # 单次请求的token数不能超过桶容量，否则永远等不到
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._available_requests >= 1 and self._available_tokens >= tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= tokens
+                    return
+                missing_requests = max(0.0, 1 - self._available_requests)
+                missing_tokens = max(0.0, tokens - self._available_tokens)
+                await asyncio.sleep(max(
+                    missing_requests * 60 / self.requests_per_minute,
+                    missing_tokens * 60 / self.tokens_per_minute
+                ))
+
+    @asynccontextmanager
+    async def limit(self, tokens: int = 0) -> AsyncIterator[None]:
+        """占用一个并发名额及相应的请求/token配额
+
+        Args:
+            tokens: 本次请求预计消耗的token数
+        """
+        async with self._semaphore:
+            await self._wait_for_capacity(tokens)
+            yield
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            await self._wait_for_capacity(0)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._semaphore.release()
+
+# 全局LLM限流器实例
+llm_rate_limiter = RateLimiter()
@@ -1,29 +1,47 @@
 """
 安全相关工具函数
 """
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from typing import Optional, Dict, Any, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..core.cache import cache_manager
 from ..core.config import settings
-from ..models.user import User
+from ..models.user import User, pwd_context
 from ..schemas.token import TokenData
-from ..core.database import get_db
-
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from ..core.database import get_async_db
 
 # OAuth2 方案
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token")
 
+# 已认证用户的短时缓存（Redis，按用户名），减少每个请求的用户查询；
+# 存放在Redis中使所有worker进程共享，用户变更提交后显式删除
+_USER_CACHE_TTL = 30
+# 缓存的用户字段：只包含权限判断所需的字段，不含密码哈希和时间戳
+_USER_CACHE_FIELDS = ("id", "username", "email", "full_name", "is_active", "is_superuser", "row_version")
+
+def _user_cache_key(username: str) -> str:
+    """已认证用户缓存的Redis键"""
+    return f"auth_user:{username}"
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """验证密码，旧算法或旧参数的哈希同时返回新的哈希
+    
+    Returns:
+        (是否验证通过, 需要更新时的新哈希，否则为None)
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     """获取密码哈希"""
     return pwd_context.hash(password)
@@ -43,8 +61,24 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     )
     return encoded_jwt
 
+@lru_cache(maxsize=10_000)
+def _decode_token(token: str) -> Dict[str, Any]:
+    """解码并校验JWT签名，结果按令牌缓存（过期时间在每次使用时单独检查）"""
+    return jwt.decode(
+        token, 
+        settings.SECRET_KEY, 
+        algorithms=[settings.ALGORITHM]
+    )
+
+async def invalidate_user_cache(username: str):
+    """用户信息（如密码、状态）变更提交后清除其缓存
+    
+    须在事务提交之后调用，否则其他请求可能在提交前重新缓存旧数据
+    """
+    await cache_manager.delete(_user_cache_key(username))
+
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     """获取当前用户"""
@@ -54,11 +88,9 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token, 
-            settings.SECRET_KEY, 
-            algorithms=[settings.ALGORITHM]
-        )
+        payload = _decode_token(token)
+        if payload.get("exp") is not None and payload["exp"] < time.time():
+            raise credentials_exception
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -66,9 +98,21 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == token_data.username).first()
+    cache_key = _user_cache_key(token_data.username)
+    cached_user = await cache_manager.get(cache_key)
+    if cached_user is not None:
+        # 由缓存字段构造的用户对象未关联会话，只供只读的权限判断使用
+        return User(**cached_user)
+    
+    result = await db.execute(select(User).where(User.username == token_data.username))
+    user = result.scalar_one_or_none()
     if user is None:
         raise credentials_exception
+    await cache_manager.set(
+        cache_key,
+        {field: getattr(user, field) for field in _USER_CACHE_FIELDS},
+        expire=_USER_CACHE_TTL
+    )
     return user
 
 async def get_current_active_user(
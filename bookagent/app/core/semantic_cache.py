@@ -0,0 +1,163 @@
+"""
+语义缓存模块
+基于句向量的近似匹配缓存，用于命中措辞不同但语义相同的LLM请求
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # 可选依赖，未安装时语义缓存自动禁用
+    np = None
+    SentenceTransformer = None
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+class _VectorIndex:
+    """单个命名空间内的向量索引及其对应的缓存值和过期时间"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.values: List[Any] = []
+        self.expires: List[float] = []
+        # 向量矩阵始终保留一份，用于清理过期条目后重建FAISS索引
+        self.matrix = np.empty((0, dim), dtype="float32")
+        self.index = faiss.IndexFlatIP(dim) if faiss is not None else None
+        self._next_expiry = float("inf")
+
+    def search(self, vector) -> Optional[tuple]:
+        """返回 (相似度, 值)，索引为空时返回None"""
+        self.prune()
+        if not self.values:
+            return None
+        if self.index is not None:
+            scores, ids = self.index.search(vector.reshape(1, -1), 1)
+            return float(scores[0][0]), self.values[int(ids[0][0])]
+        scores = self.matrix @ vector
+        best = int(scores.argmax())
+        return float(scores[best]), self.values[best]
+
+    def add(self, vector, value: Any, expires_at: float):
+        """添加向量及对应的值"""
+        if self.index is not None:
+            self.index.add(vector.reshape(1, -1))
+        self.matrix = np.vstack([self.matrix, vector])
+        self.values.append(value)
+        self.expires.append(expires_at)
+        self._next_expiry = min(self._next_expiry, expires_at)
+
+    def prune(self, keep_at_most: Optional[int] = None):
+        """删除过期条目；指定keep_at_most时再删除最早的条目直到不超过该数量"""
+        now = time.monotonic()
+        overflow = keep_at_most is not None and len(self.values) > keep_at_most
+        if self._next_expiry > now and not overflow:
+            return
+        keep = [i for i, expires_at in enumerate(self.expires) if expires_at > now]
+        if keep_at_most is not None:
+            keep = keep[len(keep) - keep_at_most:] if len(keep) > keep_at_most else keep
+        self.matrix = self.matrix[keep]
+        self.values = [self.values[i] for i in keep]
+        self.expires = [self.expires[i] for i in keep]
+        self._next_expiry = min(self.expires, default=float("inf"))
+        if self.index is not None:
+            self.index.reset()
+            if keep:
+                self.index.add(self.matrix)
+
+class SemanticCache:
+    """语义缓存管理器
+
+    对文本做归一化句向量编码，用内积(即余弦相似度)查找最近邻，
+    相似度不低于阈值时返回已缓存的结果。条目按TTL过期，
+    命名空间条目数达到上限时淘汰最早的条目。
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        threshold: Optional[float] = None,
+        max_entries: int = 10000
+    ):
+        self.model_name = model_name or settings.SEMANTIC_CACHE_MODEL
+        self.threshold = threshold if threshold is not None else settings.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = max_entries
+        self._model = None
+        self._indexes: Dict[str, _VectorIndex] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """语义缓存是否可用"""
+        return settings.SEMANTIC_CACHE_ENABLED and SentenceTransformer is not None
+
+    def _get_model(self):
+        """懒加载句向量模型（全局只加载一次）"""
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _embed(self, text: str):
+        """计算归一化后的句向量"""
+        vector = self._get_model().encode(text, normalize_embeddings=True)
+        return np.asarray(vector, dtype="float32")
+
+    def encode(self, texts: List[str]):
+        """批量计算归一化句向量（同步调用，耗时较长时应放到线程中执行）"""
+        vectors = self._get_model().encode(texts, normalize_embeddings=True)
+        return np.asarray(vectors, dtype="float32")
+
+    async def lookup(self, namespace: str, text: str) -> Optional[Any]:
+        """查找语义相近的缓存结果"""
+        if not self.enabled:
+            return None
+        index = self._indexes.get(namespace)
+        if index is None:
+            return None
+        try:
+            vector = await asyncio.to_thread(self._embed, text)
+            found = index.search(vector)
+        except Exception as e:
+            logger.error(f"语义缓存查询失败: {e}")
+            return None
+        if found is None:
+            return None
+        score, value = found
+        if score >= self.threshold:
+            logger.info(f"语义缓存命中: {namespace} (相似度 {score:.3f})")
+            return value
+        return None
+
+    async def add(self, namespace: str, text: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """添加缓存条目
+
+        Args:
+            namespace: 命名空间，只在同一命名空间内做近似匹配
+            text: 用于语义匹配的文本
+            value: 缓存值
+            ttl: 过期时间(秒)，默认不过期
+        """
+        if not self.enabled:
+            return False
+        try:
+            vector = await asyncio.to_thread(self._embed, text)
+        except Exception as e:
+            logger.error(f"语义缓存写入失败: {e}")
+            return False
+        index = self._indexes.get(namespace)
+        if index is None:
+            index = self._indexes[namespace] = _VectorIndex(vector.shape[0])
+        index.prune(keep_at_most=self.max_entries - 1)
+        index.add(vector, value, time.monotonic() + ttl if ttl else float("inf"))
+        return True
+
+# 全局语义缓存实例
+semantic_cache = SemanticCache()
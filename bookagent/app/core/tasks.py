@@ -3,11 +3,20 @@
 使用Celery处理长时间运行的任务
 """
 import asyncio
+import uuid
 from typing import Dict, Any, Optional
-from celery import Celery
+import msgpack
+import redis
+from celery import Celery, Task
+from celery.signals import worker_process_init, worker_process_shutdown
 from app.core.config import settings
 import logging
 
+try:
+    import uvloop
+except ImportError:  # Windows等平台不支持uvloop，使用默认事件循环
+    uvloop = None
+
 logger = logging.getLogger(__name__)
 
 # 创建Celery应用
@@ -20,9 +29,13 @@ celery_app = Celery(
 
 # Celery配置
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    # 章节内容可能很大，使用msgpack减小体积并加快编解码；保留json以便旧消息在升级期间正常消费
+    task_serializer="msgpack",
+    accept_content=["msgpack", "json"],
+    result_serializer="msgpack",
+    result_accept_content=["msgpack", "json"],
+    result_compression="gzip",
+    result_extended=False,  # 结果中不保存任务参数
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
@@ -32,7 +45,53 @@ celery_app.conf.update(
     worker_max_tasks_per_child=1000,
 )
 
-@celery_app.task(bind=True)
+def task_channel(task_id: str) -> str:
+    """任务进度事件的Redis发布订阅频道"""
+    return f"task:{task_id}"
+
+def task_owner_key(task_id: str) -> str:
+    """记录任务提交用户的Redis键"""
+    return f"task:owner:{task_id}"
+
+# 任务归属记录的过期时间(秒)，与Celery结果的默认保留时间一致
+TASK_OWNER_TTL = 24 * 3600
+
+# 用于发布进度事件和记录任务归属的同步Redis客户端（首次使用时创建）
+_publisher: Optional[redis.Redis] = None
+
+def _get_publisher() -> redis.Redis:
+    """获取同步Redis客户端"""
+    global _publisher
+    if _publisher is None:
+        _publisher = redis.Redis.from_url(settings.REDIS_URL)
+    return _publisher
+
+def _publish_task_event(task_id: Optional[str], event: Dict[str, Any]):
+    """发布任务事件，失败只记录日志，不影响任务执行"""
+    if not task_id:
+        return
+    try:
+        _get_publisher().publish(task_channel(task_id), msgpack.packb(event, use_bin_type=True))
+    except Exception as e:
+        logger.warning(f"发布任务事件失败: {e}")
+
+class ProgressTask(Task):
+    """更新状态时同时通过Redis发布订阅推送进度事件的任务基类
+    
+    事件格式与 TaskManager.get_task_status 的返回值一致，订阅方无需轮询结果后端。
+    """
+    
+    def update_state(self, task_id=None, state=None, meta=None, **kwargs):
+        super().update_state(task_id=task_id, state=state, meta=meta, **kwargs)
+        _publish_task_event(task_id or self.request.id, {"state": state, **(meta or {})})
+    
+    def on_success(self, retval, task_id, args, kwargs):
+        _publish_task_event(task_id, {"state": "SUCCESS", "result": retval})
+    
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        _publish_task_event(task_id, {"state": "FAILURE", "error": str(exc)})
+
+@celery_app.task(bind=True, base=ProgressTask)
 def generate_book_content_task(self, book_id: int, chapters: list):
     """异步生成图书内容任务"""
     try:
@@ -42,21 +101,7 @@ def generate_book_content_task(self, book_id: int, chapters: list):
             meta={"current": 0, "total": len(chapters), "status": "开始生成内容..."}
         )
         
-        # 这里应该调用实际的内容生成逻辑
-        # 由于是异步任务，需要使用同步版本的AI服务
-        for i, chapter in enumerate(chapters):
-            # 模拟内容生成
-            logger.info(f"正在生成章节: {chapter['title']}")
-            
-            # 更新进度
-            self.update_state(
-                state="PROGRESS",
-                meta={
-                    "current": i + 1,
-                    "total": len(chapters),
-                    "status": f"正在生成章节: {chapter['title']}"
-                }
-            )
+        _run_async(_generate_book_content(self, book_id, chapters))
         
         return {
             "status": "SUCCESS",
@@ -72,7 +117,182 @@ def generate_book_content_task(self, book_id: int, chapters: list):
         )
         raise
 
-@celery_app.task(bind=True)
+# 每个worker进程复用同一个事件循环，保证LLM客户端、Redis连接池等全局异步资源始终绑定在同一循环上
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _run_async(coro):
+    """在worker进程的常驻事件循环中运行协程"""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        # 与API进程一致，优先使用uvloop降低LLM请求和流式读取的事件循环开销
+        _worker_loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coro)
+
+# 流式生成时上报部分内容的最小间隔(秒，整个任务共用，不随并发章节数增加)，以及进度中附带的最近内容长度
+PROGRESS_MIN_INTERVAL = 1.0
+PROGRESS_PARTIAL_CHARS = 512
+# 图书生成每完成多少个章节记录一次进度日志（详细进度已在任务状态中）
+PROGRESS_LOG_INTERVAL = 10
+# 图书生成时累积多少个已完成章节批量写入一次数据库
+CHAPTER_FLUSH_BATCH_SIZE = 10
+
+# 图书生成任务中每个章节可用的生成参数
+_CHAPTER_STREAM_PARAMS = ("title", "style", "language", "length", "context", "use_tables")
+
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    """worker子进程启动时创建LLM客户端并预热连接，之后该进程内的所有任务复用同一个连接池"""
+    from app.core.llm import get_llm_client
+    client = _run_async(get_llm_client())
+    if settings.LLM_WARMUP:
+        _run_async(client.warmup())
+
+@worker_process_shutdown.connect
+def _shutdown_worker_process(**kwargs):
+    """worker子进程退出时关闭共享的LLM客户端，正常关闭连接池中的连接"""
+    from app.core.llm import close_llm_client
+    if _worker_loop is not None and not _worker_loop.is_closed():
+        _run_async(close_llm_client())
+        _worker_loop.close()
+
+async def _generate_book_content(task, book_id: int, chapters: list):
+    """并发流式生成图书各章节，并通过任务状态上报进度和已生成的部分内容
+    
+    同时生成的章节数由 BOOK_GENERATION_CONCURRENCY 限制，整体请求速率仍受全局LLM限流器约束。
+    章节项包含id时，生成结果写回该章节：每完成 CHAPTER_FLUSH_BATCH_SIZE 个章节批量写入一次，
+    任务结束或失败时写入剩余部分，内存中只保留未写入的章节。
+    """
+    # 延迟导入，避免与API模块循环依赖
+    from sqlalchemy import bindparam, update
+    from app.core.database import AsyncSessionLocal
+    from app.models.chapter import Chapter
+    from app.services.ai_service import get_ai_service
+    
+    ai_service = await get_ai_service()
+    total = len(chapters)
+    if not total:
+        return
+    semaphore = asyncio.Semaphore(min(total, settings.BOOK_GENERATION_CONCURRENCY))
+    loop = asyncio.get_running_loop()
+    completed = 0
+    last_progress = 0.0
+    # 已生成但尚未写入数据库的章节内容
+    pending = []
+    # 只更新属于该图书的章节，不存在或不属于该图书的id被忽略
+    write_content = (
+        update(Chapter.__table__)
+        .where(Chapter.id == bindparam("chapter_id"), Chapter.book_id == book_id)
+        .values(content=bindparam("chapter_content"))
+    )
+    
+    async def flush():
+        """将缓冲的章节内容用一条批量UPDATE写回数据库"""
+        if not pending:
+            return
+        rows = pending[:]
+        pending.clear()
+        async with AsyncSessionLocal() as db:
+            await db.execute(write_content, rows)
+            await db.commit()
+    
+    # 任务请求上下文是线程局部的，在线程中上报进度时须显式传入任务id
+    task_id = task.request.id
+    
+    async def report(meta: Dict[str, Any]):
+        """上报进度：写结果后端和发布事件都是同步Redis调用，放到线程中执行，不阻塞其他章节的流式生成"""
+        await asyncio.to_thread(task.update_state, task_id=task_id, state="PROGRESS", meta=meta)
+    
+    async def generate(chapter: Dict[str, Any]):
+        nonlocal completed, last_progress
+        async with semaphore:
+            params = {key: chapter[key] for key in _CHAPTER_STREAM_PARAMS if key in chapter}
+            parts = []
+            async for delta in ai_service.stream_chapter_content(**params):
+                parts.append(delta)
+                now = loop.time()
+                if now - last_progress >= PROGRESS_MIN_INTERVAL:
+                    last_progress = now
+                    await report({
+                        "current": completed,
+                        "total": total,
+                        "status": f"正在生成章节: {chapter['title']}",
+                        "chapter": chapter["title"],
+                        "partial": "".join(parts[-PROGRESS_PARTIAL_CHARS:])[-PROGRESS_PARTIAL_CHARS:]
+                    })
+        if chapter.get("id") is not None:
+            pending.append({"chapter_id": chapter["id"], "chapter_content": "".join(parts)})
+            if len(pending) >= CHAPTER_FLUSH_BATCH_SIZE:
+                await flush()
+        
+        # 每完成一个章节更新一次进度
+        completed += 1
+        if completed % PROGRESS_LOG_INTERVAL == 0 or completed == total:
+            logger.info(
+                "图书生成进度 book_id=%s %s/%s", book_id, completed, total,
+                extra={"book_id": book_id, "done": completed, "total": total}
+            )
+        await report({
+            "current": completed,
+            "total": total,
+            "status": f"已生成章节: {chapter['title']}"
+        })
+    
+    jobs = [asyncio.ensure_future(generate(chapter)) for chapter in chapters]
+    try:
+        await asyncio.gather(*jobs)
+    except BaseException:
+        # 某个章节失败时取消其余章节，避免它们残留在worker的常驻事件循环中
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        raise
+    finally:
+        # 无论成功与否都写入已完成的章节，任务中途失败时不丢失已生成的内容
+        await flush()
+
+async def _generate_chapter(params: Dict[str, Any], chapter_id: Optional[int] = None) -> Dict[str, Any]:
+    """生成章节内容，提供chapter_id时将结果写回该章节"""
+    # 延迟导入，避免与API模块循环依赖
+    from app.api.ai import _generate_chapter_content
+    from app.core.database import AsyncSessionLocal
+    from app.models.chapter import Chapter
+    from app.services.ai_service import get_ai_service
+    
+    result = await _generate_chapter_content(await get_ai_service(), **params)
+    if result["success"] and chapter_id is not None:
+        async with AsyncSessionLocal() as db:
+            chapter = await db.get(Chapter, chapter_id)
+            if chapter is not None:
+                chapter.content = result["content"]
+                await db.commit()
+        result["chapter_id"] = chapter_id
+    return result
+
+@celery_app.task(bind=True, base=ProgressTask)
+def generate_chapter_task(self, params: Dict[str, Any], chapter_id: Optional[int] = None):
+    """异步生成章节内容任务"""
+    try:
+        self.update_state(
+            state="PROGRESS",
+            meta={"current": 0, "total": 1, "status": "正在生成章节内容..."}
+        )
+        
+        result = _run_async(_generate_chapter(params, chapter_id))
+        if not result["success"]:
+            raise RuntimeError(result.get("error", "未知错误"))
+        
+        return result
+        
+    except Exception as exc:
+        logger.error(f"章节内容生成失败: {exc}")
+        self.update_state(
+            state="FAILURE",
+            meta={"error": str(exc)}
+        )
+        raise
+
+@celery_app.task(bind=True, base=ProgressTask)
 def export_book_task(self, book_id: int, format: str = "docx"):
     """异步导出图书任务"""
     try:
@@ -120,16 +340,43 @@ class TaskManager:
     """任务管理器"""
     
     @staticmethod
-    def start_book_generation(book_id: int, chapters: list) -> str:
+    def _submit(task: Task, args: tuple, owner_id: Optional[int]) -> str:
+        """投递任务；指定owner_id时先记录任务归属再投递，任务开始执行前即可校验查询者"""
+        task_id = uuid.uuid4().hex
+        if owner_id is not None:
+            TaskManager.set_task_owner(task_id, owner_id)
+        task.apply_async(args, task_id=task_id)
+        return task_id
+    
+    @staticmethod
+    def start_book_generation(book_id: int, chapters: list, owner_id: Optional[int] = None) -> str:
         """启动图书生成任务"""
-        task = generate_book_content_task.delay(book_id, chapters)
-        return task.id
+        return TaskManager._submit(generate_book_content_task, (book_id, chapters), owner_id)
+    
+    @staticmethod
+    def start_chapter_generation(
+        params: Dict[str, Any],
+        chapter_id: Optional[int] = None,
+        owner_id: Optional[int] = None
+    ) -> str:
+        """启动章节内容生成任务"""
+        return TaskManager._submit(generate_chapter_task, (params, chapter_id), owner_id)
     
     @staticmethod
-    def start_book_export(book_id: int, format: str = "docx") -> str:
+    def start_book_export(book_id: int, format: str = "docx", owner_id: Optional[int] = None) -> str:
         """启动图书导出任务"""
-        task = export_book_task.delay(book_id, format)
-        return task.id
+        return TaskManager._submit(export_book_task, (book_id, format), owner_id)
+    
+    @staticmethod
+    def set_task_owner(task_id: str, owner_id: int):
+        """记录任务的提交用户"""
+        _get_publisher().set(task_owner_key(task_id), owner_id, ex=TASK_OWNER_TTL)
+    
+    @staticmethod
+    def is_task_owner(task_id: str, user_id: int) -> bool:
+        """检查任务是否由指定用户提交（未记录归属的任务视为不属于任何用户）"""
+        owner = _get_publisher().get(task_owner_key(task_id))
+        return owner is not None and int(owner) == user_id
     
     @staticmethod
     def get_task_status(task_id: str) -> Dict[str, Any]:
@@ -146,7 +393,8 @@ class TaskManager:
                 "state": task.state,
                 "current": task.info.get("current", 0),
                 "total": task.info.get("total", 1),
-                "status": task.info.get("status", "")
+                "status": task.info.get("status", ""),
+                "partial": task.info.get("partial")
             }
         elif task.state == "SUCCESS":
             return {
@@ -0,0 +1,95 @@
+"""
+Token计数模块
+在发送请求前估算提示词token数，超出模型上下文时裁剪最早的对话轮次
+"""
+import logging
+from functools import lru_cache
+from typing import Dict, List
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖，未安装时按字符数估算
+    tiktoken = None
+
+# 常见模型的上下文窗口（按前缀匹配，较长的前缀优先）
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+
+# 每条消息的格式开销(token)
+_MESSAGE_OVERHEAD = 4
+# 预留给响应格式等的安全余量(token)
+_SAFETY_MARGIN = 256
+
+def context_window(model: str) -> int:
+    """获取模型的上下文窗口大小，未知模型使用配置值"""
+    for prefix in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return MODEL_CONTEXT_WINDOWS[prefix]
+    return settings.LLM_CONTEXT_WINDOW
+
+@lru_cache(maxsize=32)
+def _get_encoding(model: str):
+    """获取模型对应的编码器（每个模型只加载一次）"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def _estimate_tokens(text: str) -> int:
+    """无tokenizer时的保守估算：非ASCII字符(如中文)约1个token，其余约4个字符1个token"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str) -> List[int]:
+    """计算每条消息的token数"""
+    contents = [message.get("content") or "" for message in messages]
+    if tiktoken is not None:
+        counts = [len(tokens) for tokens in _get_encoding(model).encode_batch(contents)]
+    else:
+        counts = [_estimate_tokens(content) for content in contents]
+    return [count + _MESSAGE_OVERHEAD for count in counts]
+
+def count_text_tokens(text: str, model: str) -> int:
+    """计算单段文本的token数"""
+    if tiktoken is not None:
+        return len(_get_encoding(model).encode(text))
+    return _estimate_tokens(text)
+
+def count_tokens(messages: List[Dict[str, str]], model: str) -> int:
+    """计算消息列表的总token数"""
+    return sum(count_message_tokens(messages, model))
+
+def fit_messages(messages: List[Dict[str, str]], model: str, max_tokens: int) -> List[Dict[str, str]]:
+    """裁剪消息使提示词加输出上限不超过模型上下文
+
+    保留所有系统消息和最后一条消息，从最早的对话轮次开始删除。
+    """
+    budget = context_window(model) - max_tokens - _SAFETY_MARGIN
+    counts = count_message_tokens(messages, model)
+    total = sum(counts)
+    if total <= budget:
+        return messages
+
+    keep = [True] * len(messages)
+    for i, message in enumerate(messages[:-1]):
+        if total <= budget:
+            break
+        if message.get("role") == "system":
+            continue
+        keep[i] = False
+        total -= counts[i]
+
+    if total > budget:
+        logger.warning("提示词约%d个token，超出模型%s的可用预算%d", total, model, budget)
+    else:
+        logger.info("提示词超出上下文预算，已裁剪%d条早期消息", keep.count(False))
+    return [message for message, kept in zip(messages, keep) if kept]
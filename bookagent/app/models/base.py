@@ -1,22 +1,37 @@
 """
 基础模型
 """
-from datetime import datetime
-from sqlalchemy import Column, Integer, DateTime
+from functools import lru_cache
+from sqlalchemy import Column, Integer, DateTime, func, inspect, literal_column
 
 class BaseModel:
     """
     基础模型类，包含所有模型共有的字段
     """
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # 插入和更新时都由数据库填充时间戳，与server_default使用同一时钟
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+    # 每次更新（包括Core的update()语句）都加1；时间戳只有秒级精度，同一秒内的修改需要靠版本号区分
+    row_version = Column(Integer, server_default="1", onupdate=literal_column("row_version") + 1, nullable=False)
+    
+    # 插入和更新时通过RETURNING一并取回服务端生成的时间戳和版本号，避免之后访问属性时再次查询（异步会话中也无法懒加载）
+    __mapper_args__ = {"eager_defaults": True}
+    
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _column_items(cls):
+        """(列名, 属性名) 元组，每个模型类只计算一次
+        
+        列名与属性名可能不同（如 metadata 列映射到 metadata_ 属性）
+        """
+        return tuple(
+            (attr.columns[0].name, attr.key)
+            for attr in inspect(cls).column_attrs
+        )
     
     def to_dict(self):
         """
         将模型转换为字典
         """
-        return {
-            column.name: getattr(self, column.name) 
-            for column in self.__table__.columns
-        }
+        return {name: getattr(self, key) for name, key in type(self)._column_items()}
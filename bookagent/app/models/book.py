@@ -1,7 +1,7 @@
 """
 图书模型
 """
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, Enum, Boolean
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Enum, Boolean, Index
 from sqlalchemy.orm import relationship
 from ..core.database import Base
 from .base import BaseModel
@@ -11,6 +11,10 @@ class Book(Base, BaseModel):
     图书模型
     """
     __tablename__ = "books"
+    __table_args__ = (
+        # 公开图书列表按公开状态和发布状态过滤
+        Index("ix_books_public_status", "is_public", "status"),
+    )
     
     title = Column(String(255), nullable=False, index=True)
     description = Column(Text, nullable=True)
@@ -1,8 +1,8 @@
 """
 章节模型
 """
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, Enum, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Enum, JSON, Index
+from sqlalchemy.orm import deferred, relationship
 from ..core.database import Base
 from .base import BaseModel
 
@@ -11,9 +11,14 @@ class Chapter(Base, BaseModel):
     章节模型
     """
     __tablename__ = "chapters"
+    __table_args__ = (
+        # 章节列表按图书过滤并按顺序排序
+        Index("ix_chapters_book_order", "book_id", "order"),
+    )
     
     title = Column(String(255), nullable=False)
-    content = Column(Text, nullable=True)
+    # 正文可能很大，只在访问或显式undefer时加载，章节目录等列表查询不会读取
+    content = deferred(Column(Text, nullable=True), group="body")
     order = Column(Integer, default=0, nullable=False)
     status = Column(Enum('draft', 'in_review', 'published', 'archived', name='chapter_status'),
                    default='draft', nullable=False)
@@ -21,7 +26,7 @@ class Chapter(Base, BaseModel):
     
     # 外键关系
     book_id = Column(Integer, ForeignKey('books.id', ondelete='CASCADE'), nullable=False)
-    template_id = Column(Integer, ForeignKey('templates.id'), nullable=True)
+    template_id = Column(Integer, ForeignKey('templates.id'), nullable=True, index=True)
     
     # 关系
     book = relationship("Book", back_populates="chapters")
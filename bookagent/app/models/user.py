@@ -1,6 +1,7 @@
 """
 用户模型
 """
+import asyncio
 from datetime import datetime
 from sqlalchemy import Column, String, Boolean, DateTime, Integer, ForeignKey, Text
 from sqlalchemy.orm import relationship
@@ -8,8 +9,32 @@ from passlib.context import CryptContext
 from ..core.database import Base
 from .base import BaseModel
 
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 密码加密上下文（全局唯一，core.security 也使用此实例）
+# 新密码使用argon2id哈希；bcrypt仅用于校验旧哈希，并在下次登录成功时自动升级
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__memory_cost=19456,  # 19 MiB，兼顾安全性与单核吞吐
+    argon2__time_cost=2,
+    argon2__parallelism=1,
+)
+
+def _warm_up_pwd_context():
+    """导入时完成哈希后端的发现和自检，避免首次登录承担这部分冷启动开销
+    
+    后端不可用时旧的bcrypt哈希将无法校验，用户无法登录，因此直接在启动时报错
+    
+    Raises:
+        RuntimeError: argon2或bcrypt后端不可用（如安装了不兼容的bcrypt版本）
+    """
+    try:
+        pwd_context.hash("warmup")
+        pwd_context.handler("bcrypt").get_backend()
+    except Exception as e:
+        raise RuntimeError(f"密码哈希后端不可用，请检查argon2-cffi和bcrypt(<4.1)的安装: {e}") from e
+
+_warm_up_pwd_context()
 
 class User(Base, BaseModel):
     """
@@ -36,5 +61,13 @@ class User(Base, BaseModel):
         """设置密码"""
         self.hashed_password = pwd_context.hash(password)
     
+    async def averify_password(self, password: str) -> bool:
+        """在线程池中验证密码，哈希计算不阻塞事件循环"""
+        return await asyncio.to_thread(pwd_context.verify, password, self.hashed_password)
+    
+    async def aset_password(self, password: str):
+        """在线程池中计算哈希并设置密码"""
+        self.hashed_password = await asyncio.to_thread(pwd_context.hash, password)
+    
     def __repr__(self):
         return f"<User {self.username}>"
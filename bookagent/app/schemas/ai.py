@@ -33,6 +33,20 @@ class AIGenerateRequest(BaseModel):
     length: str = Field("medium", description="内容长度 (short, medium, long)")
     model_extra: Optional[Dict[str, Any]] = Field(None, description="其他模型特定参数")
 
+class AIChapterOptions(BaseModel):
+    """章节生成参数模型（用于为现有章节生成内容，主题可省略）"""
+    topic: Optional[str] = Field(None, description="章节主题，省略时使用章节标题")
+    style: str = Field("academic", description="写作风格 (academic, casual, technical, creative)")
+    language: str = Field("zh", description="输出语言，如 'zh', 'en'")
+    length: str = Field("medium", description="内容长度 (short, medium, long)")
+    additional_instructions: Optional[str] = Field(None, description="额外指令")
+    temperature: float = Field(0.7, ge=0, le=2, description="温度参数，控制随机性")
+    use_cache: bool = Field(False, description="是否缓存生成结果，temperature为0时总是缓存")
+
+class AIChapterRequest(AIChapterOptions):
+    """章节生成请求模型"""
+    topic: str = Field(..., min_length=1, description="章节主题")
+
 class AIGenerateResponse(BaseModel):
     """内容生成响应模型"""
     content: str = Field(..., description="生成的Markdown格式内容")
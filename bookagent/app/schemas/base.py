@@ -3,7 +3,7 @@
 """
 from datetime import datetime
 from typing import Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 class BaseSchema(BaseModel):
     """基础模型"""
@@ -11,11 +11,8 @@ class BaseSchema(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
-    class Config:
-        orm_mode = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat() if v else None
-        }
+    # datetime 默认即序列化为ISO格式
+    model_config = ConfigDict(from_attributes=True)
 
 class ResponseModel(BaseModel):
     """标准响应模型"""
@@ -3,7 +3,7 @@
 """
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from pydantic import Field, field_validator
+from pydantic import ConfigDict, Field, field_validator
 from .base import BaseSchema
 
 class BookBase(BaseSchema):
@@ -36,8 +36,7 @@ class BookInDBBase(BookBase):
     created_at: datetime
     updated_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Book(BookInDBBase):
     """响应模型 - 图书信息"""
@@ -3,18 +3,23 @@
 """
 from typing import Optional, Dict, Any
 from datetime import datetime
-from pydantic import Field, validator
+from pydantic import AliasChoices, ConfigDict, Field, field_validator
 from .base import BaseSchema
 
 class ChapterBase(BaseSchema):
     """章节基础模型"""
     title: str = Field(..., max_length=255)
-    content: Optional[str] = None
+    content: Optional[str] = Field(None, repr=False)  # 正文可能很长，不出现在repr/日志中
     order: int = 0
     status: str = "draft"
-    metadata_: Optional[Dict[str, Any]] = Field(default_factory=dict, alias="metadata")
+    # ORM对象上的属性名是metadata_（metadata被SQLAlchemy占用），请求和响应中使用metadata
+    metadata_: Optional[Dict[str, Any]] = Field(
+        default_factory=dict,
+        validation_alias=AliasChoices("metadata_", "metadata"),
+        serialization_alias="metadata"
+    )
     
-    @validator('status')
+    @field_validator('status')
     def validate_status(cls, v):
         if v not in ('draft', 'in_review', 'published', 'archived'):
             raise ValueError('状态必须是 draft、in_review、published 或 archived')
@@ -29,7 +34,7 @@ class ChapterUpdate(ChapterBase):
     """更新章节模型"""
     title: Optional[str] = Field(None, max_length=255)
     status: Optional[str] = None
-    content: Optional[str] = None
+    content: Optional[str] = Field(None, repr=False)
     order: Optional[int] = None
     template_id: Optional[int] = None
 
@@ -41,14 +46,25 @@ class ChapterInDBBase(ChapterBase):
     created_at: datetime
     updated_at: datetime
     
-    class Config:
-        orm_mode = True
-        allow_population_by_field_name = True
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
 class Chapter(ChapterInDBBase):
     """响应模型 - 章节信息"""
     pass
 
+class ChapterSummary(BaseSchema):
+    """响应模型 - 章节目录项（不含正文）"""
+    id: int
+    book_id: int
+    template_id: Optional[int] = None
+    title: str
+    order: int
+    status: str
+    created_at: datetime
+    updated_at: datetime
+    
+    model_config = ConfigDict(from_attributes=True)
+
 class ChapterInDB(ChapterInDBBase):
     """数据库章节模型"""
     pass
@@ -24,6 +24,7 @@ class TaskStatus(BaseModel):
     current: Optional[int] = None
     total: Optional[int] = None
     status: Optional[str] = None
+    partial: Optional[str] = None  # 流式生成中最近产出的部分内容
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
@@ -2,20 +2,25 @@
 模板相关模型
 """
 from typing import Optional, Dict, Any
-from pydantic import Field, validator
+from pydantic import AliasChoices, ConfigDict, Field, field_validator
 from .base import BaseSchema
 
 class TemplateBase(BaseSchema):
     """模板基础模型"""
     name: str = Field(..., max_length=100)
     description: Optional[str] = None
-    content: str
+    content: str = Field(..., repr=False)  # 模板内容可能很长，不出现在repr/日志中
     template_type: str = "chapter"
     version: str = "1.0.0"
     is_default: bool = False
-    metadata_: Optional[Dict[str, Any]] = Field(default_factory=dict, alias="metadata")
+    # ORM对象上的属性名是metadata_（metadata被SQLAlchemy占用），请求和响应中使用metadata
+    metadata_: Optional[Dict[str, Any]] = Field(
+        default_factory=dict,
+        validation_alias=AliasChoices("metadata_", "metadata"),
+        serialization_alias="metadata"
+    )
     
-    @validator('template_type')
+    @field_validator('template_type')
     def validate_template_type(cls, v):
         if v not in ('book', 'chapter', 'section'):
             raise ValueError('模板类型必须是 book、chapter 或 section')
@@ -28,7 +33,7 @@ class TemplateCreate(TemplateBase):
 class TemplateUpdate(TemplateBase):
     """更新模板模型"""
     name: Optional[str] = Field(None, max_length=100)
-    content: Optional[str] = None
+    content: Optional[str] = Field(None, repr=False)
     template_type: Optional[str] = None
     version: Optional[str] = None
 
@@ -37,9 +42,7 @@ class TemplateInDBBase(TemplateBase):
     id: int
     author_id: Optional[int] = None
     
-    class Config:
-        orm_mode = True
-        allow_population_by_field_name = True
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
 class Template(TemplateInDBBase):
     """响应模型 - 模板信息"""
@@ -2,7 +2,7 @@
 用户相关模型
 """
 from typing import Optional, List
-from pydantic import EmailStr, Field, validator
+from pydantic import ConfigDict, EmailStr, Field, field_validator
 from .base import BaseSchema
 
 class UserBase(BaseSchema):
@@ -19,7 +19,7 @@ class UserCreate(UserBase):
     username: str
     password: str = Field(..., min_length=6, max_length=100)
     
-    @validator('username')
+    @field_validator('username')
     def username_alphanumeric(cls, v):
         if not v.isalnum():
             raise ValueError('用户名只能包含字母和数字')
@@ -33,8 +33,7 @@ class UserInDBBase(UserBase):
     """数据库用户模型基类"""
     id: int
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class User(UserInDBBase):
     """响应模型 - 用户信息"""
@@ -2,27 +2,311 @@
 AI 服务模块
 提供与LLM交互的高级接口
 """
-import json
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional, AsyncGenerator, Union
+from typing import List, Dict, Any, Optional, AsyncGenerator, AsyncIterator
 import re
+import unicodedata
+import weakref
+import orjson
+from fastapi import Request
 
 from ..core.llm import LLMClient, get_llm_client
 from ..core.config import settings
-from ..core.cache import cached
+from ..core.cache import cached, single_flight
+from ..core.context_compressor import context_compressor
+from ..core.llm_cache import llm_cache
+from ..core.rate_limiter import llm_rate_limiter
+from ..core.tokens import context_window, count_text_tokens
 
 logger = logging.getLogger(__name__)
 
+# 根据长度设置字数要求
+LENGTH_MAPPING = {
+    "short": "800-1200字",
+    "medium": "1500-2500字", 
+    "long": "3000-5000字"
+}
+
+# 根据长度设置输出token上限（按中文约1.3 token/字并留出余量），避免短章节占用过大的生成额度
+MAX_TOKENS_BY_LENGTH = {
+    "short": 1600,
+    "medium": 3500,
+    "long": 7000
+}
+
+# 批量生成时，一次请求的输出最多占模型上下文窗口的比例，其余留给提示词
+BATCH_OUTPUT_WINDOW_RATIO = 0.5
+# 批量生成时提示词之外预留的token余量(消息格式、JSON包装等)
+BATCH_PROMPT_MARGIN = 256
+
+# 图书大纲的输出token上限：基础部分(标题、简介)加上每章的大纲条目
+OUTLINE_BASE_TOKENS = 500
+OUTLINE_TOKENS_PER_CHAPTER = 250
+
+# 内容改进的输出token上限按原文token数估算：改写后篇幅通常与原文相近，留出扩写余量
+IMPROVE_OUTPUT_RATIO = 1.5
+IMPROVE_OUTPUT_MARGIN = 512
+
+# 根据风格设置写作要求
+STYLE_MAPPING = {
+    "technical": "技术性强，包含代码示例和实践案例",
+    "casual": "通俗易懂，生动有趣，适合初学者",
+    "academic": "严谨学术，引用权威资料，逻辑清晰",
+    "practical": "注重实践，提供具体操作步骤和解决方案"
+}
+
+# 章节生成的系统提示词
+CHAPTER_SYSTEM_PROMPT = (
+    "你是一位资深的技术文档作者和技术专家。请根据要求生成高质量的技术文档章节内容。\n"
+    "要求：\n"
+    "1. 使用标准Markdown格式\n"
+    "2. 结构清晰，层次分明\n"
+    "3. 包含适当的代码示例（使用```代码块）\n"
+    "4. 提供实际应用场景和最佳实践\n"
+    "5. 内容准确、专业、实用\n"
+    "6. 适当使用表格、列表等格式化元素\n"
+)
+
+# 启用表格生成时追加的系统提示词
+CHAPTER_SYSTEM_PROMPT_WITH_TABLES = CHAPTER_SYSTEM_PROMPT + (
+    "\n\n当遇到适合用表格展示的信息（如对比不同选项、列举参数配置、展示步骤等）时，"
+    "请使用Markdown表格格式进行组织，以提高内容的可读性。"
+)
+
+# 章节生成的用户提示词模板，在导入时构建一次，调用时只做字段填充
+# 提示词模板都把固定的要求放在前面、可变字段放在最后，使推理服务的前缀(KV)缓存能覆盖尽可能长的前缀；
+# 章节提示词中同一本书内基本不变的风格、语言、长度排在标题和上下文之前
+CHAPTER_PROMPT_HEADER_TEMPLATE = (
+    "请为下方给定的标题生成技术文档章节内容。\n\n"
+    "请确保内容结构完整，包含：\n"
+    "- 章节概述\n"
+    "- 核心概念解释\n"
+    "- 实际示例或代码演示\n"
+    "- 最佳实践建议\n"
+    "- 小结\n\n"
+    "---\n"
+    "写作风格：{style}\n"
+    "语言：{language}\n"
+    "内容长度：{length}\n"
+)
+
+# 批量生成章节的系统提示词
+BATCH_CHAPTER_SYSTEM_PROMPT = (
+    "你是一位资深的技术文档作者和技术专家。请根据要求一次性生成多个技术文档章节内容。\n"
+    "每个章节的要求：\n"
+    "1. 使用标准Markdown格式\n"
+    "2. 结构清晰，层次分明，包含章节概述、核心概念解释、实际示例或代码演示、最佳实践建议和小结\n"
+    "3. 包含适当的代码示例（使用```代码块）\n"
+    "4. 内容准确、专业、实用\n"
+    "5. 适当使用表格、列表等格式化元素\n\n"
+    "请严格以JSON对象返回结果，格式为 {\"0\": {\"content\": \"...\"}, \"1\": {\"content\": \"...\"}}，"
+    "键为章节序号，content 为该章节的完整Markdown内容。"
+)
+
+# 批量生成时单个章节的要求模板
+BATCH_CHAPTER_SPEC_TEMPLATE = (
+    "章节{idx}：\n"
+    "标题：{title}\n"
+    "写作风格：{style}\n"
+    "语言：{language}\n"
+    "内容长度：{length}"
+    "{context_info}"
+)
+
+# 图书大纲生成的提示词
+OUTLINE_SYSTEM_PROMPT = (
+    "你是一位经验丰富的技术图书作者和编辑。请根据给定主题生成完整的技术图书大纲。"
+    "大纲应该逻辑清晰，循序渐进，适合目标读者群体。"
+)
+
+OUTLINE_PROMPT_TEMPLATE = (
+    "请为下方给定的主题生成技术图书大纲。\n\n"
+    "请提供以下内容：\n"
+    "1. 图书标题建议\n"
+    "2. 图书简介（200字左右）\n"
+    "3. 详细章节大纲，每章包含：\n"
+    "   - 章节标题\n"
+    "   - 章节简介\n"
+    "   - 主要知识点（3-5个）\n"
+    "   - 预计字数\n\n"
+    "请以JSON格式返回结果。\n\n"
+    "---\n"
+    "主题：{topic}\n"
+    "目标读者：{target_audience}\n"
+    "章节数量：{chapter_count}\n"
+    "语言：{language}"
+)
+
+# 内容改进类型对应的改进目标
+IMPROVEMENT_MAPPING = {
+    "clarity": "提高内容的清晰度和可理解性，简化复杂概念的表达",
+    "technical_depth": "增加技术深度，添加更多技术细节和高级概念",
+    "readability": "提高可读性，优化语言表达和段落结构",
+    "examples": "添加更多实际示例和代码演示",
+    "structure": "优化内容结构和逻辑组织"
+}
+
+# 内容改进的提示词
+IMPROVE_SYSTEM_PROMPT = (
+    "你是一位专业的技术文档编辑。请根据要求改进给定的技术内容，"
+    "保持原有的核心信息，但提升内容质量。"
+)
+
+IMPROVE_PROMPT_TEMPLATE = (
+    "请按下方的改进目标改进给定的技术内容，返回改进后的内容，保持Markdown格式。\n\n"
+    "---\n"
+    "改进目标：{instruction}{specific_req}\n\n"
+    "原始内容：\n{content}"
+)
+
+# 代码示例生成的提示词
+CODE_EXAMPLE_SYSTEM_PROMPT = (
+    "你是一位资深的软件工程师和技术教育者。请为给定概念生成高质量的代码示例，"
+    "包含详细的注释和解释。"
+)
+
+CODE_EXAMPLE_PROMPT_TEMPLATE = (
+    "请为下方给定的概念生成代码示例。\n\n"
+    "请提供：\n"
+    "1. 完整的代码示例（带详细注释）\n"
+    "2. 代码解释和关键点说明\n"
+    "3. 运行结果示例\n"
+    "4. 常见问题和注意事项\n\n"
+    "使用Markdown格式，代码块标注所用的编程语言。\n\n"
+    "---\n"
+    "概念：{concept}\n"
+    "编程语言：{programming_language}\n"
+    "复杂度：{complexity}"
+)
+
+# 模型常把JSON包在Markdown代码块中返回
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(\{.*\}|\[.*\])\s*```", re.S)
+
+def _parse_json_response(response: str) -> Any:
+    """解析模型返回的JSON，先去掉Markdown代码块包裹
+
+    Raises:
+        orjson.JSONDecodeError: 内容不是合法JSON
+    """
+    match = _JSON_FENCE.search(response)
+    return orjson.loads(match.group(1) if match else response.strip())
+
+def _chapter_max_tokens(chapter: Dict[str, Any]) -> int:
+    """按章节长度获取输出token上限"""
+    return MAX_TOKENS_BY_LENGTH.get(chapter.get("length", "medium"), MAX_TOKENS_BY_LENGTH["medium"])
+
+async def _iter_deltas(stream: AsyncIterator[Dict[str, Any]]) -> AsyncGenerator[str, None]:
+    """从流式响应块中提取增量文本"""
+    async for chunk in stream:
+        choices = chunk.get("choices")
+        if not choices:
+            continue
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _normalize_chapter_args(
+    title: str,
+    style: str,
+    language: str,
+    length: str,
+    context: Optional[str]
+) -> tuple:
+    """规范化章节生成参数：统一全半角、去掉首尾空白、枚举值转小写、合并上下文中的连续空白
+    
+    缓存键和实际生成都使用规范化后的参数，命中同一缓存的调用一定对应相同的提示词
+    """
+    return (
+        unicodedata.normalize("NFKC", title).strip(),
+        style.strip().lower(),
+        language.strip().lower(),
+        length.strip().lower(),
+        _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", context)).strip() if context else None,
+    )
+
+def _normalize_chapter_key(
+    self,
+    title: str,
+    style: str = "technical",
+    language: str = "zh",
+    length: str = "medium",
+    context: Optional[str] = None,
+    use_tables: bool = True,
+    **kwargs
+) -> tuple:
+    """按规范化后的章节生成参数计算缓存键，位置参数和关键字参数写法不同的等价调用也得到相同的键；
+    self不参与缓存键"""
+    title, style, language, length, context = _normalize_chapter_args(title, style, language, length, context)
+    return (), {
+        "title": title,
+        "style": style,
+        "language": language,
+        "length": length,
+        "context": context,
+        "use_tables": use_tables,
+        **kwargs
+    }
+
+def _render_chapter_header(style: str, length: str, language: str) -> str:
+    """渲染章节提示词中标题之前的部分"""
+    return CHAPTER_PROMPT_HEADER_TEMPLATE.format_map({
+        "style": STYLE_MAPPING.get(style, style),
+        "language": language,
+        "length": LENGTH_MAPPING.get(length, length),
+    })
+
+# 常见的 (风格, 长度, 语言) 组合在导入时渲染好，生成章节时只需拼接标题和上下文
+_RENDERED_CHAPTER_HEADERS = {
+    (style, length, language): _render_chapter_header(style, length, language)
+    for style in STYLE_MAPPING
+    for length in LENGTH_MAPPING
+    for language in ("zh", "en")
+}
+
+def _build_chapter_prompts(
+    title: str,
+    style: str,
+    language: str,
+    length: str,
+    context: Optional[str],
+    use_tables: bool
+) -> tuple:
+    """构建章节生成的 (系统提示词, 用户提示词)"""
+    # 如果启用了表格生成功能，使用带表格提示的系统提示词
+    system_prompt = CHAPTER_SYSTEM_PROMPT_WITH_TABLES if use_tables else CHAPTER_SYSTEM_PROMPT
+    header = _RENDERED_CHAPTER_HEADERS.get((style, length, language))
+    if header is None:
+        header = _render_chapter_header(style, length, language)
+    prompt = f"{header}标题：{title}\n上下文信息：{context}" if context else f"{header}标题：{title}"
+    return system_prompt, prompt
+
 class AIService:
     """AI 服务类，处理与LLM的交互"""
     
-    def __init__(self, client: Optional[LLMClient] = None):
+    # 实例属性固定，省去实例__dict__，属性访问走描述符
+    __slots__ = ("client", "stream_buffer_size", "stream_flush_interval", "_inflight")
+    
+    def __init__(
+        self,
+        client: Optional[LLMClient] = None,
+        stream_buffer_size: Optional[int] = None,
+        stream_flush_interval_ms: Optional[int] = None
+    ):
         """初始化AI服务
         
         Args:
             client: 可选的LLM客户端实例，如果未提供则使用默认客户端
+            stream_buffer_size: 流式文本合并输出的缓冲字符数，默认使用配置值
+            stream_flush_interval_ms: 流式文本缓冲的最长等待时间(毫秒)，默认使用配置值
         """
         self.client = client
+        self.stream_buffer_size = stream_buffer_size or settings.LLM_STREAM_BUFFER_SIZE
+        self.stream_flush_interval = (stream_flush_interval_ms or settings.LLM_STREAM_FLUSH_INTERVAL_MS) / 1000
+        # 正在请求中的非流式补全，参数相同的并发调用共享同一次模型请求
+        self._inflight: Dict[str, asyncio.Future] = {}
     
     async def generate_text(
         self,
@@ -46,10 +330,12 @@ class AIService:
         Returns:
             生成的文本
         """
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
+        # 一次构建完整的消息列表；请求体由LLM客户端用orjson一次序列化
+        user_message = {"role": "user", "content": prompt}
+        messages = (
+            [{"role": "system", "content": system_prompt}, user_message]
+            if system_prompt else [user_message]
+        )
         
         response = await self._chat_completion(
             messages=messages,
@@ -106,18 +392,17 @@ class AIService:
             max_tokens: 最大token数
             **kwargs: 其他参数
             
-        Yields:
-            流式响应块
+        Returns:
+            流式响应块的异步生成器，上游每到达一个块就立即产出
         """
-        async for chunk in await self._chat_completion(
+        return await self._chat_completion(
             messages=messages,
             model=model,
             temperature=temperature,
             max_tokens=max_tokens,
             stream=True,
             **kwargs
-        ):
-            yield chunk
+        )
     
     async def _chat_completion(
         self,
@@ -126,6 +411,9 @@ class AIService:
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         stream: bool = False,
+        use_cache: Optional[bool] = None,
+        speculative_model: Optional[str] = None,
+        num_speculative_tokens: Optional[int] = None,
         **kwargs
     ) -> Any:
         """内部聊天补全方法
@@ -136,6 +424,9 @@ class AIService:
             temperature: 温度参数
             max_tokens: 最大token数
             stream: 是否使用流式响应
+            use_cache: 是否使用响应缓存，默认只缓存确定性(temperature为0)的非流式请求
+            speculative_model: 推测解码使用的草稿模型，需推理服务支持（如vLLM），为None时不启用
+            num_speculative_tokens: 草稿模型每次推测的token数，默认使用配置值
             **kwargs: 其他参数
             
         Returns:
@@ -143,20 +434,109 @@ class AIService:
         """
         client = self.client or await get_llm_client()
         
+        if speculative_model:
+            # 推测解码只改变服务端的解码方式，不改变输出分布，因此不参与缓存键
+            speculative_decoding = {
+                "model": speculative_model,
+                "num_speculative_tokens": num_speculative_tokens or settings.LLM_NUM_SPECULATIVE_TOKENS
+            }
+        else:
+            speculative_decoding = None
+        
+        def request():
+            extra = {**kwargs, "speculative_decoding": speculative_decoding} if speculative_decoding else kwargs
+            return self._request_completion(client, messages, model, temperature, max_tokens, stream, **extra)
+        
+        if stream:
+            return await request()
+        
+        config = client.config
+        resolved_temperature = temperature if temperature is not None else config.temperature
+        cacheable = use_cache if use_cache is not None else resolved_temperature == 0
+        request_params = {
+            "model": model or config.model,
+            "messages": messages,
+            "temperature": resolved_temperature,
+            "max_tokens": max_tokens or config.max_tokens,
+            **kwargs
+        }
+        # 缓存命中时不调用模型，也不占用限流配额
+        if cacheable:
+            cached_response = await llm_cache.get(**request_params)
+            if cached_response is not None:
+                return cached_response
+        
+        async def request_and_cache():
+            response = await request()
+            if cacheable:
+                await llm_cache.set(response=response, **request_params)
+            return response
+        
+        # 参数相同的请求正在进行中（如多个章节并发请求同一段内容），等待其结果而不重复调用模型
+        return await single_flight(self._inflight, llm_cache.key(**request_params), request_and_cache)
+    
+    async def _request_completion(
+        self,
+        client: LLMClient,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        stream: bool,
+        **kwargs
+    ) -> Any:
+        """在限流器内向模型发送补全请求
+        
+        流式请求返回异步生成器，限流名额一直占用到流读取完毕或被关闭
+        """
+        if stream:
+            return self._stream_completion(client, messages, model, temperature, max_tokens, **kwargs)
+        try:
+            # 按预计输出token数占用限流配额，避免并发请求超出服务商的速率限制
+            async with llm_rate_limiter.limit(max_tokens or settings.LLM_MAX_TOKENS):
+                return await client.chat_completion(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs
+                )
+        except Exception as e:
+            logger.error("AI服务请求失败: %s", e, exc_info=True)
+            raise
+    
+    async def _stream_completion(
+        self,
+        client: LLMClient,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        **kwargs
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """在限流器内读取流式补全响应
+        
+        生成过程中上游连接一直占用，因此整个流式读取期间都持有限流名额，
+        而不是只在建立请求时占用
+        """
         try:
-            return await client.chat_completion(
-                messages=messages,
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stream=stream,
-                **kwargs
-            )
+            async with llm_rate_limiter.limit(max_tokens or settings.LLM_MAX_TOKENS):
+                stream = await client.chat_completion(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True,
+                    **kwargs
+                )
+                async for chunk in stream:
+                    yield chunk
         except Exception as e:
-            logger.error(f"AI服务请求失败: {str(e)}", exc_info=True)
+            logger.error("AI服务流式请求失败: %s", e, exc_info=True)
             raise
     
-    @cached(expire=3600, key_prefix="chapter_content")
+    # 章节生成耗时较长，多个worker同时请求同一章节时只生成一次
+    @cached(expire=3600, key_prefix="chapter_content", lock_timeout=600, key_builder=_normalize_chapter_key)
     async def generate_chapter_content(
         self,
         title: str,
@@ -181,60 +561,203 @@ class AIService:
         Returns:
             生成的章节内容 (Markdown格式)
         """
-        # 根据长度设置字数要求
-        length_mapping = {
-            "short": "800-1200字",
-            "medium": "1500-2500字", 
-            "long": "3000-5000字"
-        }
+        title, style, language, length, context = _normalize_chapter_args(title, style, language, length, context)
+        if context:
+            context = await context_compressor.compress(context, title)
+        system_prompt, prompt = _build_chapter_prompts(title, style, language, length, context, use_tables)
+        kwargs.setdefault("max_tokens", MAX_TOKENS_BY_LENGTH.get(length, MAX_TOKENS_BY_LENGTH["medium"]))
+        # 章节内容格式高度模板化，草稿模型的接受率高，适合推测解码
+        kwargs.setdefault("speculative_model", settings.LLM_SPECULATIVE_MODEL)
         
-        # 根据风格设置写作要求
-        style_mapping = {
-            "technical": "技术性强，包含代码示例和实践案例",
-            "casual": "通俗易懂，生动有趣，适合初学者",
-            "academic": "严谨学术，引用权威资料，逻辑清晰",
-            "practical": "注重实践，提供具体操作步骤和解决方案"
-        }
+        return await self.generate_text(
+            prompt=prompt,
+            system_prompt=system_prompt,
+            **kwargs
+        )
+    
+    async def stream_chat_text(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs
+    ) -> AsyncGenerator[str, None]:
+        """流式聊天补全，只产出合并后的增量文本，参数同 stream_chat_completion
+        
+        Returns:
+            增量文本的异步生成器，相邻的小块按缓冲大小和时间间隔合并后产出
+        """
+        stream = await self.stream_chat_completion(messages=messages, **kwargs)
+        async for text in self._coalesce_deltas(_iter_deltas(stream)):
+            yield text
+    
+    async def _coalesce_deltas(self, deltas: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+        """合并增量文本：缓冲达到 stream_buffer_size 个字符或等待超过 stream_flush_interval 时输出
+        
+        上游停顿时按时间间隔输出已缓冲的内容，不会等到下一块到达。
+        """
+        loop = asyncio.get_running_loop()
+        iterator = deltas.__aiter__()
+        parts: List[str] = []
+        size = 0
+        deadline = None
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                done, _ = await asyncio.wait((pending,), timeout=timeout)
+                if not done:
+                    yield "".join(parts)
+                    parts, size, deadline = [], 0, None
+                    continue
+                
+                finished, pending = pending, None
+                try:
+                    delta = finished.result()
+                except StopAsyncIteration:
+                    break
+                if not parts:
+                    deadline = loop.time() + self.stream_flush_interval
+                parts.append(delta)
+                size += len(delta)
+                if size >= self.stream_buffer_size or loop.time() >= deadline:
+                    yield "".join(parts)
+                    parts, size, deadline = [], 0, None
+            
+            if parts:
+                yield "".join(parts)
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    async def stream_chapter_content(
+        self,
+        title: str,
+        style: str = "technical",
+        language: str = "zh",
+        length: str = "medium",
+        context: Optional[str] = None,
+        use_tables: bool = True,
+        **kwargs
+    ) -> AsyncGenerator[str, None]:
+        """流式生成章节内容，参数同 generate_chapter_content
+        
+        Returns:
+            章节内容增量文本的异步生成器，相邻的小块合并后产出
+        """
+        if context:
+            context = await context_compressor.compress(context, title)
+        system_prompt, prompt = _build_chapter_prompts(title, style, language, length, context, use_tables)
+        kwargs.setdefault("max_tokens", MAX_TOKENS_BY_LENGTH.get(length, MAX_TOKENS_BY_LENGTH["medium"]))
+        # 章节内容格式高度模板化，草稿模型的接受率高，适合推测解码
+        kwargs.setdefault("speculative_model", settings.LLM_SPECULATIVE_MODEL)
+        
+        async for text in self.stream_chat_text(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            **kwargs
+        ):
+            yield text
+    
+    async def generate_chapters_batch(
+        self,
+        chapters: List[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        **kwargs
+    ) -> List[str]:
+        """批量生成章节内容
         
-        system_prompt = (
-            "你是一位资深的技术文档作者和技术专家。请根据要求生成高质量的技术文档章节内容。\n"
-            "要求：\n"
-            "1. 使用标准Markdown格式\n"
-            "2. 结构清晰，层次分明\n"
-            "3. 包含适当的代码示例（使用```代码块）\n"
-            "4. 提供实际应用场景和最佳实践\n"
-            "5. 内容准确、专业、实用\n"
-            "6. 适当使用表格、列表等格式化元素\n"
+        将多个章节打包到一次LLM调用中，系统提示词和格式要求只发送一次，
+        减少整本书生成时的token消耗和请求次数。每批按各章节的输出token上限累加打包，
+        总和不超过配置的批量预算和模型上下文窗口可用于输出的部分。
+        某一批次的响应无法解析时，该批次回退为逐章生成。
+        
+        Args:
+            chapters: 章节参数列表，每项包含 title、style、language、length 等字段
+            batch_size: 每次LLM调用最多打包的章节数，默认只按token预算打包
+            **kwargs: 其他参数
+            
+        Returns:
+            与输入顺序一致的章节内容列表 (Markdown格式)
+        """
+        model = kwargs.get("model") or settings.OPENAI_MODEL
+        budget = min(
+            settings.LLM_BATCH_MAX_TOKENS,
+            int(context_window(model) * BATCH_OUTPUT_WINDOW_RATIO)
         )
         
-        context_info = f"\n上下文信息：{context}" if context else ""
-        # 如果启用了表格生成功能，添加相关提示
-        if use_tables:
-            system_prompt += (
-                "\n\n当遇到适合用表格展示的信息（如对比不同选项、列举参数配置、展示步骤等）时，"
-                "请使用Markdown表格格式进行组织，以提高内容的可读性。"
-            )
-        
-        prompt = (
-            f"请为以下标题生成技术文档章节内容：\n\n"
-            f"标题：{title}\n"
-            f"写作风格：{style_mapping.get(style, style)}\n"
-            f"语言：{language}\n"
-            f"内容长度：{length_mapping.get(length, length)}\n"
-            f"{context_info}\n\n"
-            f"请确保内容结构完整，包含：\n"
-            f"- 章节概述\n"
-            f"- 核心概念解释\n"
-            f"- 实际示例或代码演示\n"
-            f"- 最佳实践建议\n"
-            f"- 小结"
+        batches: List[List[Dict[str, Any]]] = []
+        batch_tokens = 0
+        for chapter in chapters:
+            tokens = _chapter_max_tokens(chapter)
+            # 单个章节超出预算时单独成批
+            if (
+                not batches
+                or batch_tokens + tokens > budget
+                or (batch_size and len(batches[-1]) >= batch_size)
+            ):
+                batches.append([])
+                batch_tokens = 0
+            batches[-1].append(chapter)
+            batch_tokens += tokens
+        
+        # 各批次并发执行，并发度由全局限流器控制
+        results = await asyncio.gather(*(
+            self._generate_chapter_batch(batch, **kwargs)
+            for batch in batches
+        ))
+        return [content for batch in results for content in batch]
+    
+    async def _generate_chapter_batch(
+        self,
+        chapters: List[Dict[str, Any]],
+        **kwargs
+    ) -> List[str]:
+        """在一次LLM调用中生成一批章节"""
+        chapter_specs = []
+        for idx, chapter in enumerate(chapters):
+            style = chapter.get("style", "technical")
+            length = chapter.get("length", "medium")
+            context = chapter.get("context")
+            if context:
+                context = await context_compressor.compress(context, chapter["title"])
+            chapter_specs.append(BATCH_CHAPTER_SPEC_TEMPLATE.format_map({
+                "idx": idx,
+                "title": chapter["title"],
+                "style": STYLE_MAPPING.get(style, style),
+                "language": chapter.get("language", "zh"),
+                "length": LENGTH_MAPPING.get(length, length),
+                "context_info": f"\n上下文信息：{context}" if context else "",
+            }))
+        
+        prompt = "请为以下章节分别生成技术文档内容：\n\n" + "\n\n".join(chapter_specs)
+        # 一次调用输出所有章节，token上限按各章节长度累加，且不超过上下文窗口扣除提示词后的剩余部分；
+        # 只用于本次批量请求，不传给解析失败后的逐章生成
+        model = kwargs.get("model") or settings.OPENAI_MODEL
+        prompt_tokens = count_text_tokens(BATCH_CHAPTER_SYSTEM_PROMPT + prompt, model)
+        max_tokens = kwargs.get("max_tokens") or min(
+            sum(_chapter_max_tokens(chapter) for chapter in chapters),
+            context_window(model) - prompt_tokens - BATCH_PROMPT_MARGIN
         )
         
-        return await self.generate_text(
+        response = await self.generate_text(
             prompt=prompt,
-            system_prompt=system_prompt,
-            **kwargs
+            system_prompt=BATCH_CHAPTER_SYSTEM_PROMPT,
+            response_format={"type": "json_object"},
+            **{**kwargs, "max_tokens": max_tokens}
         )
+        
+        try:
+            parsed = _parse_json_response(response)
+            return [parsed[str(idx)]["content"] for idx in range(len(chapters))]
+        except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+            logger.warning("批量生成结果解析失败，回退为逐章生成: %s", e)
+            return list(await asyncio.gather(*(
+                self.generate_chapter_content(**chapter, **kwargs)
+                for chapter in chapters
+            )))
     
     async def generate_book_outline(
         self,
@@ -254,37 +777,23 @@ class AIService:
         Returns:
             包含大纲信息的字典
         """
-        system_prompt = (
-            "你是一位经验丰富的技术图书作者和编辑。请根据给定主题生成完整的技术图书大纲。"
-            "大纲应该逻辑清晰，循序渐进，适合目标读者群体。"
-        )
-        
-        prompt = (
-            f"请为以下主题生成技术图书大纲：\n\n"
-            f"主题：{topic}\n"
-            f"目标读者：{target_audience}\n"
-            f"章节数量：{chapter_count}\n"
-            f"语言：{language}\n\n"
-            f"请提供以下内容：\n"
-            f"1. 图书标题建议\n"
-            f"2. 图书简介（200字左右）\n"
-            f"3. 详细章节大纲，每章包含：\n"
-            f"   - 章节标题\n"
-            f"   - 章节简介\n"
-            f"   - 主要知识点（3-5个）\n"
-            f"   - 预计字数\n\n"
-            f"请以JSON格式返回结果。"
-        )
+        prompt = OUTLINE_PROMPT_TEMPLATE.format_map({
+            "topic": topic,
+            "target_audience": target_audience,
+            "chapter_count": chapter_count,
+            "language": language,
+        })
         
         response = await self.generate_text(
             prompt=prompt,
-            system_prompt=system_prompt
+            system_prompt=OUTLINE_SYSTEM_PROMPT,
+            max_tokens=OUTLINE_BASE_TOKENS + OUTLINE_TOKENS_PER_CHAPTER * chapter_count
         )
         
         try:
             # 尝试解析JSON响应
-            return json.loads(response)
-        except json.JSONDecodeError:
+            return _parse_json_response(response)
+        except orjson.JSONDecodeError:
             # 如果解析失败，返回原始文本
             return {"raw_response": response}
     
@@ -304,32 +813,17 @@ class AIService:
         Returns:
             改进后的内容
         """
-        improvement_prompts = {
-            "clarity": "提高内容的清晰度和可理解性，简化复杂概念的表达",
-            "technical_depth": "增加技术深度，添加更多技术细节和高级概念",
-            "readability": "提高可读性，优化语言表达和段落结构",
-            "examples": "添加更多实际示例和代码演示",
-            "structure": "优化内容结构和逻辑组织"
-        }
-        
-        system_prompt = (
-            "你是一位专业的技术文档编辑。请根据要求改进给定的技术内容，"
-            "保持原有的核心信息，但提升内容质量。"
-        )
-        
-        improvement_instruction = improvement_prompts.get(improvement_type, improvement_type)
-        specific_req = f"\n具体要求：{specific_requirements}" if specific_requirements else ""
-        
-        prompt = (
-            f"请改进以下技术内容：\n\n"
-            f"改进目标：{improvement_instruction}{specific_req}\n\n"
-            f"原始内容：\n{content}\n\n"
-            f"请返回改进后的内容，保持Markdown格式。"
-        )
+        prompt = IMPROVE_PROMPT_TEMPLATE.format_map({
+            "instruction": IMPROVEMENT_MAPPING.get(improvement_type, improvement_type),
+            "specific_req": f"\n具体要求：{specific_requirements}" if specific_requirements else "",
+            "content": content,
+        })
         
+        content_tokens = count_text_tokens(content, settings.OPENAI_MODEL)
         return await self.generate_text(
             prompt=prompt,
-            system_prompt=system_prompt
+            system_prompt=IMPROVE_SYSTEM_PROMPT,
+            max_tokens=int(content_tokens * IMPROVE_OUTPUT_RATIO) + IMPROVE_OUTPUT_MARGIN
         )
     
     async def generate_code_examples(
@@ -348,32 +842,31 @@ class AIService:
         Returns:
             代码示例和说明
         """
-        system_prompt = (
-            "你是一位资深的软件工程师和技术教育者。请为给定概念生成高质量的代码示例，"
-            "包含详细的注释和解释。"
-        )
-        
-        prompt = (
-            f"请为以下概念生成代码示例：\n\n"
-            f"概念：{concept}\n"
-            f"编程语言：{programming_language}\n"
-            f"复杂度：{complexity}\n\n"
-            f"请提供：\n"
-            f"1. 完整的代码示例（带详细注释）\n"
-            f"2. 代码解释和关键点说明\n"
-            f"3. 运行结果示例\n"
-            f"4. 常见问题和注意事项\n\n"
-            f"使用Markdown格式，代码用```{programming_language}包围。"
-        )
+        prompt = CODE_EXAMPLE_PROMPT_TEMPLATE.format_map({
+            "concept": concept,
+            "programming_language": programming_language,
+            "complexity": complexity,
+        })
         
         return await self.generate_text(
             prompt=prompt,
-            system_prompt=system_prompt
+            system_prompt=CODE_EXAMPLE_SYSTEM_PROMPT
         )
 
-# 全局AI服务实例
-ai_service = AIService()
+# 每个事件循环一个AI服务实例：实例中的进行中请求(Future)绑定在创建它的循环上，不能跨循环共享
+_services_by_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AIService]" = weakref.WeakKeyDictionary()
 
-async def get_ai_service() -> AIService:
-    """获取AI服务实例"""
-    return ai_service
+async def get_ai_service(request: Request = None) -> AIService:
+    """获取AI服务实例
+    
+    优先返回应用生命周期内绑定共享LLM客户端的实例，否则返回当前事件循环的实例
+    """
+    if request is not None:
+        bound_service = getattr(request.app.state, "ai_service", None)
+        if bound_service is not None:
+            return bound_service
+    loop = asyncio.get_running_loop()
+    service = _services_by_loop.get(loop)
+    if service is None:
+        service = _services_by_loop[loop] = AIService()
+    return service
@@ -2,30 +2,256 @@
 图表生成服务
 支持生成各种技术图表，包括架构图、流程图、时序图等
 """
-import os
+import asyncio
 import io
 import base64
-import tempfile
+import hashlib
+import html
 import logging
-from typing import Dict, Any, Optional, List, Union, Tuple
+import math
+import os
+import threading
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
-import json
-
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.patches import FancyBboxPatch, ConnectionPatch
-import seaborn as sns
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import graphviz
-from PIL import Image, ImageDraw, ImageFont
-import cairosvg
+
+import numpy as np
+import orjson
+from cachetools import LRUCache
 
 from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 图表质量对应的输出分辨率(DPI)：草稿、屏幕/电子书、印刷
+DIAGRAM_QUALITY_DPI = {
+    "draft": 100,
+    "screen": 150,
+    "print": 300,
+}
+
+# PNG使用最低的zlib压缩级别，压缩耗时远低于默认级别，文件略大
+_PNG_SAVE_OPTIONS = {'pil_kwargs': {'compress_level': 1}}
+
+# 图表文字的候选字体，按优先级排列；DejaVu Sans随matplotlib附带，总是可用
+_FONT_FAMILIES = ('SimHei', 'DejaVu Sans', 'Arial Unicode MS')
+
+@lru_cache(maxsize=None)
+def _resolve_font_families() -> Tuple[str, ...]:
+    """注册配置的字体文件，返回已安装的候选字体
+
+    只在首次绘图前解析一次；去掉未安装的字体后，绘制文字时不必再逐个查找缺失的字体。
+    matplotlib绘图和直接生成的SVG使用同一组字体。
+    """
+    from matplotlib import font_manager
+    
+    families = list(_FONT_FAMILIES)
+    if settings.DIAGRAM_FONT_PATH:
+        try:
+            font_manager.fontManager.addfont(settings.DIAGRAM_FONT_PATH)
+            families.insert(0, font_manager.FontProperties(fname=settings.DIAGRAM_FONT_PATH).get_name())
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"注册图表字体失败: {e}")
+    
+    available = []
+    for family in families:
+        try:
+            font_manager.findfont(font_manager.FontProperties(family=family), fallback_to_default=False)
+        except ValueError:
+            continue
+        if family not in available:
+            available.append(family)
+    return tuple(available) or ('DejaVu Sans',)
+
+@lru_cache(maxsize=None)
+def _configure_matplotlib():
+    """首次绘图时导入并配置matplotlib
+
+    matplotlib导入较慢且占用内存较多，延迟到真正绘图时再加载，不拖慢应用启动。
+    """
+    import matplotlib
+    # 服务端无显示设备，且图表在线程池中绘制，固定使用非交互的Agg后端
+    matplotlib.use('Agg')
+    # 设置中文字体支持
+    matplotlib.rcParams['font.sans-serif'] = list(_resolve_font_families())
+    matplotlib.rcParams['axes.unicode_minus'] = False
+
+def _new_figure(figsize: Tuple[float, float]):
+    """创建图表和坐标轴
+
+    不经过pyplot：pyplot的全局图表注册表需要加锁且必须手动关闭，
+    直接创建的Figure在线程池中可以并行绘制，不再引用后即被回收。
+    """
+    _configure_matplotlib()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot(111)
+
+@lru_cache(maxsize=None)
+def _load_pygraphviz():
+    """加载可选的pygraphviz，未安装时返回None"""
+    try:
+        import pygraphviz
+    except ImportError:  # 可选依赖，未安装时启动dot子进程渲染
+        return None
+    return pygraphviz
+
+# Graphviz的C库不是线程安全的，进程内渲染需要串行执行
+_graphviz_lock = threading.Lock()
+
+def _render_dot(dot, output_path: Path, format: str):
+    """渲染Graphviz图表到 output_path.format
+
+    安装了pygraphviz时直接调用Graphviz库在进程内完成布局和输出，省去每个图表
+    写临时源文件、启动dot子进程的开销；否则由graphviz包调用dot命令。
+    """
+    pygraphviz = _load_pygraphviz()
+    if pygraphviz is None:
+        dot.render(str(output_path), format=format, cleanup=True)
+        return
+    with _graphviz_lock:
+        graph = pygraphviz.AGraph(string=dot.source)
+        graph.draw(f"{output_path}.{format}", format=format, prog='dot')
+
+class _FigurePool:
+    """按尺寸复用绘制完成的Figure
+
+    重复使用Figure及其画布，保存图片时可复用Agg渲染缓冲区，避免每个图表重新分配。
+    在绘图线程中出借和归还，由锁保护；每种尺寸最多保留maxsize个空闲图表。
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._idle: Dict[Tuple[float, float], deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def acquire(self, figsize: Tuple[float, float]):
+        """取出一个清空的图表和新坐标轴，没有空闲图表时新建"""
+        key = (float(figsize[0]), float(figsize[1]))
+        with self._lock:
+            idle = self._idle[key]
+            fig = idle.popleft() if idle else None
+        if fig is None:
+            return _new_figure(key)
+        fig.clf()
+        return fig, fig.add_subplot(111)
+
+    def release(self, fig):
+        """归还图表，超过上限时直接丢弃"""
+        width, height = fig.get_size_inches()
+        with self._lock:
+            idle = self._idle[(float(width), float(height))]
+            if len(idle) < self.maxsize:
+                idle.append(fig)
+
+_figure_pool = _FigurePool(maxsize=os.cpu_count() or 1)
+
+# 直接生成SVG时使用的元素模板
+_SVG_DOCUMENT_TEMPLATE = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+    'viewBox="0 0 {width:.0f} {height:.0f}" '
+    'font-family="{font_family}">'
+    '<rect width="100%" height="100%" fill="white"/>{body}</svg>'
+)
+_SVG_RECT_TEMPLATE = (
+    '<rect x="{x:.1f}" y="{y:.1f}" width="{width:.1f}" height="{height:.1f}" rx="{radius:.1f}" '
+    'fill="{fill}" stroke="{stroke}" stroke-width="{stroke_width}" opacity="{opacity}"/>'
+)
+_SVG_TEXT_TEMPLATE = (
+    '<text x="{x:.1f}" y="{y:.1f}" font-size="{size}" font-weight="{weight}" '
+    'text-anchor="{anchor}" dominant-baseline="central">{text}</text>'
+)
+_SVG_ARROW_TEMPLATE = (
+    '<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" stroke="{color}" '
+    'stroke-width="{width}"{dash}/><polygon points="{head}" fill="{color}"/>'
+)
+
+class _SvgCanvas:
+    """直接输出SVG的简易画布
+
+    只支持圆角矩形、文字和箭头，坐标使用与matplotlib相同的数据坐标（y轴向上）。
+    元素按矩形、箭头、文字分层输出，与matplotlib中图形块在下、文字在上的层次一致。
+    """
+
+    def __init__(self, xlim: Tuple[float, float], ylim: Tuple[float, float], scale: float = 100):
+        self.x0 = xlim[0]
+        self.y1 = ylim[1]
+        self.scale = scale
+        self.width = (xlim[1] - xlim[0]) * scale
+        self.height = (ylim[1] - ylim[0]) * scale
+        self._rects = []
+        self._arrows = []
+        self._texts = []
+
+    def _point(self, x: float, y: float) -> Tuple[float, float]:
+        return (x - self.x0) * self.scale, (self.y1 - y) * self.scale
+
+    def rect(self, x: float, y: float, width: float, height: float, fill: str, stroke: str,
+             pad: float = 0.0, stroke_width: float = 1, opacity: float = 1.0):
+        """圆角矩形，pad与FancyBboxPatch的round,pad=...含义相同"""
+        left, top = self._point(x - pad, y + height + pad)
+        self._rects.append(_SVG_RECT_TEMPLATE.format(
+            x=left, y=top, width=(width + 2 * pad) * self.scale, height=(height + 2 * pad) * self.scale,
+            radius=pad * self.scale, fill=fill, stroke=stroke, stroke_width=stroke_width, opacity=opacity
+        ))
+
+    def text(self, x: float, y: float, text: str, size: float = 10, bold: bool = False,
+             anchor: str = "middle", background: Optional[str] = None):
+        """文字，background不为空时按估算的文字宽度在下方绘制背景框"""
+        px, py = self._point(x, y)
+        if background:
+            # 没有字体度量，按中文字符约1个字号宽、其他字符约0.6个字号宽估算
+            text_width = sum(1.0 if ord(ch) > 127 else 0.6 for ch in text) * size
+            self._texts.append(_SVG_RECT_TEMPLATE.format(
+                x=px - text_width / 2 - 3, y=py - size / 2 - 3, width=text_width + 6, height=size + 6,
+                radius=3, fill=background, stroke='black', stroke_width=0.5, opacity=0.8
+            ))
+        self._texts.append(_SVG_TEXT_TEMPLATE.format(
+            x=px, y=py, size=size, weight="bold" if bold else "normal", anchor=anchor, text=html.escape(text)
+        ))
+
+    def arrow(self, x1: float, y1: float, x2: float, y2: float, color: str,
+              width: float = 2, dashed: bool = False):
+        """带实心箭头的连线"""
+        sx, sy = self._point(x1, y1)
+        ex, ey = self._point(x2, y2)
+        length = math.hypot(ex - sx, ey - sy) or 1.0
+        ux, uy = (ex - sx) / length, (ey - sy) / length
+        # 箭头为长10、宽8像素的三角形，线段在箭头底边处结束
+        bx, by = ex - ux * 10, ey - uy * 10
+        head = f"{ex:.1f},{ey:.1f} {bx - uy * 4:.1f},{by + ux * 4:.1f} {bx + uy * 4:.1f},{by - ux * 4:.1f}"
+        self._arrows.append(_SVG_ARROW_TEMPLATE.format(
+            x1=sx, y1=sy, x2=bx, y2=by, color=color, width=width,
+            dash=' stroke-dasharray="6,4"' if dashed else '', head=head
+        ))
+
+    def render(self) -> bytes:
+        body = "".join(self._rects) + "".join(self._arrows) + "".join(self._texts)
+        return _SVG_DOCUMENT_TEMPLATE.format(
+            width=self.width, height=self.height, font_family=_svg_font_family(), body=body
+        ).encode()
+
+@lru_cache(maxsize=None)
+def _svg_font_family() -> str:
+    """直接生成SVG时的font-family属性值，与matplotlib使用的字体一致"""
+    return html.escape(", ".join((*_resolve_font_families(), "sans-serif")))
+
+def _content_digest(content: Dict[str, Any], *extra: str) -> str:
+    """计算图表内容的稳定哈希，用于输出文件名
+
+    内置hash()对字符串按进程随机加盐，重启或多个worker之间结果不同，无法复用已生成的文件。
+    按键排序序列化，键顺序不同的相同内容得到同一哈希；非字符串键和无法直接序列化的值按字符串处理。
+    """
+    data = orjson.dumps(content, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    digest = hashlib.blake2b(data, digest_size=10)
+    for part in extra:
+        digest.update(b"\0" + part.encode())
+    return digest.hexdigest()
+
 class DiagramType:
     """图表类型常量"""
     ARCHITECTURE = "architecture"
@@ -37,16 +263,88 @@ class DiagramType:
     MINDMAP = "mindmap"
     SYSTEM_DESIGN = "system_design"
 
+# 图表颜色主题（只读，模块加载时构建一次）
+_COLOR_THEMES: Dict[str, Dict[str, str]] = {
+    'modern': {
+        'layer_bg': '#E3F2FD',
+        'layer_border': '#1976D2',
+        'component_bg': '#FFFFFF',
+        'component_border': '#424242',
+        'arrow': '#1976D2',
+        'start_node': '#4CAF50',
+        'end_node': '#F44336',
+        'decision_node': '#FF9800',
+        'process_node': '#2196F3',
+        'participant_bg': '#E1F5FE',
+        'participant_border': '#0277BD',
+        'lifeline': '#757575',
+        'message_arrow': '#1976D2',
+        'class_bg': '#F3E5F5',
+        'server_node': '#4CAF50',
+        'client_node': '#2196F3',
+        'default_node': '#9E9E9E',
+        'connection': '#757575',
+        'timeline_axis': '#424242',
+        'event_point': '#1976D2',
+        'event_line': '#757575',
+        'event_bg': '#E3F2FD',
+        'mindmap_center': '#1976D2',
+        'mindmap_branch': '#757575',
+        'mindmap_node': '#4CAF50',
+        'mindmap_sub_branch': '#BDBDBD',
+        'mindmap_sub_node': '#E8F5E8',
+        'database_comp': '#FF9800',
+        'cache_comp': '#E91E63',
+        'queue_comp': '#9C27B0',
+        'api_comp': '#2196F3',
+        'service_comp': '#4CAF50',
+        'connection_arrow': '#424242'
+    },
+    'classic': {
+        'layer_bg': '#F5F5F5',
+        'layer_border': '#333333',
+        'component_bg': '#FFFFFF',
+        'component_border': '#000000',
+        'arrow': '#000000',
+        'start_node': '#90EE90',
+        'end_node': '#FFB6C1',
+        'decision_node': '#FFD700',
+        'process_node': '#87CEEB',
+        'participant_bg': '#F0F8FF',
+        'participant_border': '#000080',
+        'lifeline': '#696969',
+        'message_arrow': '#000080',
+        'class_bg': '#FFFACD',
+        'server_node': '#90EE90',
+        'client_node': '#87CEEB',
+        'default_node': '#D3D3D3',
+        'connection': '#696969',
+        'timeline_axis': '#000000',
+        'event_point': '#000080',
+        'event_line': '#696969',
+        'event_bg': '#F0F8FF',
+        'mindmap_center': '#000080',
+        'mindmap_branch': '#696969',
+        'mindmap_node': '#90EE90',
+        'mindmap_sub_branch': '#A9A9A9',
+        'mindmap_sub_node': '#F0FFF0',
+        'database_comp': '#FFD700',
+        'cache_comp': '#FF69B4',
+        'queue_comp': '#DA70D6',
+        'api_comp': '#87CEEB',
+        'service_comp': '#90EE90',
+        'connection_arrow': '#000000'
+    }
+}
+
 class DiagramService:
     """图表生成服务"""
     
     def __init__(self):
         self.output_dir = Path(settings.MEDIA_ROOT) / "diagrams"
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 设置中文字体支持
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial Unicode MS']
-        plt.rcParams['axes.unicode_minus'] = False
+        # 已渲染的Graphviz图表：输出文件路径 -> 结果
+        self._render_cache: LRUCache = LRUCache(maxsize=256)
     
     async def generate_diagram(
         self,
@@ -66,7 +364,8 @@ class DiagramService:
             title: 图表标题
             style: 图表样式
             format: 输出格式 (png, svg, pdf)
-            **kwargs: 其他参数
+            **kwargs: 其他参数，如 return_base64、quality、dpi；
+                架构图和系统设计图输出SVG时默认直接生成，renderer='mpl' 改用matplotlib绘制
             
         Returns:
             包含图表信息的字典
@@ -104,7 +403,26 @@ class DiagramService:
         **kwargs
     ) -> Dict[str, Any]:
         """生成架构图"""
-        fig, ax = plt.subplots(figsize=(14, 10))
+        # 相同的图表已经保存过时跳过绘制
+        saved = await self._get_saved(title or "architecture", format, content, style, **kwargs)
+        if saved is not None:
+            return saved
+        
+        if format == 'svg' and kwargs.get('renderer') != 'mpl':
+            # 图中只有矩形、文字和箭头，SVG按模板直接生成，不经过matplotlib
+            svg = self._build_architecture_svg(content, title, style)
+            return await self._save_svg(svg, title or "architecture", format, content, style, **kwargs)
+        
+        # 绘图是CPU密集的同步操作，放到线程池中执行，避免阻塞事件循环
+        fig = await asyncio.to_thread(self._build_architecture_diagram, content, title, style)
+        return await self._save_diagram(fig, title or "architecture", format, content, style, **kwargs)
+    
+    def _build_architecture_diagram(self, content: Dict[str, Any], title: str, style: str):
+        """绘制架构图"""
+        from matplotlib.collections import PatchCollection
+        from matplotlib.patches import FancyBboxPatch
+        
+        fig, ax = _figure_pool.acquire((14, 10))
         ax.set_xlim(0, 10)
         ax.set_ylim(0, 8)
         ax.axis('off')
@@ -121,19 +439,17 @@ class DiagramService:
         connections = content.get('connections', [])
         layers = content.get('layers', [])
         
-        # 绘制层级
+        # 绘制层级，层级背景和组件框分别收集后各作为一个图元添加
+        layer_rects = []
+        comp_rects = []
         layer_height = 1.5
         for i, layer in enumerate(layers):
             y_pos = 6 - i * layer_height
-            # 绘制层级背景
-            rect = FancyBboxPatch(
+            # 层级背景
+            layer_rects.append(FancyBboxPatch(
                 (0.5, y_pos - 0.6), 9, 1.2,
-                boxstyle="round,pad=0.1",
-                facecolor=colors['layer_bg'],
-                edgecolor=colors['layer_border'],
-                alpha=0.3
-            )
-            ax.add_patch(rect)
+                boxstyle="round,pad=0.1"
+            ))
             
             # 层级标题
             ax.text(0.2, y_pos, layer.get('name', ''), fontsize=12, fontweight='bold', va='center')
@@ -145,17 +461,22 @@ class DiagramService:
                 x_pos = 1 + j * comp_width + comp_width/2
                 
                 # 组件框
-                comp_rect = FancyBboxPatch(
+                comp_rects.append(FancyBboxPatch(
                     (x_pos - comp_width/3, y_pos - 0.3), comp_width*2/3, 0.6,
-                    boxstyle="round,pad=0.05",
-                    facecolor=colors['component_bg'],
-                    edgecolor=colors['component_border']
-                )
-                ax.add_patch(comp_rect)
+                    boxstyle="round,pad=0.05"
+                ))
                 
                 # 组件名称
                 ax.text(x_pos, y_pos, comp.get('name', ''), fontsize=10, ha='center', va='center')
         
+        # 组件框画在半透明的层级背景之上
+        ax.add_collection(PatchCollection(
+            layer_rects, facecolors=colors['layer_bg'], edgecolors=colors['layer_border'], alpha=0.3
+        ))
+        ax.add_collection(PatchCollection(
+            comp_rects, facecolors=colors['component_bg'], edgecolors=colors['component_border']
+        ))
+        
         # 绘制连接线
         for conn in connections:
             start = conn.get('start', {})
@@ -165,8 +486,38 @@ class DiagramService:
                            xytext=(start.get('x', 0), start.get('y', 0)),
                            arrowprops=dict(arrowstyle='->', color=colors['arrow'], lw=2))
         
-        # 保存图表
-        return await self._save_diagram(fig, title or "architecture", format)
+        return fig
+    
+    def _build_architecture_svg(self, content: Dict[str, Any], title: str, style: str) -> bytes:
+        """直接生成架构图SVG，布局与 _build_architecture_diagram 相同"""
+        canvas = _SvgCanvas(xlim=(0, 10), ylim=(0, 8))
+        colors = self._get_color_theme(style)
+        
+        if title:
+            canvas.text(5, 7.5, title, size=16, bold=True)
+        
+        layer_height = 1.5
+        for i, layer in enumerate(content.get('layers', [])):
+            y_pos = 6 - i * layer_height
+            canvas.rect(0.5, y_pos - 0.6, 9, 1.2, fill=colors['layer_bg'], stroke=colors['layer_border'],
+                        pad=0.1, opacity=0.3)
+            canvas.text(0.2, y_pos, layer.get('name', ''), size=12, bold=True, anchor="start")
+            
+            layer_components = layer.get('components', [])
+            comp_width = 8 / max(len(layer_components), 1)
+            for j, comp in enumerate(layer_components):
+                x_pos = 1 + j * comp_width + comp_width/2
+                canvas.rect(x_pos - comp_width/3, y_pos - 0.3, comp_width*2/3, 0.6,
+                            fill=colors['component_bg'], stroke=colors['component_border'], pad=0.05)
+                canvas.text(x_pos, y_pos, comp.get('name', ''), size=10)
+        
+        for conn in content.get('connections', []):
+            start = conn.get('start', {})
+            end = conn.get('end', {})
+            if start and end:
+                canvas.arrow(start.get('x', 0), start.get('y', 0), end.get('x', 0), end.get('y', 0), colors['arrow'])
+        
+        return canvas.render()
     
     async def _generate_flowchart(
         self,
@@ -177,7 +528,14 @@ class DiagramService:
         **kwargs
     ) -> Dict[str, Any]:
         """生成流程图"""
+        output_path = self.output_dir / f"{title or 'flowchart'}_{_content_digest(content, style)}"
+        cached = self._get_rendered(output_path, format, DiagramType.FLOWCHART, title)
+        if cached is not None:
+            return cached
+        
         # 使用Graphviz生成流程图
+        import graphviz
+        
         dot = graphviz.Digraph(comment=title)
         dot.attr(rankdir='TB', size='10,8')
         dot.attr('node', shape='box', style='rounded,filled', fontname='SimHei')
@@ -212,16 +570,17 @@ class DiagramService:
             if from_node and to_node:
                 dot.edge(from_node, to_node, label=label)
         
-        # 渲染图表
-        output_path = self.output_dir / f"{title or 'flowchart'}_{hash(str(content))}"
-        dot.render(str(output_path), format=format, cleanup=True)
+        # 渲染图表：布局和输出是阻塞操作，放到线程池中执行
+        await asyncio.to_thread(_render_dot, dot, output_path, format)
         
-        return {
+        result = {
             'success': True,
             'file_path': f"{output_path}.{format}",
             'diagram_type': DiagramType.FLOWCHART,
             'title': title
         }
+        self._render_cache[result['file_path']] = result
+        return dict(result)
     
     async def _generate_sequence_diagram(
         self,
@@ -232,7 +591,20 @@ class DiagramService:
         **kwargs
     ) -> Dict[str, Any]:
         """生成时序图"""
-        fig, ax = plt.subplots(figsize=(12, 8))
+        # 相同的图表已经保存过时跳过绘制
+        saved = await self._get_saved(title or "sequence", format, content, style, **kwargs)
+        if saved is not None:
+            return saved
+        
+        # 绘图是CPU密集的同步操作，放到线程池中执行，避免阻塞事件循环
+        fig = await asyncio.to_thread(self._build_sequence_diagram, content, title, style)
+        return await self._save_diagram(fig, title or "sequence", format, content, style, **kwargs)
+    
+    def _build_sequence_diagram(self, content: Dict[str, Any], title: str, style: str):
+        """绘制时序图"""
+        from matplotlib.patches import FancyBboxPatch
+        
+        fig, ax = _figure_pool.acquire((12, 8))
         
         # 获取参与者和消息
         participants = content.get('participants', [])
@@ -295,7 +667,7 @@ class DiagramService:
         if title:
             ax.text(5, 7.8, title, fontsize=14, fontweight='bold', ha='center')
         
-        return await self._save_diagram(fig, title or "sequence", format)
+        return fig
     
     async def _generate_class_diagram(
         self,
@@ -306,6 +678,13 @@ class DiagramService:
         **kwargs
     ) -> Dict[str, Any]:
         """生成类图"""
+        output_path = self.output_dir / f"{title or 'class_diagram'}_{_content_digest(content, style)}"
+        cached = self._get_rendered(output_path, format, DiagramType.CLASS_DIAGRAM, title)
+        if cached is not None:
+            return cached
+        
+        import graphviz
+        
         dot = graphviz.Digraph(comment=title)
         dot.attr(rankdir='TB', size='12,10')
         dot.attr('node', shape='record', style='filled', fontname='SimHei')
@@ -349,16 +728,17 @@ class DiagramService:
                 else:
                     dot.edge(from_class, to_class)
         
-        # 渲染图表
-        output_path = self.output_dir / f"{title or 'class_diagram'}_{hash(str(content))}"
-        dot.render(str(output_path), format=format, cleanup=True)
+        # 渲染图表：布局和输出是阻塞操作，放到线程池中执行
+        await asyncio.to_thread(_render_dot, dot, output_path, format)
         
-        return {
+        result = {
             'success': True,
             'file_path': f"{output_path}.{format}",
             'diagram_type': DiagramType.CLASS_DIAGRAM,
             'title': title
         }
+        self._render_cache[result['file_path']] = result
+        return dict(result)
     
     async def _generate_network_diagram(
         self,
@@ -369,46 +749,56 @@ class DiagramService:
         **kwargs
     ) -> Dict[str, Any]:
         """生成网络拓扑图"""
-        fig, ax = plt.subplots(figsize=(12, 8))
+        # 相同的图表已经保存过时跳过绘制
+        saved = await self._get_saved(title or "network", format, content, style, **kwargs)
+        if saved is not None:
+            return saved
+        
+        # 绘图是CPU密集的同步操作，放到线程池中执行，避免阻塞事件循环
+        fig = await asyncio.to_thread(self._build_network_diagram, content, title, style)
+        return await self._save_diagram(fig, title or "network", format, content, style, **kwargs)
+    
+    def _build_network_diagram(self, content: Dict[str, Any], title: str, style: str):
+        """绘制网络拓扑图"""
+        from matplotlib.collections import LineCollection, PatchCollection
+        from matplotlib.patches import Circle
+        
+        fig, ax = _figure_pool.acquire((12, 8))
         
         nodes = content.get('nodes', [])
         edges = content.get('edges', [])
         
         colors = self._get_color_theme(style)
         
-        # 简单的圆形布局
-        import math
-        num_nodes = len(nodes)
-        node_positions = {}
+        # 简单的圆形布局，一次计算出所有节点的坐标
+        angles = np.linspace(0, 2 * np.pi, len(nodes), endpoint=False)
+        xs = (5 + 3 * np.cos(angles)).tolist()
+        ys = (4 + 3 * np.sin(angles)).tolist()
+        node_positions = {node['id']: (x, y) for node, x, y in zip(nodes, xs, ys)}
         
-        for i, node in enumerate(nodes):
-            angle = 2 * math.pi * i / num_nodes
-            x = 5 + 3 * math.cos(angle)
-            y = 4 + 3 * math.sin(angle)
-            node_positions[node['id']] = (x, y)
-            
-            # 绘制节点
+        # 绘制节点，所有节点合并为一个图元
+        node_colors = []
+        for node, x, y in zip(nodes, xs, ys):
             node_type = node.get('type', 'server')
             if node_type == 'server':
-                color = colors['server_node']
+                node_colors.append(colors['server_node'])
             elif node_type == 'client':
-                color = colors['client_node']
+                node_colors.append(colors['client_node'])
             else:
-                color = colors['default_node']
-            
-            circle = plt.Circle((x, y), 0.5, color=color, alpha=0.8)
-            ax.add_patch(circle)
+                node_colors.append(colors['default_node'])
             ax.text(x, y, node.get('name', ''), ha='center', va='center', fontweight='bold')
+        ax.add_collection(PatchCollection(
+            [Circle((x, y), 0.5) for x, y in zip(xs, ys)],
+            facecolors=node_colors, edgecolors=node_colors, alpha=0.8
+        ))
         
-        # 绘制连接
-        for edge in edges:
-            from_id = edge.get('from')
-            to_id = edge.get('to')
-            
-            if from_id in node_positions and to_id in node_positions:
-                x1, y1 = node_positions[from_id]
-                x2, y2 = node_positions[to_id]
-                ax.plot([x1, x2], [y1, y2], color=colors['connection'], linewidth=2, alpha=0.7)
+        # 绘制连接，所有连线合并为一个图元
+        segments = [
+            (node_positions[edge.get('from')], node_positions[edge.get('to')])
+            for edge in edges
+            if edge.get('from') in node_positions and edge.get('to') in node_positions
+        ]
+        ax.add_collection(LineCollection(segments, colors=colors['connection'], linewidths=2, alpha=0.7))
         
         ax.set_xlim(0, 10)
         ax.set_ylim(0, 8)
@@ -417,7 +807,7 @@ class DiagramService:
         if title:
             ax.text(5, 7.5, title, fontsize=14, fontweight='bold', ha='center')
         
-        return await self._save_diagram(fig, title or "network", format)
+        return fig
     
     async def _generate_timeline(
         self,
@@ -428,7 +818,18 @@ class DiagramService:
         **kwargs
     ) -> Dict[str, Any]:
         """生成时间线图"""
-        fig, ax = plt.subplots(figsize=(14, 6))
+        # 相同的图表已经保存过时跳过绘制
+        saved = await self._get_saved(title or "timeline", format, content, style, **kwargs)
+        if saved is not None:
+            return saved
+        
+        # 绘图是CPU密集的同步操作，放到线程池中执行，避免阻塞事件循环
+        fig = await asyncio.to_thread(self._build_timeline, content, title, style)
+        return await self._save_diagram(fig, title or "timeline", format, content, style, **kwargs)
+    
+    def _build_timeline(self, content: Dict[str, Any], title: str, style: str):
+        """绘制时间线图"""
+        fig, ax = _figure_pool.acquire((14, 6))
         
         events = content.get('events', [])
         colors = self._get_color_theme(style)
@@ -463,7 +864,7 @@ class DiagramService:
         if title:
             ax.text(len(events), 1.5, title, fontsize=14, fontweight='bold', ha='center')
         
-        return await self._save_diagram(fig, title or "timeline", format)
+        return fig
     
     async def _generate_mindmap(
         self,
@@ -474,7 +875,21 @@ class DiagramService:
         **kwargs
     ) -> Dict[str, Any]:
         """生成思维导图"""
-        fig, ax = plt.subplots(figsize=(12, 10))
+        # 相同的图表已经保存过时跳过绘制
+        saved = await self._get_saved(title or "mindmap", format, content, style, **kwargs)
+        if saved is not None:
+            return saved
+        
+        # 绘图是CPU密集的同步操作，放到线程池中执行，避免阻塞事件循环
+        fig = await asyncio.to_thread(self._build_mindmap, content, title, style)
+        return await self._save_diagram(fig, title or "mindmap", format, content, style, **kwargs)
+    
+    def _build_mindmap(self, content: Dict[str, Any], title: str, style: str):
+        """绘制思维导图"""
+        from matplotlib.collections import LineCollection, PatchCollection
+        from matplotlib.patches import Circle
+        
+        fig, ax = _figure_pool.acquire((12, 10))
         
         root = content.get('root', {})
         branches = content.get('branches', [])
@@ -482,43 +897,40 @@ class DiagramService:
         
         # 绘制中心节点
         center_x, center_y = 6, 5
-        center_circle = plt.Circle((center_x, center_y), 1, color=colors['mindmap_center'], alpha=0.8)
+        center_circle = Circle((center_x, center_y), 1, color=colors['mindmap_center'], alpha=0.8)
         ax.add_patch(center_circle)
         ax.text(center_x, center_y, root.get('text', ''), ha='center', va='center', 
                fontweight='bold', fontsize=12)
         
-        # 绘制分支
-        import math
-        num_branches = len(branches)
-        for i, branch in enumerate(branches):
-            angle = 2 * math.pi * i / num_branches
-            branch_x = center_x + 3 * math.cos(angle)
-            branch_y = center_y + 3 * math.sin(angle)
-            
-            # 分支连接线
-            ax.plot([center_x, branch_x], [center_y, branch_y], 
-                   color=colors['mindmap_branch'], linewidth=3, alpha=0.7)
-            
-            # 分支节点
-            branch_circle = plt.Circle((branch_x, branch_y), 0.6, 
-                                     color=colors['mindmap_node'], alpha=0.8)
-            ax.add_patch(branch_circle)
+        # 绘制分支，分支节点均匀分布在中心节点周围
+        angles = np.linspace(0, 2 * np.pi, len(branches), endpoint=False)
+        branch_xs = (center_x + 3 * np.cos(angles)).tolist()
+        branch_ys = (center_y + 3 * np.sin(angles)).tolist()
+        # 分支连接线和分支节点各合并为一个图元
+        ax.add_collection(LineCollection(
+            [((center_x, center_y), (branch_x, branch_y)) for branch_x, branch_y in zip(branch_xs, branch_ys)],
+            colors=colors['mindmap_branch'], linewidths=3, alpha=0.7
+        ))
+        ax.add_collection(PatchCollection(
+            [Circle((branch_x, branch_y), 0.6) for branch_x, branch_y in zip(branch_xs, branch_ys)],
+            facecolors=colors['mindmap_node'], edgecolors=colors['mindmap_node'], alpha=0.8
+        ))
+        sub_segments = []
+        for branch, angle, branch_x, branch_y in zip(branches, angles.tolist(), branch_xs, branch_ys):
             ax.text(branch_x, branch_y, branch.get('text', ''), ha='center', va='center',
                    fontweight='bold', fontsize=10)
             
             # 子分支
             sub_branches = branch.get('children', [])
-            for j, sub_branch in enumerate(sub_branches):
-                sub_angle = angle + (j - len(sub_branches)/2) * 0.3
-                sub_x = branch_x + 1.5 * math.cos(sub_angle)
-                sub_y = branch_y + 1.5 * math.sin(sub_angle)
-                
-                ax.plot([branch_x, sub_x], [branch_y, sub_y], 
-                       color=colors['mindmap_sub_branch'], linewidth=2, alpha=0.6)
-                
+            sub_angles = angle + (np.arange(len(sub_branches)) - len(sub_branches) / 2) * 0.3
+            sub_xs = (branch_x + 1.5 * np.cos(sub_angles)).tolist()
+            sub_ys = (branch_y + 1.5 * np.sin(sub_angles)).tolist()
+            for sub_branch, sub_x, sub_y in zip(sub_branches, sub_xs, sub_ys):
+                sub_segments.append(((branch_x, branch_y), (sub_x, sub_y)))
                 ax.text(sub_x, sub_y, sub_branch.get('text', ''), ha='center', va='center',
                        bbox=dict(boxstyle="round,pad=0.2", facecolor=colors['mindmap_sub_node'], alpha=0.7),
                        fontsize=8)
+        ax.add_collection(LineCollection(sub_segments, colors=colors['mindmap_sub_branch'], linewidths=2, alpha=0.6))
         
         ax.set_xlim(0, 12)
         ax.set_ylim(0, 10)
@@ -527,7 +939,7 @@ class DiagramService:
         if title:
             ax.text(6, 9, title, fontsize=14, fontweight='bold', ha='center')
         
-        return await self._save_diagram(fig, title or "mindmap", format)
+        return fig
     
     async def _generate_system_design(
         self,
@@ -538,13 +950,34 @@ class DiagramService:
         **kwargs
     ) -> Dict[str, Any]:
         """生成系统设计图"""
-        fig, ax = plt.subplots(figsize=(16, 12))
+        # 相同的图表已经保存过时跳过绘制
+        saved = await self._get_saved(title or "system_design", format, content, style, **kwargs)
+        if saved is not None:
+            return saved
+        
+        if format == 'svg' and kwargs.get('renderer') != 'mpl':
+            # 图中只有矩形、文字和箭头，SVG按模板直接生成，不经过matplotlib
+            svg = self._build_system_design_svg(content, title, style)
+            return await self._save_svg(svg, title or "system_design", format, content, style, **kwargs)
+        
+        # 绘图是CPU密集的同步操作，放到线程池中执行，避免阻塞事件循环
+        fig = await asyncio.to_thread(self._build_system_design, content, title, style)
+        return await self._save_diagram(fig, title or "system_design", format, content, style, **kwargs)
+    
+    def _build_system_design(self, content: Dict[str, Any], title: str, style: str):
+        """绘制系统设计图"""
+        from matplotlib.collections import PatchCollection
+        from matplotlib.patches import FancyBboxPatch
+        
+        fig, ax = _figure_pool.acquire((16, 12))
         
         components = content.get('components', [])
         connections = content.get('connections', [])
         colors = self._get_color_theme(style)
         
-        # 绘制组件
+        # 绘制组件，组件框收集后作为一个图元添加
+        comp_rects = []
+        comp_colors = []
         for comp in components:
             x = comp.get('x', 0)
             y = comp.get('y', 0)
@@ -554,29 +987,28 @@ class DiagramService:
             
             # 根据组件类型选择颜色
             if comp_type == 'database':
-                color = colors['database_comp']
+                comp_colors.append(colors['database_comp'])
             elif comp_type == 'cache':
-                color = colors['cache_comp']
+                comp_colors.append(colors['cache_comp'])
             elif comp_type == 'queue':
-                color = colors['queue_comp']
+                comp_colors.append(colors['queue_comp'])
             elif comp_type == 'api':
-                color = colors['api_comp']
+                comp_colors.append(colors['api_comp'])
             else:
-                color = colors['service_comp']
+                comp_colors.append(colors['service_comp'])
             
-            # 绘制组件框
-            rect = FancyBboxPatch(
+            # 组件框
+            comp_rects.append(FancyBboxPatch(
                 (x, y), width, height,
-                boxstyle="round,pad=0.1",
-                facecolor=color,
-                edgecolor=colors['component_border'],
-                linewidth=2
-            )
-            ax.add_patch(rect)
+                boxstyle="round,pad=0.1"
+            ))
             
             # 组件标签
             ax.text(x + width/2, y + height/2, comp.get('name', ''), 
                    ha='center', va='center', fontweight='bold', fontsize=10)
+        ax.add_collection(PatchCollection(
+            comp_rects, facecolors=comp_colors, edgecolors=colors['component_border'], linewidths=2
+        ))
         
         # 绘制连接
         for conn in connections:
@@ -615,105 +1047,204 @@ class DiagramService:
         if title:
             ax.text(7, 10.5, title, fontsize=16, fontweight='bold', ha='center')
         
-        return await self._save_diagram(fig, title or "system_design", format)
+        return fig
     
-    def _get_color_theme(self, style: str) -> Dict[str, str]:
-        """获取颜色主题"""
-        themes = {
-            'modern': {
-                'layer_bg': '#E3F2FD',
-                'layer_border': '#1976D2',
-                'component_bg': '#FFFFFF',
-                'component_border': '#424242',
-                'arrow': '#1976D2',
-                'start_node': '#4CAF50',
-                'end_node': '#F44336',
-                'decision_node': '#FF9800',
-                'process_node': '#2196F3',
-                'participant_bg': '#E1F5FE',
-                'participant_border': '#0277BD',
-                'lifeline': '#757575',
-                'message_arrow': '#1976D2',
-                'class_bg': '#F3E5F5',
-                'server_node': '#4CAF50',
-                'client_node': '#2196F3',
-                'default_node': '#9E9E9E',
-                'connection': '#757575',
-                'timeline_axis': '#424242',
-                'event_point': '#1976D2',
-                'event_line': '#757575',
-                'event_bg': '#E3F2FD',
-                'mindmap_center': '#1976D2',
-                'mindmap_branch': '#757575',
-                'mindmap_node': '#4CAF50',
-                'mindmap_sub_branch': '#BDBDBD',
-                'mindmap_sub_node': '#E8F5E8',
-                'database_comp': '#FF9800',
-                'cache_comp': '#E91E63',
-                'queue_comp': '#9C27B0',
-                'api_comp': '#2196F3',
-                'service_comp': '#4CAF50',
-                'connection_arrow': '#424242'
-            },
-            'classic': {
-                'layer_bg': '#F5F5F5',
-                'layer_border': '#333333',
-                'component_bg': '#FFFFFF',
-                'component_border': '#000000',
-                'arrow': '#000000',
-                'start_node': '#90EE90',
-                'end_node': '#FFB6C1',
-                'decision_node': '#FFD700',
-                'process_node': '#87CEEB',
-                'participant_bg': '#F0F8FF',
-                'participant_border': '#000080',
-                'lifeline': '#696969',
-                'message_arrow': '#000080',
-                'class_bg': '#FFFACD',
-                'server_node': '#90EE90',
-                'client_node': '#87CEEB',
-                'default_node': '#D3D3D3',
-                'connection': '#696969',
-                'timeline_axis': '#000000',
-                'event_point': '#000080',
-                'event_line': '#696969',
-                'event_bg': '#F0F8FF',
-                'mindmap_center': '#000080',
-                'mindmap_branch': '#696969',
-                'mindmap_node': '#90EE90',
-                'mindmap_sub_branch': '#A9A9A9',
-                'mindmap_sub_node': '#F0FFF0',
-                'database_comp': '#FFD700',
-                'cache_comp': '#FF69B4',
-                'queue_comp': '#DA70D6',
-                'api_comp': '#87CEEB',
-                'service_comp': '#90EE90',
-                'connection_arrow': '#000000'
-            }
+    def _build_system_design_svg(self, content: Dict[str, Any], title: str, style: str) -> bytes:
+        """直接生成系统设计图SVG，布局与 _build_system_design 相同"""
+        canvas = _SvgCanvas(xlim=(-1, 15), ylim=(-1, 11))
+        colors = self._get_color_theme(style)
+        comp_colors = {
+            'database': colors['database_comp'],
+            'cache': colors['cache_comp'],
+            'queue': colors['queue_comp'],
+            'api': colors['api_comp'],
         }
-        return themes.get(style, themes['modern'])
-    
-    async def _save_diagram(self, fig, filename: str, format: str) -> Dict[str, Any]:
-        """保存图表"""
-        output_path = self.output_dir / f"{filename}_{hash(str(fig))}.{format}"
         
-        # 保存文件
-        fig.savefig(str(output_path), format=format, dpi=300, bbox_inches='tight', 
-                   facecolor='white', edgecolor='none')
-        plt.close(fig)
+        for comp in content.get('components', []):
+            x = comp.get('x', 0)
+            y = comp.get('y', 0)
+            width = comp.get('width', 2)
+            height = comp.get('height', 1)
+            canvas.rect(x, y, width, height,
+                        fill=comp_colors.get(comp.get('type', 'service'), colors['service_comp']),
+                        stroke=colors['component_border'], pad=0.1, stroke_width=2)
+            canvas.text(x + width/2, y + height/2, comp.get('name', ''), size=10, bold=True)
+        
+        for conn in content.get('connections', []):
+            from_comp = conn.get('from', {})
+            to_comp = conn.get('to', {})
+            if from_comp and to_comp:
+                x1 = from_comp.get('x', 0) + from_comp.get('width', 2) / 2
+                y1 = from_comp.get('y', 0) + from_comp.get('height', 1) / 2
+                x2 = to_comp.get('x', 0) + to_comp.get('width', 2) / 2
+                y2 = to_comp.get('y', 0) + to_comp.get('height', 1) / 2
+                canvas.arrow(x1, y1, x2, y2, colors['connection_arrow'],
+                             dashed=conn.get('type', 'sync') == 'async')
+                if conn.get('label'):
+                    canvas.text((x1 + x2) / 2, (y1 + y2) / 2, conn['label'], size=8, background='white')
         
-        # 转换为base64（可选）
-        with open(output_path, 'rb') as f:
-            image_data = f.read()
-            base64_data = base64.b64encode(image_data).decode('utf-8')
+        if title:
+            canvas.text(7, 10.5, title, size=16, bold=True)
         
-        return {
+        return canvas.render()
+    
+    def _get_rendered(
+        self,
+        output_path: Path,
+        format: str,
+        diagram_type: str,
+        title: str
+    ) -> Optional[Dict[str, Any]]:
+        """返回已渲染的图表结果，文件不存在时返回None
+
+        文件名由内容哈希决定，相同内容和样式的图表只需渲染一次；
+        进程内缓存未命中但文件已存在时（如其他worker已渲染）同样直接复用。
+        """
+        file_path = f"{output_path}.{format}"
+        if not Path(file_path).exists():
+            self._render_cache.pop(file_path, None)
+            return None
+        result = self._render_cache.get(file_path)
+        if result is None:
+            result = self._render_cache[file_path] = {
+                'success': True,
+                'file_path': file_path,
+                'diagram_type': diagram_type,
+                'title': title
+            }
+        return dict(result)
+    
+    def _get_color_theme(self, style: str) -> Dict[str, str]:
+        """获取颜色主题"""
+        return _COLOR_THEMES.get(style, _COLOR_THEMES['modern'])
+    
+    async def _save_diagram(
+        self,
+        fig,
+        filename: str,
+        format: str,
+        content: Dict[str, Any],
+        style: str = "",
+        **kwargs
+    ) -> Dict[str, Any]:
+        """保存图表，编码和写文件在线程池中执行"""
+        return await asyncio.to_thread(self._save_diagram_sync, fig, filename, format, content, style, **kwargs)
+    
+    def _figure_path(
+        self,
+        filename: str,
+        format: str,
+        content: Dict[str, Any],
+        style: str,
+        dpi: Optional[int] = None,
+        quality: str = "screen",
+        renderer: Optional[str] = None,
+        **kwargs
+    ) -> Tuple[Path, int]:
+        """计算matplotlib图表的输出路径和分辨率
+
+        Args:
+            dpi: 输出分辨率，未指定时按quality确定
+            quality: 图表质量 (draft, screen, print)
+            renderer: 指定的渲染方式，不同渲染方式的输出不同，分别保存
+        """
+        dpi = dpi or DIAGRAM_QUALITY_DPI.get(quality, DIAGRAM_QUALITY_DPI["screen"])
+        # Figure的字符串形式只包含尺寸，不能区分不同图表，文件名改用内容哈希
+        extra = (style, str(dpi), renderer) if renderer else (style, str(dpi))
+        return self.output_dir / f"{filename}_{_content_digest(content, *extra)}.{format}", dpi
+    
+    @staticmethod
+    def _saved_result(
+        output_path: Path,
+        filename: str,
+        return_base64: bool,
+        image_data: Optional[bytes] = None
+    ) -> Dict[str, Any]:
+        """构造已保存图表的结果"""
+        result = {
             'success': True,
             'file_path': str(output_path),
-            'base64_data': base64_data,
             'diagram_type': 'custom',
             'title': filename
         }
+        if return_base64:
+            if image_data is None:
+                image_data = output_path.read_bytes()
+            result['base64_data'] = base64.b64encode(image_data).decode('utf-8')
+        return result
+    
+    async def _get_saved(
+        self,
+        filename: str,
+        format: str,
+        content: Dict[str, Any],
+        style: str,
+        return_base64: bool = False,
+        **kwargs
+    ) -> Optional[Dict[str, Any]]:
+        """返回已保存的相同图表，不存在时返回None
+
+        输出文件名由内容、样式和分辨率决定，文件本身就是跨进程、跨重启的渲染缓存。
+        """
+        output_path, _ = self._figure_path(filename, format, content, style, **kwargs)
+        if not output_path.exists():
+            return None
+        if return_base64:
+            return await asyncio.to_thread(self._saved_result, output_path, filename, True)
+        return self._saved_result(output_path, filename, False)
+    
+    async def _save_svg(
+        self,
+        svg: bytes,
+        filename: str,
+        format: str,
+        content: Dict[str, Any],
+        style: str = "",
+        return_base64: bool = False,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """保存直接生成的SVG图表"""
+        output_path, _ = self._figure_path(filename, format, content, style, **kwargs)
+        await asyncio.to_thread(output_path.write_bytes, svg)
+        return self._saved_result(output_path, filename, return_base64, svg)
+    
+    def _save_diagram_sync(
+        self,
+        fig,
+        filename: str,
+        format: str,
+        content: Dict[str, Any],
+        style: str = "",
+        return_base64: bool = False,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """保存图表，相同内容、样式和分辨率的图表已存在时直接复用文件
+        
+        Args:
+            return_base64: 是否在结果中附带base64编码的图片数据，默认不附带
+            **kwargs: 分辨率参数，见 _figure_path
+        """
+        output_path, dpi = self._figure_path(filename, format, content, style, **kwargs)
+        save_options = _PNG_SAVE_OPTIONS if format == 'png' else {}
+        
+        # 保存文件，保存后图表归还到池中（绘制失败的图表不归还，直接丢弃）
+        image_data = None
+        try:
+            if not output_path.exists():
+                if return_base64:
+                    # 先写入内存缓冲区，base64编码时无需再从磁盘读回
+                    buffer = io.BytesIO()
+                    fig.savefig(buffer, format=format, dpi=dpi, bbox_inches='tight', 
+                               facecolor='white', edgecolor='none', **save_options)
+                    image_data = buffer.getvalue()
+                    output_path.write_bytes(image_data)
+                else:
+                    fig.savefig(str(output_path), format=format, dpi=dpi, bbox_inches='tight', 
+                               facecolor='white', edgecolor='none', **save_options)
+        finally:
+            _figure_pool.release(fig)
+        
+        return self._saved_result(output_path, filename, return_base64, image_data)
 
 # 全局图表服务实例
 diagram_service = DiagramService()
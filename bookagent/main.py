@@ -1,10 +1,14 @@
 """
 BookAgent 应用入口
 """
+import os
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.config import settings
+
 # 创建简化版FastAPI应用（跳过数据库依赖）
 app = FastAPI(
     title="BookAgent",
@@ -32,11 +36,18 @@ async def health_check():
     return {"status": "healthy", "service": "BookAgent"}
 
 if __name__ == "__main__":
-    # 开发服务器配置
+    # DEBUG模式下以单进程自动重载方式运行（自动重载不支持多进程），
+    # 否则按WEB_CONCURRENCY（默认CPU核数）启动多个worker进程。
+    # 每个worker有独立的数据库连接池，增加worker数时需相应调小DB_POOL_SIZE和DB_MAX_OVERFLOW
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        log_level="info"
+        reload=settings.DEBUG,
+        workers=1 if settings.DEBUG else int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1),
+        log_level="info",
+        # 已安装uvloop和httptools（随uvicorn[standard]安装）时自动使用，降低流式响应的传输开销；
+        # Windows上没有uvloop，自动回退到asyncio事件循环
+        loop="auto",
+        http="auto"
     )
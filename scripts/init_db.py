@@ -10,7 +10,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # 从bookagent包导入模块
 from bookagent.app.core.config import settings
-from bookagent.app.core.database import Base, engine, get_db
+from bookagent.app.core.database import Base, engine, SessionLocal
 from bookagent.app.models.user import User
 from bookagent.app.models.template import Template
 from bookagent.app.schemas.user import UserCreate
@@ -38,7 +38,7 @@ def init_db():
 
 def init_admin_user():
     """初始化管理员账户"""
-    with get_db() as db:
+    with SessionLocal() as db:
         try:
             # 检查是否已存在管理员账户
             admin = db.query(User).filter(User.email == settings.FIRST_SUPERUSER).first()
@@ -69,7 +69,7 @@ def init_admin_user():
 
 def init_templates():
     """初始化模板数据"""
-    with get_db() as db:
+    with SessionLocal() as db:
         try:
             # 检查是否已存在模板
             template_count = db.query(Template).count()
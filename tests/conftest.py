@@ -0,0 +1,58 @@
+"""
+测试公共夹具
+"""
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core import cache as cache_module
+from app.core.cache import cache_manager
+from app.core.database import Base
+
+class FakeRedis:
+    """内存中的Redis替身，只实现缓存管理器用到的命令"""
+
+    def __init__(self):
+        self.data = {}
+        self.get_calls = 0
+
+    async def get(self, key):
+        self.get_calls += 1
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def delete(self, key):
+        return 1 if self.data.pop(key, None) is not None else 0
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def eval(self, script, numkeys, key, token):
+        # 释放锁脚本：令牌匹配时删除
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """将全局缓存管理器的Redis客户端替换为内存实现"""
+    redis = FakeRedis()
+    monkeypatch.setattr(cache_manager, "redis_client", redis)
+    monkeypatch.setattr(cache_module, "_LOCK_POLL_INTERVAL", 0.01)
+    return redis
+
+@pytest.fixture
+async def db():
+    """内存SQLite上的异步会话，与应用使用相同的会话配置"""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, autoflush=False, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
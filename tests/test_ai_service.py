@@ -7,6 +7,7 @@ from unittest.mock import AsyncMock, patch, MagicMock
 from fastapi import HTTPException
 
 from app.core.config import settings
+from app.core.llm import LLMConfig
 from app.services.ai_service import AIService, LLMClient
 from app.schemas.ai import AIChatRequest, AIGenerateRequest
 
@@ -26,6 +27,7 @@ async def test_generate_chapter_content(mock_llm_client):
     
     # 配置mock
     mock_client = AsyncMock()
+    mock_client.config = LLMConfig(api_key="test")
     mock_client.chat_completion.return_value = mock_response
     mock_llm_client.return_value = mock_client
     
@@ -54,6 +56,7 @@ async def test_chat_completion(mock_llm_client):
     
     # 配置mock
     mock_client = AsyncMock()
+    mock_client.config = LLMConfig(api_key="test")
     mock_client.chat_completion.return_value = mock_response
     mock_llm_client.return_value = mock_client
     
@@ -80,6 +83,7 @@ async def test_stream_chat_completion(mock_llm_client):
     
     # 配置mock
     mock_client = AsyncMock()
+    mock_client.config = LLMConfig(api_key="test")
     mock_client.chat_completion.return_value = AsyncMock()
     mock_client.chat_completion.return_value.__aiter__.return_value = mock_chunks
     mock_llm_client.return_value = mock_client
@@ -95,3 +99,30 @@ async def test_stream_chat_completion(mock_llm_client):
     result = [chunk async for chunk in stream]
     assert len(result) == 3
     assert result[0] == {"choices": [{"delta": {"content": "测试"}}]}
+
+@pytest.mark.asyncio
+async def test_generate_chapters_batch(mock_llm_client):
+    """测试批量生成章节内容"""
+    # 准备测试数据
+    mock_response = {
+        "choices": [{"message": {"content": '{"0": {"content": "第一章"}, "1": {"content": "第二章"}}'}}]
+    }
+    
+    # 配置mock
+    mock_client = AsyncMock()
+    mock_client.config = LLMConfig(api_key="test")
+    mock_client.chat_completion.return_value = mock_response
+    mock_llm_client.return_value = mock_client
+    
+    # 测试
+    service = AIService()
+    service.client = mock_client
+    
+    result = await service.generate_chapters_batch(
+        [{"title": "章节一", "length": "short"}, {"title": "章节二", "length": "short"}],
+        batch_size=5
+    )
+    
+    # 验证结果：两个章节只发起一次请求
+    assert result == ["第一章", "第二章"]
+    mock_client.chat_completion.assert_called_once()
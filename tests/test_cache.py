@@ -0,0 +1,148 @@
+"""
+缓存装饰器测试
+"""
+import asyncio
+import gc
+import pytest
+
+from app.core.cache import cache_manager, cache_key, cached, single_flight
+
+@pytest.mark.asyncio
+async def test_cached_single_flight(fake_redis):
+    """测试相同键的并发调用只执行一次"""
+    calls = 0
+
+    @cached(expire=60, key_prefix="test")
+    async def compute(x):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"value": x}
+
+    results = await asyncio.gather(*(compute(1) for _ in range(5)))
+
+    assert calls == 1
+    assert results == [{"value": 1}] * 5
+
+@pytest.mark.asyncio
+async def test_single_flight_follower_takes_over_when_leader_cancelled():
+    """测试执行者被取消时，等待者不会跟着被取消，而是重新执行"""
+    inflight = {}
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    leader = asyncio.create_task(single_flight(inflight, "key", compute))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(single_flight(inflight, "key", compute))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == 2
+    assert leader.cancelled()
+    assert inflight == {}
+
+@pytest.mark.asyncio
+async def test_single_flight_follower_gets_exception():
+    """测试执行失败时，等待者收到同一个异常"""
+    inflight = {}
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *(single_flight(inflight, "key", fail) for _ in range(3)),
+        return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [ValueError] * 3
+    assert inflight == {}
+
+@pytest.mark.asyncio
+async def test_single_flight_failure_without_waiters_not_reported():
+    """测试没有等待者时执行失败，不会产生“Future exception was never retrieved”警告"""
+    # 准备测试数据
+    loop = asyncio.get_running_loop()
+    reported = []
+    loop.set_exception_handler(lambda loop, context: reported.append(context))
+
+    async def fail():
+        raise ValueError("boom")
+
+    try:
+        with pytest.raises(ValueError):
+            await single_flight({}, "key", fail)
+        await asyncio.sleep(0)
+        gc.collect()
+    finally:
+        loop.set_exception_handler(None)
+
+    assert reported == []
+
+@pytest.mark.asyncio
+async def test_cached_local_hit_skips_redis(fake_redis):
+    """测试进程内缓存命中时不访问Redis"""
+    @cached(expire=60, key_prefix="test", local_size=8)
+    async def compute(x):
+        return x * 2
+
+    assert await compute(2) == 4
+    get_calls = fake_redis.get_calls
+    assert await compute(2) == 4
+    assert fake_redis.get_calls == get_calls
+
+@pytest.mark.asyncio
+async def test_cached_waits_for_lock_holder(fake_redis):
+    """测试其他进程持有锁时等待其写入结果，而不是重复计算"""
+    calls = 0
+
+    @cached(expire=60, key_prefix="test", local_size=0, lock_timeout=5)
+    async def compute(x):
+        nonlocal calls
+        calls += 1
+        return "local"
+
+    key = f"test:compute:{cache_key(1)}"
+    lock_key = f"{key}:lock"
+    # 模拟另一个进程已获取锁
+    fake_redis.data[lock_key] = "other"
+
+    async def other_process_finishes():
+        await asyncio.sleep(0.05)
+        await cache_manager.set(key, "remote", 60)
+        del fake_redis.data[lock_key]
+
+    result, _ = await asyncio.gather(compute(1), other_process_finishes())
+
+    assert result == "remote"
+    assert calls == 0
+
+@pytest.mark.asyncio
+async def test_cached_computes_when_lock_holder_fails(fake_redis):
+    """测试持有锁的进程未写入结果就释放锁时，由等待的进程自行计算"""
+    @cached(expire=60, key_prefix="test", local_size=0, lock_timeout=5)
+    async def compute(x):
+        return "local"
+
+    lock_key = f"test:compute:{cache_key(1)}:lock"
+    fake_redis.data[lock_key] = "other"
+
+    async def other_process_fails():
+        await asyncio.sleep(0.05)
+        del fake_redis.data[lock_key]
+
+    result, _ = await asyncio.gather(compute(1), other_process_fails())
+
+    assert result == "local"
+    # 计算完成后锁已释放
+    assert lock_key not in fake_redis.data
+
+def test_cache_key_rejects_unserializable_arguments():
+    """测试无法序列化的参数不会被折叠为类型名"""
+    with pytest.raises(TypeError):
+        cache_key(object())
@@ -0,0 +1,40 @@
+"""
+上下文压缩测试
+"""
+import pytest
+
+from app.core import context_compressor as compressor_module
+from app.core.context_compressor import ContextCompressor, _split_sentences
+
+@pytest.fixture(autouse=True)
+def lexical_scoring(monkeypatch):
+    """固定使用词面相似度打分，结果不依赖是否安装句向量模型"""
+    monkeypatch.setattr(type(compressor_module.semantic_cache), "enabled", property(lambda self: False))
+
+def test_split_sentences_keeps_decimals():
+    """测试英文句号后没有空白时不切分（小数、版本号）"""
+    sentences = _split_sentences("Python 3.11 is fast. 中文句子。第二句？")
+
+    assert sentences == ["Python 3.11 is fast.", "中文句子。", "第二句？"]
+
+@pytest.mark.asyncio
+async def test_compress_short_context_unchanged():
+    """测试未超出预算的上下文原样返回"""
+    compressor = ContextCompressor(max_chars=100)
+    assert await compressor.compress("短上下文。", "标题") == "短上下文。"
+
+@pytest.mark.asyncio
+async def test_compress_keeps_relevant_sentences_in_order():
+    """测试保留与标题最相关的句子，并按原文顺序以空格拼接英文句子"""
+    compressor = ContextCompressor(max_chars=75)
+    context = (
+        "Redis caching reduces latency. "
+        "The weather was sunny yesterday. "
+        "Cache invalidation in Redis needs care. "
+        "Lunch was served at noon."
+    )
+
+    result = await compressor.compress(context, "Redis caching")
+
+    assert result == "Redis caching reduces latency. Cache invalidation in Redis needs care."
+    assert len(result) <= 75
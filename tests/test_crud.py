@@ -0,0 +1,78 @@
+"""
+异步数据库CRUD测试
+"""
+import pytest
+from fastapi import Request, Response
+
+from app.api.templates import create_template, get_template, get_templates_version, update_template
+from app.api.users import create_user, get_user_conflict, get_users, read_user_me
+from app.core.http_cache import make_etag
+from app.schemas.template import TemplateCreate, TemplateUpdate
+from app.schemas.user import UserCreate
+
+def _user(name):
+    return UserCreate(username=name, email=f"{name}@example.com", password="secret123")
+
+@pytest.mark.asyncio
+async def test_create_user_and_detect_conflicts(db):
+    """测试创建用户后，一次查询即可分别判断用户名和邮箱冲突"""
+    user = await create_user(db, _user("alice"))
+
+    assert user.id is not None
+    assert user.verify_password("secret123")
+    assert await get_user_conflict(db, "alice", "other@example.com") == (True, False)
+    assert await get_user_conflict(db, "bob", "alice@example.com") == (False, True)
+    assert await get_user_conflict(db, "bob", "bob@example.com") == (False, False)
+
+@pytest.mark.asyncio
+async def test_get_users_keyset_pagination(db):
+    """测试提供after_id时从该id之后开始返回"""
+    users = [await create_user(db, _user(name)) for name in ("a1", "a2", "a3")]
+
+    page = await get_users(db, limit=2, after_id=users[0].id)
+
+    assert [user.username for user in page] == ["a2", "a3"]
+
+@pytest.mark.asyncio
+async def test_create_default_template_resets_previous_default(db):
+    """测试新建默认模板时，同类型的原默认模板被取消默认"""
+    first = await create_template(db, TemplateCreate(name="旧模板", content="x", is_default=True))
+    second = await create_template(db, TemplateCreate(name="新模板", content="y", is_default=True))
+
+    # 批量UPDATE不同步会话中的对象，重新查询前先使其过期
+    first_id, second_id = first.id, second.id
+    db.expire_all()
+    assert (await get_template(db, first_id)).is_default is False
+    assert (await get_template(db, second_id)).is_default is True
+
+@pytest.mark.asyncio
+async def test_update_template_returns_updated_row(db):
+    """测试更新模板通过RETURNING直接返回更新后的记录，不存在时返回None"""
+    template = await create_template(db, TemplateCreate(name="模板", content="x"))
+
+    updated = await update_template(db, template.id, TemplateUpdate(description="说明"))
+
+    assert updated.id == template.id
+    assert updated.description == "说明"
+    assert await update_template(db, template.id + 1, TemplateUpdate(description="说明")) is None
+
+@pytest.mark.asyncio
+async def test_templates_version_changes_within_same_second(db):
+    """测试同一秒内的修改也会改变模板列表的版本（时间戳只有秒级精度）"""
+    template = await create_template(db, TemplateCreate(name="模板", content="x"))
+    before = await get_templates_version(db)
+
+    await update_template(db, template.id, TemplateUpdate(description="说明"))
+
+    assert await get_templates_version(db) != before
+
+@pytest.mark.asyncio
+async def test_read_user_me_etag_from_current_user(db):
+    """测试当前用户的ETag由认证依赖返回的用户生成，匹配时返回304"""
+    user = await create_user(db, _user("alice"))
+    etag = make_etag(user.id, user.row_version)
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": [(b"if-none-match", etag.encode())]})
+
+    result = await read_user_me(request, Response(), current_user=user)
+
+    assert result.status_code == 304
@@ -0,0 +1,56 @@
+"""
+图表服务测试
+"""
+from pathlib import PurePosixPath
+import pytest
+
+from app.services.diagram_service import DiagramService, _SvgCanvas, _content_digest
+
+@pytest.fixture
+def diagram_service(tmp_path, monkeypatch):
+    """输出目录位于临时目录的图表服务"""
+    monkeypatch.chdir(tmp_path)
+    return DiagramService()
+
+def test_content_digest_stable():
+    """测试内容哈希与键顺序无关，并接受非字符串键和无法直接序列化的值"""
+    digest = _content_digest({"b": 1, "a": {2: "x"}}, "modern")
+
+    assert digest == _content_digest({"a": {2: "x"}, "b": 1}, "modern")
+    assert digest != _content_digest({"a": {2: "x"}, "b": 1}, "classic")
+    assert _content_digest({"path": PurePosixPath("/tmp/x")}) == _content_digest({"path": "/tmp/x"})
+
+def test_svg_canvas_escapes_text_and_flips_y():
+    """测试文字经过转义，且数据坐标的y轴向上"""
+    canvas = _SvgCanvas(xlim=(0, 2), ylim=(0, 1))
+    canvas.text(1, 1, "<A&B>")
+
+    svg = canvas.render().decode()
+
+    assert '<text x="100.0" y="0.0"' in svg
+    assert "&lt;A&amp;B&gt;" in svg
+    assert "<A&B>" not in svg
+    assert 'width="200" height="100"' in svg
+
+def test_svg_canvas_draws_text_above_shapes():
+    """测试矩形和箭头在下层，文字在上层"""
+    canvas = _SvgCanvas(xlim=(0, 1), ylim=(0, 1))
+    canvas.text(0.5, 0.5, "标签")
+    canvas.arrow(0, 0, 1, 1, color="#000000")
+    canvas.rect(0.1, 0.1, 0.5, 0.5, fill="#ffffff", stroke="#000000")
+
+    svg = canvas.render().decode()
+
+    assert svg.index("<rect x=") < svg.index("<line") < svg.index("<text")
+
+def test_figure_path_keyed_by_renderer(diagram_service):
+    """测试不同渲染方式的输出分别保存，未指定时路径不变"""
+    content = {"components": ["api", "db"]}
+
+    default_path, dpi = diagram_service._figure_path("arch", "png", content, "modern")
+    renderer_path, _ = diagram_service._figure_path("arch", "png", content, "modern", renderer="graphviz")
+
+    assert dpi == 150
+    assert default_path != renderer_path
+    assert diagram_service._figure_path("arch", "png", content, "modern")[0] == default_path
+    assert default_path.parent == diagram_service.output_dir
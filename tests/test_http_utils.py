@@ -0,0 +1,43 @@
+"""
+分页和HTTP条件请求工具测试
+"""
+from types import SimpleNamespace
+from fastapi import Request, Response
+
+from app.core.http_cache import make_etag, not_modified
+from app.core.pagination import NEXT_CURSOR_HEADER, set_next_cursor
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+def test_set_next_cursor_on_full_page():
+    """测试本页已满时返回最后一条记录的id作为游标"""
+    response = Response()
+    set_next_cursor(response, [SimpleNamespace(id=3), SimpleNamespace(id=7)], limit=2)
+    assert response.headers[NEXT_CURSOR_HEADER] == "7"
+
+def test_set_next_cursor_on_last_page():
+    """测试不足一页时不返回游标"""
+    response = Response()
+    set_next_cursor(response, [SimpleNamespace(id=3)], limit=2)
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+def test_not_modified_matches_etag():
+    """测试ETag匹配时返回304（弱比较，支持多个ETag）"""
+    etag = make_etag(1, "2024-01-01")
+    response = Response()
+
+    result = not_modified(_request(f'"other", {etag.removeprefix("W/")}'), response, etag)
+
+    assert result.status_code == 304
+    assert result.headers["ETag"] == etag
+
+def test_not_modified_sets_headers_on_miss():
+    """测试ETag不匹配时返回None，并在正常响应上设置缓存头"""
+    etag = make_etag(1, "2024-01-02")
+    response = Response()
+
+    assert not_modified(_request(make_etag(1, "2024-01-01")), response, etag, "private, no-cache") is None
+    assert response.headers["ETag"] == etag
+    assert response.headers["Cache-Control"] == "private, no-cache"
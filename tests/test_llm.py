@@ -0,0 +1,59 @@
+"""
+LLM客户端重试测试
+"""
+import httpx
+import pytest
+
+from app.core.llm import LLMClient, LLMConfig
+
+def _client(monkeypatch, responses):
+    """按顺序返回给定响应的LLM客户端，重试不等待"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return responses[min(len(requests), len(responses)) - 1]
+
+    client = LLMClient(LLMConfig(api_key="test", max_retries=3))
+    client.client = httpx.AsyncClient(base_url=client.config.base_url, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(LLMClient, "_retry_delay", staticmethod(lambda attempt, response=None: 0))
+    return client, requests
+
+@pytest.mark.asyncio
+async def test_request_retries_rate_limited(monkeypatch):
+    """测试429响应会重试，成功后返回解析后的响应"""
+    client, requests = _client(monkeypatch, [
+        httpx.Response(429, headers={"Retry-After": "1"}),
+        httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]}),
+    ])
+
+    result = await client.chat_completion([{"role": "user", "content": "hi"}])
+
+    assert result["choices"][0]["message"]["content"] == "ok"
+    assert len(requests) == 2
+
+@pytest.mark.asyncio
+async def test_request_does_not_retry_client_errors(monkeypatch):
+    """测试400等客户端错误直接抛出，不重试"""
+    client, requests = _client(monkeypatch, [httpx.Response(400, json={"error": "bad request"})])
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.chat_completion([{"role": "user", "content": "hi"}])
+
+    assert len(requests) == 1
+
+@pytest.mark.asyncio
+async def test_request_raises_when_retries_exhausted(monkeypatch):
+    """测试重试耗尽时抛出最后一次的异常，而不是返回None"""
+    client, requests = _client(monkeypatch, [httpx.Response(503)])
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.chat_completion([{"role": "user", "content": "hi"}])
+
+    assert len(requests) == 3
+
+def test_retry_delay_honours_retry_after():
+    """测试优先使用Retry-After，且最多等待30秒"""
+    assert LLMClient._retry_delay(0, httpx.Response(429, headers={"Retry-After": "2"})) == 2.0
+    assert LLMClient._retry_delay(0, httpx.Response(429, headers={"Retry-After": "120"})) == 30.0
+    assert 0.5 <= LLMClient._retry_delay(0, httpx.Response(503)) <= 0.75
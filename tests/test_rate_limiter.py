@@ -0,0 +1,47 @@
+"""
+LLM限流器测试
+"""
+import asyncio
+import time
+import pytest
+
+from app.core.rate_limiter import RateLimiter
+
+@pytest.mark.asyncio
+async def test_limit_bounds_concurrency():
+    """测试同时执行的请求数不超过并发上限"""
+    limiter = RateLimiter(max_concurrent=2, requests_per_minute=10000, tokens_per_minute=100000)
+    active = 0
+    peak = 0
+
+    async def request():
+        nonlocal active, peak
+        async with limiter.limit(10):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+
+    await asyncio.gather(*(request() for _ in range(6)))
+
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_limit_waits_for_token_refill():
+    """测试token配额用尽时等待恢复，而不是拒绝请求"""
+    # 每秒恢复1000个token
+    limiter = RateLimiter(max_concurrent=4, requests_per_minute=10000, tokens_per_minute=60000)
+    async with limiter.limit(60000):
+        pass
+
+    start = time.monotonic()
+    async with limiter.limit(100):
+        pass
+
+    assert time.monotonic() - start >= 0.08
+
+@pytest.mark.asyncio
+async def test_limit_caps_oversized_requests():
+    """测试超过桶容量的请求按桶容量计算，不会永远等待"""
+    limiter = RateLimiter(max_concurrent=1, requests_per_minute=10000, tokens_per_minute=1000)
+    await asyncio.wait_for(limiter.limit(5000).__aenter__(), timeout=1)
@@ -0,0 +1,49 @@
+"""
+认证用户缓存测试
+"""
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+
+from app.api.users import create_user, update_user
+from app.core import security
+from app.schemas.user import UserCreate, UserUpdate
+
+@pytest.fixture
+async def user(db):
+    return await create_user(db, UserCreate(username="alice", email="alice@example.com", password="secret123"))
+
+@pytest.mark.asyncio
+async def test_current_user_cached_after_first_lookup(fake_redis, db, user):
+    """测试首次查询后缓存用户，之后的请求不再访问数据库"""
+    token = security.create_access_token({"sub": "alice"}, timedelta(minutes=5))
+
+    first = await security.get_current_user(db=db, token=token)
+    # 缓存命中时不使用数据库会话
+    second = await security.get_current_user(db=None, token=token)
+
+    assert first.id == second.id == user.id
+    assert second.row_version == user.row_version
+    # 缓存中不含密码哈希
+    assert second.hashed_password is None
+
+@pytest.mark.asyncio
+async def test_update_user_invalidates_cache(fake_redis, db, user):
+    """测试更新用户提交后清除其缓存"""
+    token = security.create_access_token({"sub": "alice"}, timedelta(minutes=5))
+    await security.get_current_user(db=db, token=token)
+    assert security._user_cache_key("alice") in fake_redis.data
+
+    await update_user(db, user.id, UserUpdate(full_name="Alice"))
+
+    assert security._user_cache_key("alice") not in fake_redis.data
+
+@pytest.mark.asyncio
+async def test_expired_token_rejected(fake_redis, db, user):
+    """测试过期令牌返回401"""
+    token = security.create_access_token({"sub": "alice"}, timedelta(seconds=-1))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await security.get_current_user(db=db, token=token)
+
+    assert exc_info.value.status_code == 401
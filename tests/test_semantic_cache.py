@@ -0,0 +1,51 @@
+"""
+语义缓存向量索引测试
+"""
+import time
+import pytest
+
+from app.core import semantic_cache as semantic_cache_module
+
+np = pytest.importorskip("numpy")
+
+@pytest.fixture
+def vector_index(monkeypatch):
+    """使用numpy矩阵实现的向量索引（不依赖faiss）"""
+    monkeypatch.setattr(semantic_cache_module, "np", np)
+    monkeypatch.setattr(semantic_cache_module, "faiss", None)
+    return semantic_cache_module._VectorIndex(2)
+
+def _unit(x, y):
+    vector = np.array([x, y], dtype="float32")
+    return vector / np.linalg.norm(vector)
+
+def test_search_returns_nearest(vector_index):
+    """测试返回相似度最高的条目"""
+    vector_index.add(_unit(1, 0), "x", float("inf"))
+    vector_index.add(_unit(0, 1), "y", float("inf"))
+
+    score, value = vector_index.search(_unit(0.1, 1))
+
+    assert value == "y"
+    assert score > 0.9
+
+def test_prune_removes_expired(vector_index):
+    """测试过期条目在查询前被清理"""
+    vector_index.add(_unit(1, 0), "expired", time.monotonic() - 1)
+    vector_index.add(_unit(0, 1), "fresh", float("inf"))
+
+    _, value = vector_index.search(_unit(1, 0))
+
+    assert value == "fresh"
+    assert vector_index.values == ["fresh"]
+    assert vector_index.matrix.shape == (1, 2)
+
+def test_prune_evicts_oldest(vector_index):
+    """测试超出条目上限时淘汰最早的条目"""
+    for i in range(5):
+        vector_index.add(_unit(1, i), i, float("inf"))
+
+    vector_index.prune(keep_at_most=3)
+
+    assert vector_index.values == [2, 3, 4]
+    assert vector_index.matrix.shape == (3, 2)
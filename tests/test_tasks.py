@@ -0,0 +1,98 @@
+"""
+任务管理测试
+"""
+from types import SimpleNamespace
+import msgpack
+import pytest
+
+from app.core import tasks as tasks_module
+from app.core.tasks import TaskManager, task_channel, task_owner_key
+
+class FakeSyncRedis:
+    """内存中的同步Redis替身，只实现任务模块用到的命令"""
+
+    def __init__(self):
+        self.data = {}
+        self.published = []
+
+    def set(self, key, value, ex=None):
+        self.data[key] = str(value).encode()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def publish(self, channel, message):
+        self.published.append((channel, msgpack.unpackb(message)))
+
+class FakeTask:
+    """只记录提交参数的任务替身"""
+
+    def __init__(self, publisher):
+        self.publisher = publisher
+        self.submitted = []
+
+    def apply_async(self, args, task_id):
+        # 投递时任务归属必须已经记录
+        assert task_owner_key(task_id) in self.publisher.data
+        self.submitted.append((args, task_id))
+
+@pytest.fixture
+def publisher(monkeypatch):
+    """将任务模块的同步Redis客户端替换为内存实现"""
+    redis = FakeSyncRedis()
+    monkeypatch.setattr(tasks_module, "_publisher", redis)
+    return redis
+
+def test_submit_records_owner_before_dispatch(publisher):
+    """测试投递任务前记录提交用户，只有该用户能查询任务"""
+    task = FakeTask(publisher)
+
+    task_id = TaskManager._submit(task, (1, []), owner_id=7)
+
+    assert task.submitted == [((1, []), task_id)]
+    assert TaskManager.is_task_owner(task_id, 7)
+    assert not TaskManager.is_task_owner(task_id, 8)
+    assert not TaskManager.is_task_owner("unknown", 7)
+
+def test_task_events_published_on_task_channel(publisher):
+    """测试任务完成和失败事件发布到任务对应的频道"""
+    task = tasks_module.generate_chapter_task
+
+    task.on_success({"success": True}, "abc", (), {})
+    task.on_failure(ValueError("boom"), "abc", (), {}, None)
+
+    assert publisher.published == [
+        (task_channel("abc"), {"state": "SUCCESS", "result": {"success": True}}),
+        (task_channel("abc"), {"state": "FAILURE", "error": "boom"}),
+    ]
+
+class FakeAIService:
+    """逐段返回固定内容的流式生成替身"""
+
+    async def stream_chapter_content(self, title, **kwargs):
+        for _ in range(50):
+            yield "字"
+
+@pytest.mark.asyncio
+async def test_book_progress_throttled(monkeypatch):
+    """测试流式生成期间的进度上报按时间节流，每个章节完成时都会上报"""
+    # 准备测试数据
+    reports = []
+    task = SimpleNamespace(
+        request=SimpleNamespace(id="abc"),
+        update_state=lambda task_id, state, meta: reports.append((task_id, meta))
+    )
+
+    async def get_ai_service():
+        return FakeAIService()
+
+    monkeypatch.setattr("app.services.ai_service.get_ai_service", get_ai_service)
+
+    await tasks_module._generate_book_content(task, 1, [{"title": "第一章"}, {"title": "第二章"}])
+
+    partial = [meta for _, meta in reports if "partial" in meta]
+    done = [meta["current"] for _, meta in reports if "partial" not in meta]
+    # 两个章节在一个节流间隔内生成，只上报一次部分内容
+    assert len(partial) == 1
+    assert sorted(done) == [1, 2]
+    assert all(task_id == "abc" for task_id, _ in reports)
@@ -0,0 +1,34 @@
+"""
+Token计数与提示词裁剪测试
+"""
+from app.core.tokens import context_window, fit_messages
+
+def _conversation():
+    return [
+        {"role": "system", "content": "系统提示"},
+        {"role": "user", "content": "第一个问题" * 50},
+        {"role": "assistant", "content": "第一个回答" * 50},
+        {"role": "user", "content": "最后一个问题"},
+    ]
+
+def test_fit_messages_within_budget():
+    """测试未超出预算时原样返回"""
+    messages = _conversation()
+    assert fit_messages(messages, "gpt-4", 100) is messages
+
+def test_fit_messages_drops_earliest_turns():
+    """测试超出预算时从最早的非系统消息开始删除"""
+    messages = _conversation()
+    # 输出上限只给提示词留下几百个token
+    result = fit_messages(messages, "gpt-4", context_window("gpt-4") - 500)
+
+    assert result[0]["role"] == "system"
+    assert result[-1] == messages[-1]
+    assert messages[1] not in result
+
+def test_fit_messages_negative_budget():
+    """测试输出上限超过上下文窗口（预算为负）时仍保留系统消息和最后一条消息"""
+    messages = _conversation()
+    result = fit_messages(messages, "gpt-4", context_window("gpt-4") * 2)
+
+    assert result == [messages[0], messages[-1]]